@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config  # noqa: E402
+from src.core import SmartMoneyWorker  # noqa: E402
+from src.database import RedisClient, get_db_client  # noqa: E402
+from synthetic_swaps import generate_evm_swaps, generate_solana_swaps, load_clickhouse  # noqa: E402
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1', 'clickhouse', 'postgres', 'redis'}
+BENCH_PRICES = {'sol': 150.0, 'eth': 3000.0, 'matic': 0.5}
+STAGES = ('price', 'query', 'conversion', 'publish')
+
+
+class PeakRss:
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+class UncachedWorker(SmartMoneyWorker):
+
+    def __init__(self):
+        super().__init__(keep_alive=True)
+
+    def _create_analyzer(self, job_type: str):
+        analyzer = super()._create_analyzer(job_type)
+        analyzer.result_cache = None
+        return analyzer
+
+
+def check_local_targets():
+    hosts = {
+        'ClickHouse': Config.CLICKHOUSE_HOST,
+        'ClickHouse EVM': Config.CLICKHOUSE_HOST_EVM or Config.CLICKHOUSE_HOST,
+        'Postgres': 'connection string' if Config.POSTGRES_CONNECTION_STRING else Config.POSTGRES_HOST,
+        'Redis': Config.REDIS_HOST,
+    }
+    remote = {name: host for name, host in hosts.items() if host not in LOCAL_HOSTS}
+    if remote:
+        raise SystemExit(
+            "Refusing to load synthetic swaps into non-local targets: "
+            + ', '.join(f"{name}={host}" for name, host in remote.items())
+            + " (pass --allow-remote to override)"
+        )
+
+
+def seed_prices():
+    redis_client = RedisClient()
+    for asset, price in BENCH_PRICES.items():
+        redis_client.client.set(Config.PRICE_KEYS[asset], price)
+
+
+def run_size(worker: UncachedWorker, args, rows: int) -> dict:
+    generate = generate_solana_swaps if args.job_type == 'solana' else generate_evm_swaps
+    db = get_db_client(use_evm_host=args.job_type == 'evm')
+
+    started = time.perf_counter()
+    loaded = load_clickhouse(db.client, args.job_type, generate(rows, wallets=args.wallets, tokens=args.tokens, seed=args.seed))
+    load_seconds = time.perf_counter() - started
+
+    best = None
+    for _ in range(args.repeat):
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            results = worker.run(
+                job_type=args.job_type,
+                limit=args.limit,
+                chain=args.chain,
+                chains=args.chains if args.job_type == 'evm' and not args.chain else None,
+                streaming=args.streaming,
+                loader=args.loader,
+                publish_mode=args.publish_mode,
+            )
+            total = time.perf_counter() - started
+        stages = {stage: results['stage_seconds'].get(stage, 0.0) for stage in STAGES}
+        stages['other'] = round(max(total - sum(stages.values()), 0.0), 4)
+        run = {
+            'rows': loaded,
+            'load_seconds': round(load_seconds, 3),
+            'total_seconds': round(total, 4),
+            'stages': stages,
+            'swaps_per_second': round(loaded / total),
+            'wallets_stored': results.get('wallets_stored', 0),
+            'peak_rss_mb': round(rss.peak / 1024 / 1024, 1),
+        }
+        if best is None or run['total_seconds'] < best['total_seconds']:
+            best = run
+    return best
+
+
+def print_report(runs):
+    header = f"{'rows':>10}  {'total s':>8}  " + '  '.join(f"{s:>10}" for s in STAGES + ('other',)) + f"  {'swaps/s':>10}  {'peak MB':>8}"
+    print(header)
+    for run in runs:
+        stages = '  '.join(f"{run['stages'][s]:>10.3f}" for s in STAGES + ('other',))
+        print(f"{run['rows']:>10,}  {run['total_seconds']:>8.3f}  {stages}  {run['swaps_per_second']:>10,}  {run['peak_rss_mb']:>8.1f}")
+
+
+def compare(runs, baseline_path: str, tolerance: float) -> int:
+    with open(baseline_path) as f:
+        baseline = {run['rows']: run for run in json.load(f)['runs']}
+
+    regressions = []
+    for run in runs:
+        base = baseline.get(run['rows'])
+        if not base:
+            continue
+        checks = [('total', run['total_seconds'], base['total_seconds']), ('peak_rss_mb', run['peak_rss_mb'], base['peak_rss_mb'])]
+        checks += [(stage, run['stages'][stage], base['stages'].get(stage, 0.0)) for stage in STAGES]
+        for name, current, previous in checks:
+            if previous > 0 and current > previous * (1 + tolerance):
+                regressions.append(f"{run['rows']:,} rows {name}: {previous:.3f} -> {current:.3f} (+{current / previous - 1:.0%})")
+
+    if regressions:
+        print(f"\nRegressions against {baseline_path} (tolerance {tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions against {baseline_path} (tolerance {tolerance:.0%})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end SmartMoneyWorker benchmark on synthetic swaps')
+    parser.add_argument('--job-type', choices=['solana', 'evm'], default='solana')
+    parser.add_argument('--chain', default=None, help='single EVM chain; default runs the multi-chain job')
+    parser.add_argument('--chains', nargs='+', default=['eth', 'polygon', 'base'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 5000000])
+    parser.add_argument('--wallets', type=int, default=100000)
+    parser.add_argument('--tokens', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--loader', default='copy_text')
+    parser.add_argument('--publish-mode', default='delete')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--save-baseline', default=None)
+    parser.add_argument('--compare', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--allow-remote', action='store_true')
+    args = parser.parse_args()
+
+    if not args.allow_remote:
+        check_local_targets()
+    seed_prices()
+
+    worker = UncachedWorker()
+    try:
+        runs = [run_size(worker, args, rows) for rows in args.sizes]
+    finally:
+        worker.close()
+
+    print_report(runs)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'job_type': args.job_type, 'args': vars(args), 'runs': runs}, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.compare:
+        return compare(runs, args.compare, args.tolerance)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import polars as pl  # noqa: E402
+from src.database import PostgresClient  # noqa: E402
+from src.database.copy_loader import BigInt  # noqa: E402
+
+BENCH_TABLE = 'bench_smartmoney_sol'
+COLUMNS = PostgresClient.SOL_COLUMNS + ('row_fingerprint',)
+INPUTS = ('tuples', 'frame')
+
+
+def synthetic_rows(count: int, seed: int = 7):
+    """smartmoney_sol rows as published, keyed by column, with native PnL priced at 150 USD."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    for _ in range(count):
+        pnl_sol_7d = rng.uniform(-500, 5000)
+        pnl_sol_30d = rng.uniform(-2000, 20000)
+        yield {
+            'wallet_address': ''.join(rng.choices(alphabet, k=44)),
+            'transactions_7d': rng.randint(0, 5000),
+            'buys_7d': rng.randint(0, 2500),
+            'sells_7d': rng.randint(0, 2500),
+            'unique_tokens_7d': rng.randint(0, 300),
+            'realized_pnl_sol_7d': pnl_sol_7d,
+            'realized_pnl_usd_7d': pnl_sol_7d * 150.0,
+            'winrate_percent_7d': rng.uniform(0, 100),
+            'transactions_30d': rng.randint(0, 20000),
+            'buys_30d': rng.randint(0, 10000),
+            'sells_30d': rng.randint(0, 10000),
+            'unique_tokens_30d': rng.randint(0, 1000),
+            'realized_pnl_sol_30d': pnl_sol_30d,
+            'realized_pnl_usd_30d': pnl_sol_30d * 150.0,
+            'winrate_percent_30d': rng.uniform(0, 100),
+            'sol_price_usd': 150.0,
+            'refresh_type': 'hourly',
+            'row_fingerprint': rng.getrandbits(64) - 2 ** 63,
+        }
+
+
+def bench(client: PostgresClient, loader: str, values) -> float:
+    client.set_loader(loader)
+    with client.conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {BENCH_TABLE} (LIKE {client.TABLE_NAME} INCLUDING DEFAULTS INCLUDING INDEXES)")
+        started = time.perf_counter()
+        client._write_rows(cur, BENCH_TABLE, COLUMNS, values)
+        elapsed = time.perf_counter() - started
+    client.conn.rollback()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Postgres loaders for smartmoney_sol rows, from tuples and from frames')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 500000])
+    parser.add_argument('--loaders', nargs='+', default=list(PostgresClient.LOADERS))
+    parser.add_argument('--inputs', nargs='+', choices=INPUTS, default=list(INPUTS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    client = PostgresClient(migrate=True)
+    try:
+        print(f"{'rows':>10}  {'input':<6}  {'loader':<12}  {'best s':>8}  {'rows/s':>12}")
+        for size in args.sizes:
+            rows = list(synthetic_rows(size))
+            inputs = {
+                # Tuple rows mark the BIGINT fingerprint as the publish path does
+                'tuples': [tuple(row[c] for c in COLUMNS[:-1]) + (BigInt(row['row_fingerprint']),) for row in rows],
+                'frame': pl.DataFrame(rows).select(COLUMNS),
+            }
+            for name in args.inputs:
+                for loader in args.loaders:
+                    best = min(bench(client, loader, inputs[name]) for _ in range(args.repeat))
+                    print(f"{size:>10,}  {name:<6}  {loader:<12}  {best:>8.3f}  {size / best:>12,.0f}")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
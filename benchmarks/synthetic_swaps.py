@@ -0,0 +1,183 @@
+import argparse
+import itertools
+import os
+import random
+import string
+import sys
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import Config  # noqa: E402
+
+SOL_ADDRESS = Config.SOL_ADDRESS
+EVM_NATIVE_TOKENS = {
+    'eth': '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2',
+    'polygon': '0x0d500b1d8e8ef31e21c99d1db9a6444d3adf1270',
+    'base': '0x4200000000000000000000000000000000000006',
+}
+
+SOLANA_COLUMNS = ['signing_wallet', 'block_time', 'base_coin', 'quote_coin', 'direction', 'base_coin_amount', 'quote_coin_amount']
+EVM_COLUMNS = [
+    'chain', 'tx_from_address', 'block_time', 'base_coin', 'quote_coin',
+    'base_coin_amount', 'base_coin_decimals', 'quote_coin_amount', 'quote_coin_decimals',
+]
+
+SOLANA_DDL = """
+CREATE TABLE IF NOT EXISTS solana.swaps (
+    signing_wallet String,
+    block_time DateTime,
+    base_coin String,
+    quote_coin String,
+    direction LowCardinality(String),
+    base_coin_amount Float64,
+    quote_coin_amount Float64
+)
+ENGINE = MergeTree
+PARTITION BY toYYYYMMDD(block_time)
+ORDER BY (block_time, signing_wallet)
+"""
+
+EVM_DDL = """
+CREATE TABLE IF NOT EXISTS evm.swap_events (
+    chain LowCardinality(String),
+    tx_from_address String,
+    block_time DateTime,
+    base_coin String,
+    quote_coin String,
+    base_coin_amount Float64,
+    base_coin_decimals UInt8,
+    quote_coin_amount Float64,
+    quote_coin_decimals UInt8
+)
+ENGINE = MergeTree
+PARTITION BY toYYYYMMDD(block_time)
+ORDER BY (chain, block_time, tx_from_address)
+"""
+
+
+class ZipfSampler:
+
+    def __init__(self, population: List[str], exponent: float, rng: random.Random):
+        self.population = population
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, len(population) + 1)))
+
+    def sample(self, k: int) -> List[str]:
+        return self.rng.choices(self.population, cum_weights=self.cum_weights, k=k)
+
+
+def _addresses(rng: random.Random, count: int, evm: bool) -> List[str]:
+    if evm:
+        return ['0x' + ''.join(rng.choices('0123456789abcdef', k=40)) for _ in range(count)]
+    alphabet = string.ascii_letters + string.digits
+    return [''.join(rng.choices(alphabet, k=44)) for _ in range(count)]
+
+
+def _block_times(rng: random.Random, count: int, days: int) -> List[datetime]:
+    now = datetime.utcnow().replace(microsecond=0)
+    window = days * 86400
+    return [now - timedelta(seconds=rng.randrange(window)) for _ in range(count)]
+
+
+def generate_solana_swaps(rows: int, wallets: int = 100000, tokens: int = 5000, days: int = 30,
+                          buy_ratio: float = 0.55, exponent: float = 1.1, seed: int = 7,
+                          batch_size: int = 100000) -> Iterator[List[Tuple]]:
+    rng = random.Random(seed)
+    wallet_sampler = ZipfSampler(_addresses(rng, wallets, evm=False), exponent, rng)
+    token_list = _addresses(rng, tokens, evm=False)
+    token_sampler = ZipfSampler(token_list, exponent, rng)
+    token_prices = {token: rng.lognormvariate(8, 3) for token in token_list}
+
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        batch = []
+        for wallet, token, block_time in zip(wallet_sampler.sample(count), token_sampler.sample(count), _block_times(rng, count, days)):
+            sol_amount = rng.lognormvariate(0, 1.5)
+            token_amount = sol_amount * token_prices[token] * rng.uniform(0.8, 1.25)
+            is_buy = rng.random() < buy_ratio
+            if rng.random() < 0.5:
+                batch.append((wallet, block_time, SOL_ADDRESS, token, 'S' if is_buy else 'B', sol_amount, token_amount))
+            else:
+                batch.append((wallet, block_time, token, SOL_ADDRESS, 'B' if is_buy else 'S', token_amount, sol_amount))
+        yield batch
+
+
+def generate_evm_swaps(rows: int, chains: List[str] = None, wallets: int = 100000, tokens: int = 5000, days: int = 30,
+                       buy_ratio: float = 0.55, exponent: float = 1.1, seed: int = 7,
+                       batch_size: int = 100000) -> Iterator[List[Tuple]]:
+    chains = chains or list(EVM_NATIVE_TOKENS)
+    rng = random.Random(seed)
+    wallet_sampler = ZipfSampler(_addresses(rng, wallets, evm=True), exponent, rng)
+    token_list = _addresses(rng, tokens, evm=True)
+    token_sampler = ZipfSampler(token_list, exponent, rng)
+    token_prices = {token: rng.lognormvariate(8, 3) for token in token_list}
+    token_decimals = {token: rng.choice([6, 9, 18]) for token in token_list}
+
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        batch = []
+        for wallet, token, block_time in zip(wallet_sampler.sample(count), token_sampler.sample(count), _block_times(rng, count, days)):
+            chain = rng.choice(chains)
+            native = EVM_NATIVE_TOKENS[chain]
+            native_amount = rng.lognormvariate(-2, 1.5) * 10 ** 18
+            decimals = token_decimals[token]
+            token_amount = native_amount / 10 ** 18 * token_prices[token] * rng.uniform(0.8, 1.25) * 10 ** decimals
+            if rng.random() < buy_ratio:
+                batch.append((chain, wallet, block_time, native, token, native_amount, 18, token_amount, decimals))
+            else:
+                batch.append((chain, wallet, block_time, token, native, token_amount, decimals, native_amount, 18))
+        yield batch
+
+
+def load_clickhouse(client, job_type: str, batches: Iterator[List[Tuple]], truncate: bool = True) -> int:
+    database, table, ddl, columns = (
+        ('solana', 'swaps', SOLANA_DDL, SOLANA_COLUMNS) if job_type == 'solana'
+        else ('evm', 'swap_events', EVM_DDL, EVM_COLUMNS)
+    )
+    client.command(f"CREATE DATABASE IF NOT EXISTS {database}")
+    client.command(ddl)
+    if truncate:
+        client.command(f"TRUNCATE TABLE {database}.{table}")
+
+    loaded = 0
+    for batch in batches:
+        client.insert(f"{database}.{table}", batch, column_names=columns)
+        loaded += len(batch)
+    return loaded
+
+
+def write_parquet(path: str, job_type: str, batches: Iterator[List[Tuple]]) -> int:
+    import polars as pl
+
+    columns = SOLANA_COLUMNS if job_type == 'solana' else EVM_COLUMNS
+    frames = [pl.DataFrame(batch, schema=columns, orient='row') for batch in batches]
+    frame = pl.concat(frames) if frames else pl.DataFrame(schema=columns)
+    frame.write_parquet(path, compression='zstd')
+    return frame.height
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic swaps in the solana.swaps / evm.swap_events shape to Parquet')
+    parser.add_argument('job_type', choices=['solana', 'evm'])
+    parser.add_argument('output')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--wallets', type=int, default=100000)
+    parser.add_argument('--tokens', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--buy-ratio', type=float, default=0.55)
+    parser.add_argument('--exponent', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    generate = generate_solana_swaps if args.job_type == 'solana' else generate_evm_swaps
+    batches = generate(args.rows, wallets=args.wallets, tokens=args.tokens, days=args.days,
+                       buy_ratio=args.buy_ratio, exponent=args.exponent, seed=args.seed)
+    written = write_parquet(args.output, args.job_type, batches)
+    print(f"Wrote {written:,} {args.job_type} swaps to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
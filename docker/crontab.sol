@@ -2,8 +2,11 @@
 SHELL=/bin/bash
 PATH=/usr/local/bin:/usr/bin:/bin
 
-# Hourly refresh of top 10k Solana smart money wallets (every hour at :00)
-0 * * * * cd /app && /usr/local/bin/python worker_scheduled.py solana_smart_money_hourly >> /var/log/cron.log 2>&1
+# Hourly refresh of top 10k Solana smart money wallets (every hour at :00, except 00:00)
+0 1-23 * * * cd /app && /usr/local/bin/python worker_scheduled.py solana_smart_money_hourly >> /var/log/cron.log 2>&1
 
-# Daily full refresh of 50k Solana smart money wallets (at 00:30 UTC)
-30 0 * * * cd /app && /usr/local/bin/python worker_scheduled.py solana_smart_money_daily >> /var/log/cron.log 2>&1
+# Hourly top 10k + daily full 50k from a single scan (at 00:00 UTC)
+0 0 * * * cd /app && /usr/local/bin/python worker_scheduled.py solana_smart_money_daily_combined >> /var/log/cron.log 2>&1
+
+# Compact closed days into the swap rollup (at 00:10 UTC)
+10 0 * * * cd /app && /usr/local/bin/python worker_scheduled.py solana_swap_rollup_daily >> /var/log/cron.log 2>&1
@@ -1,5 +1,17 @@
 #!/bin/bash
 
+cd /app && /usr/local/bin/python worker_scheduled.py migrate || exit 1
+
+if [ "${SCHEDULER_MODE}" = "daemon" ]; then
+    echo "============================================================"
+    echo "SMART MONEY WORKER - SCHEDULER DAEMON"
+    echo "============================================================"
+    echo "Started at: $(date -u '+%Y-%m-%d %H:%M:%S') UTC"
+    echo "Jobs: ${SCHEDULER_JOBS}"
+    echo "============================================================"
+    cd /app && exec /usr/local/bin/python worker_scheduled.py daemon
+fi
+
 echo "============================================================"
 echo "SMART MONEY WORKER - CRON SCHEDULER"
 echo "============================================================"
@@ -12,6 +12,12 @@ class Config:
     CLICKHOUSE_PASSWORD = os.getenv('CLICKHOUSE_PASSWORD', '')
     CLICKHOUSE_DATABASE = os.getenv('CLICKHOUSE_DATABASE', 'solana')
     CLICKHOUSE_DATABASE_EVM = os.getenv('CLICKHOUSE_DATABASE_EVM', 'evm')
+    CLICKHOUSE_COMPRESSION = os.getenv('CLICKHOUSE_COMPRESSION', 'lz4')
+    CLICKHOUSE_ARROW_COMPRESSION = os.getenv('CLICKHOUSE_ARROW_COMPRESSION', 'lz4_frame')
+    CLICKHOUSE_POOL_SIZE = int(os.getenv('CLICKHOUSE_POOL_SIZE', '8'))
+    CLICKHOUSE_QUERY_RETRIES = int(os.getenv('CLICKHOUSE_QUERY_RETRIES', '2'))
+    CLICKHOUSE_SHARD_PARALLELISM = int(os.getenv('CLICKHOUSE_SHARD_PARALLELISM', '2'))
+    CLICKHOUSE_SHARD_RETRIES = int(os.getenv('CLICKHOUSE_SHARD_RETRIES', '2'))
 
     POSTGRES_CONNECTION_STRING = os.getenv('POSTGRES_CONNECTION_STRING', None)
     POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'localhost')
@@ -19,6 +25,43 @@ class Config:
     POSTGRES_USER = os.getenv('POSTGRES_USER', 'postgres')
     POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'postgres')
     POSTGRES_DATABASE = os.getenv('POSTGRES_DATABASE', 'wallet_metrics')
+    POSTGRES_LOADER = os.getenv('POSTGRES_LOADER', 'values')
+    POSTGRES_PUBLISH_MODE = os.getenv('POSTGRES_PUBLISH_MODE', 'delete')
+    POSTGRES_DELTA_PRECISION = int(os.getenv('POSTGRES_DELTA_PRECISION', '10'))
+    POSTGRES_AUTO_MIGRATE = os.getenv('POSTGRES_AUTO_MIGRATE', 'false').lower() == 'true'
+    POSTGRES_HISTORY_ENABLED = os.getenv('POSTGRES_HISTORY_ENABLED', 'false').lower() == 'true'
+    POSTGRES_HISTORY_RETENTION_DAYS = int(os.getenv('POSTGRES_HISTORY_RETENTION_DAYS', '90'))
+    POSTGRES_NOTIFY_CHANNEL = os.getenv('POSTGRES_NOTIFY_CHANNEL', 'smartmoney_refresh')
+
+    SCHEDULER_JOBS = os.getenv('SCHEDULER_JOBS', '')
+    SCHEDULER_MAX_PARALLEL = int(os.getenv('SCHEDULER_MAX_PARALLEL', '2'))
+
+    PLANNER_ENABLED = os.getenv('PLANNER_ENABLED', 'true').lower() == 'true'
+    PLANNER_HISTORY_RUNS = int(os.getenv('PLANNER_HISTORY_RUNS', '10'))
+    PLANNER_MEMORY_BUDGET_MB = int(os.getenv('PLANNER_MEMORY_BUDGET_MB', '8192'))
+    PLANNER_MAX_SHARDS = int(os.getenv('PLANNER_MAX_SHARDS', '16'))
+    PLANNER_ROLLUP_MIN_READ_ROWS = int(os.getenv('PLANNER_ROLLUP_MIN_READ_ROWS', '2000000000'))
+    PLANNER_SMALL_SCAN_ROWS = int(os.getenv('PLANNER_SMALL_SCAN_ROWS', '200000000'))
+    PLANNER_SMALL_SCAN_THREADS = int(os.getenv('PLANNER_SMALL_SCAN_THREADS', '8'))
+
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', 'cache/results')
+    RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', '512'))
+    RESULT_CACHE_MAX_AGE_SECONDS = float(os.getenv('RESULT_CACHE_MAX_AGE_SECONDS', '21600'))
+
+    SNAPSHOT_EXPORT_DIR = os.getenv('SNAPSHOT_EXPORT_DIR', '')
+
+    TOKEN_LEADERBOARD_WALLETS = int(os.getenv('TOKEN_LEADERBOARD_WALLETS', '100'))
+    WALLET_TOP_TOKENS = int(os.getenv('WALLET_TOP_TOKENS', '10'))
+
+    INCREMENTAL_CHECKPOINT_DIR = os.getenv('INCREMENTAL_CHECKPOINT_DIR', 'cache/incremental')
+    INCREMENTAL_CHECKPOINT_EVERY = int(os.getenv('INCREMENTAL_CHECKPOINT_EVERY', '10'))
+    INCREMENTAL_LIMIT = int(os.getenv('INCREMENTAL_LIMIT', '10000'))
+    INCREMENTAL_INTERVAL_SECONDS = float(os.getenv('INCREMENTAL_INTERVAL_SECONDS', '60'))
+    INCREMENTAL_SETTLE_LAG_SECONDS = int(os.getenv('INCREMENTAL_SETTLE_LAG_SECONDS', '300'))
+
+    METRICS_DIR = os.getenv('METRICS_DIR', 'logs/metrics')
+    METRICS_PUSHGATEWAY_URL = os.getenv('METRICS_PUSHGATEWAY_URL', None)
+    METRICS_QUERY_LOG = os.getenv('METRICS_QUERY_LOG', 'true').lower() == 'true'
 
     BATCH_SIZE = int(os.getenv('BATCH_SIZE', '10000'))
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -27,9 +70,15 @@ class Config:
     REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
     REDIS_DB = int(os.getenv('REDIS_DB', '2'))
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
+    REDIS_LEADERBOARD_ENABLED = os.getenv('REDIS_LEADERBOARD_ENABLED', 'false').lower() == 'true'
+    REDIS_LEADERBOARD_PREFIX = os.getenv('REDIS_LEADERBOARD_PREFIX', 'smartmoney')
     SOL_PRICE_KEY = os.getenv('SOL_PRICE_KEY', 'solana:price_usd')
     ETH_PRICE_KEY = os.getenv('ETH_PRICE_KEY', 'ethereum:price_usd')
     MATIC_PRICE_KEY = os.getenv('MATIC_PRICE_KEY', 'matic:price_usd')
+    PRICE_KEYS = {'sol': SOL_PRICE_KEY, 'eth': ETH_PRICE_KEY, 'matic': MATIC_PRICE_KEY}
+    PRICE_CACHE_TTL_SECONDS = float(os.getenv('PRICE_CACHE_TTL_SECONDS', '30'))
+    PRICE_MAX_STALENESS_SECONDS = float(os.getenv('PRICE_MAX_STALENESS_SECONDS', '3600'))
+    PRICE_SNAPSHOT_PATH = os.getenv('PRICE_SNAPSHOT_PATH', 'logs/price_snapshot.json')
 
     SOL_ADDRESS = 'So11111111111111111111111111111111111111112'
     SOL_DECIMALS = 9
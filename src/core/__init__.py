@@ -1,3 +1,5 @@
 from .main import SmartMoneyWorker
+from .scheduler import JobScheduler
+from .planner import QueryPlanner
 
-__all__ = ['SmartMoneyWorker']
+__all__ = ['SmartMoneyWorker', 'JobScheduler', 'QueryPlanner']
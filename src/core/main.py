@@ -1,44 +1,202 @@
 import logging
+import threading
 import time
-from typing import Dict, Any, Optional
-from ..config import setup_logging
-from ..processors import SolanaSmartMoneyAnalyzer, EvmSmartMoneyAnalyzer
+from typing import Dict, Any, List, Optional, Union
+import polars as pl
+from ..config import Config, setup_logging
+from ..database import PostgresClient, RunLedger, query_settings
+from ..metrics import RunMetrics, export_run, track_run
+from ..processors import SolanaSmartMoneyAnalyzer, EvmSmartMoneyAnalyzer, IncrementalSmartMoneyEngine
+from .planner import QueryPlanner
 
 logger = logging.getLogger(__name__)
 
 
 class SmartMoneyWorker:
 
-    def __init__(self):
+    def __init__(self, keep_alive: bool = False):
         setup_logging()
         logger.info("SMART MONEY WORKER INITIALIZED")
-        self.analyzer = None
+        self.keep_alive = keep_alive
+        self._idle: Dict[str, List[Any]] = {}
+        self._idle_lock = threading.Lock()
 
-    def run(self, job_type: str = 'solana', limit: int = 10000, chain: Optional[str] = None, refresh_type: str = 'hourly') -> Dict[str, Any]:
+    def _create_analyzer(self, job_type: str):
+        if job_type == 'solana':
+            analyzer_class = SolanaSmartMoneyAnalyzer
+        elif job_type == 'evm':
+            analyzer_class = EvmSmartMoneyAnalyzer
+        else:
+            raise ValueError(f"Unknown job type: {job_type}")
+        # Kept-alive analyzers may run in parallel, so each one owns its Postgres connection
+        return analyzer_class(postgres=PostgresClient() if self.keep_alive else None)
+
+    def _acquire_analyzer(self, job_type: str, loader: Optional[str] = None, publish_mode: Optional[str] = None):
+        analyzer = None
+        if self.keep_alive:
+            with self._idle_lock:
+                idle = self._idle.get(job_type)
+                if idle:
+                    analyzer = idle.pop()
+        if analyzer is None:
+            analyzer = self._create_analyzer(job_type)
+        elif analyzer.postgres.conn.closed:
+            analyzer.postgres._connect()
+
+        analyzer.postgres.set_loader(loader or Config.POSTGRES_LOADER)
+        analyzer.postgres.set_publish_mode(publish_mode or Config.POSTGRES_PUBLISH_MODE)
+        analyzer.postgres.delta_stats = {}
+        return analyzer
+
+    def _release_analyzer(self, job_type: str, analyzer, healthy: bool):
+        if not self.keep_alive:
+            analyzer.close()
+        elif healthy:
+            with self._idle_lock:
+                self._idle.setdefault(job_type, []).append(analyzer)
+        else:
+            analyzer.postgres.close()
+
+    def _export_metrics(self, run_metrics: RunMetrics, analyzer, plan: Optional[Dict[str, Any]] = None):
+        if Config.METRICS_QUERY_LOG and analyzer is not None:
+            query_ids = [query['query_id'] for query in run_metrics.queries]
+            run_metrics.update_query_stats(analyzer.db.fetch_query_stats(query_ids))
+        export_run(run_metrics, Config.METRICS_DIR, Config.METRICS_PUSHGATEWAY_URL)
+        if Config.PLANNER_ENABLED and analyzer is not None and not analyzer.postgres.conn.closed:
+            RunLedger(analyzer.postgres.conn).record(run_metrics, plan)
+
+    def _plan(self, analyzer, job_name: str, shards: int, use_rollup: Union[bool, str]) -> Dict[str, Any]:
+        if not Config.PLANNER_ENABLED:
+            return {'shards': shards, 'use_rollup': use_rollup is True, 'settings': {}, 'history_runs': 0}
+        planner = QueryPlanner(RunLedger(analyzer.postgres.conn))
+        return planner.plan(job_name, shards=shards, use_rollup=use_rollup)
+
+    def close(self):
+        with self._idle_lock:
+            analyzers = [a for idle in self._idle.values() for a in idle]
+            self._idle = {}
+        for analyzer in analyzers:
+            analyzer.postgres.close()
+        for db in {id(a.db): a.db for a in analyzers}.values():
+            db.close()
+
+    def run(self, job_type: str = 'solana', limit: int = 10000, chain: Optional[str] = None, refresh_type: str = 'hourly',
+            use_rollup: Union[bool, str] = False, refresh_limits: Optional[Dict[str, int]] = None,
+            chains: Optional[List[str]] = None, streaming: bool = False, loader: Optional[str] = None,
+            publish_mode: Optional[str] = None, job_name: Optional[str] = None, shards: int = 1,
+            token_outputs: bool = False) -> Dict[str, Any]:
         start_time = time.time()
+        analyzer = None
+        healthy = False
+        run_metrics = None
+        plan = None
+        job_name = job_name or '_'.join(filter(None, [job_type, chain, refresh_type]))
+        chain_label = chain or (','.join(chains) if chains else None)
 
         try:
-            if job_type == 'solana':
-                self.analyzer = SolanaSmartMoneyAnalyzer()
-                results = self.analyzer.analyze_smart_money(limit=limit, refresh_type=refresh_type)
-            elif job_type == 'evm':
-                if not chain:
+            with track_run(job_name, job_type=job_type, chain=chain_label, refresh_type=refresh_type) as run_metrics:
+                if job_type == 'evm' and not chains and not chain:
                     raise ValueError("Chain must be specified for EVM jobs")
-                self.analyzer = EvmSmartMoneyAnalyzer()
-                results = self.analyzer.analyze_smart_money(chain=chain, limit=limit, refresh_type=refresh_type)
-            else:
-                raise ValueError(f"Unknown job type: {job_type}")
-
-            elapsed = time.time() - start_time
-            results['elapsed_seconds'] = round(elapsed, 2)
-            logger.info(f"Processing time: {elapsed:.2f}s")
+
+                analyzer = self._acquire_analyzer(job_type, loader=loader, publish_mode=publish_mode)
+                plan = self._plan(analyzer, job_name, shards, use_rollup)
+                with query_settings(plan['settings']):
+                    if job_type == 'solana':
+                        results = analyzer.analyze_smart_money(
+                            limit=limit, refresh_type=refresh_type, use_rollup=plan['use_rollup'],
+                            refresh_limits=refresh_limits, streaming=streaming, shards=plan['shards'],
+                            token_outputs=token_outputs
+                        )
+                    elif chains:
+                        results = analyzer.analyze_multi_chain(
+                            chains=chains, limit=limit, refresh_type=refresh_type, use_rollup=plan['use_rollup'],
+                            refresh_limits=refresh_limits, streaming=streaming, shards=plan['shards'],
+                            token_outputs=token_outputs
+                        )
+                    else:
+                        results = analyzer.analyze_smart_money(
+                            chain=chain, limit=limit, refresh_type=refresh_type, use_rollup=plan['use_rollup'],
+                            refresh_limits=refresh_limits, streaming=streaming, shards=plan['shards'],
+                            token_outputs=token_outputs
+                        )
+                results['plan'] = plan
+
+                if analyzer.postgres.delta_stats:
+                    results['delta_stats'] = analyzer.postgres.delta_stats
+
+                elapsed = time.time() - start_time
+                results['elapsed_seconds'] = round(elapsed, 2)
+                logger.info(f"Processing time: {elapsed:.2f}s")
+            results['stage_seconds'] = {name: round(seconds, 4) for name, seconds in run_metrics.stages.items()}
+            healthy = True
             return results
         except Exception as e:
             logger.error(f"Worker failed: {e}", exc_info=True)
             raise
         finally:
-            if self.analyzer:
-                self.analyzer.close()
+            if run_metrics:
+                self._export_metrics(run_metrics, analyzer, plan)
+            if analyzer:
+                self._release_analyzer(job_type, analyzer, healthy)
+
+    def run_rollup(self, job_type: str = 'solana', chain: Optional[str] = None, recompact_days: int = 1,
+                   job_name: Optional[str] = None) -> Dict[str, Any]:
+        start_time = time.time()
+        analyzer = None
+        healthy = False
+        run_metrics = None
+        job_name = job_name or '_'.join(filter(None, [job_type, chain, 'rollup']))
+
+        try:
+            with track_run(job_name, job_type=job_type, chain=chain) as run_metrics:
+                analyzer = self._acquire_analyzer(job_type)
+                if job_type == 'solana':
+                    results = analyzer.compact_rollup(recompact_days=recompact_days)
+                else:
+                    if not chain:
+                        raise ValueError("Chain must be specified for EVM jobs")
+                    results = analyzer.compact_rollup(chain=chain, recompact_days=recompact_days)
+
+                elapsed = time.time() - start_time
+                results['elapsed_seconds'] = round(elapsed, 2)
+                logger.info(f"Rollup compaction time: {elapsed:.2f}s")
+            healthy = True
+            return results
+        except Exception as e:
+            logger.error(f"Rollup compaction failed: {e}", exc_info=True)
+            raise
+        finally:
+            if run_metrics:
+                self._export_metrics(run_metrics, analyzer)
+            if analyzer:
+                self._release_analyzer(job_type, analyzer, healthy)
+
+    def run_realtime(self, job_type: str = 'solana', chains: Optional[List[str]] = None, limit: int = 10000,
+                     refresh_type: str = 'realtime', interval_seconds: Optional[float] = None,
+                     publish_mode: Optional[str] = None):
+        """Republishes the leaderboard every interval from an IncrementalSmartMoneyEngine until interrupted."""
+        if job_type == 'evm' and not chains:
+            raise ValueError("Chains must be specified for EVM jobs")
+        chains = chains or ['solana']
+        analyzer = self._acquire_analyzer(job_type, publish_mode=publish_mode)
+        engine = IncrementalSmartMoneyEngine(
+            analyzer.db, analyzer.query_builder, chains, limit=limit,
+            checkpoint_name='_'.join([job_type] + chains + [refresh_type]),
+        )
+
+        def publish(metrics):
+            if job_type == 'solana':
+                analyzer.publish_metrics(metrics, analyzer.redis.get_sol_price(), {refresh_type: limit})
+                return
+            prices = analyzer.native_prices(chains)
+            for chain in chains:
+                analyzer.publish_metrics(chain, metrics.filter(pl.col('chain') == chain), prices[chain], {refresh_type: limit})
+
+        logger.info(f"Realtime {job_type} leaderboard for {', '.join(chains)} ({refresh_type}, top {limit:,})")
+        try:
+            engine.run(publish, interval_seconds=interval_seconds)
+        finally:
+            analyzer.close()
 
 
 def main():
@@ -0,0 +1,83 @@
+import logging
+import math
+from typing import Any, Dict, List, Optional, Union
+from ..config import Config
+from ..database.run_ledger import RunLedger
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlanner:
+    """Picks per-job ClickHouse execution settings from the job's run history.
+
+    Peak memory of past runs (scaled back up by the shard count they used) drives
+    the shard count and external GROUP BY spill threshold, past query time drives
+    max_execution_time, and small scans get a thread cap so they leave cores to the
+    big jobs. Jobs configured with use_rollup='auto' switch to the rollup once raw
+    scans read more than PLANNER_ROLLUP_MIN_READ_ROWS. Without history the job's
+    configured plan is used unchanged.
+    """
+
+    DEFAULT_MAX_EXECUTION_TIME = 900
+    MEMORY_HEADROOM = 1.5
+
+    def __init__(self, ledger: RunLedger, history_runs: Optional[int] = None, memory_budget_bytes: Optional[int] = None,
+                 max_shards: Optional[int] = None):
+        self.ledger = ledger
+        self.history_runs = history_runs or Config.PLANNER_HISTORY_RUNS
+        self.memory_budget_bytes = memory_budget_bytes or Config.PLANNER_MEMORY_BUDGET_MB * 1024 * 1024
+        self.max_shards = max_shards or Config.PLANNER_MAX_SHARDS
+
+    @staticmethod
+    def _next_power_of_two(value: float) -> int:
+        return 1 << max(math.ceil(math.log2(value)), 0) if value > 1 else 1
+
+    def _shards(self, history: List[Dict[str, Any]], configured: int) -> int:
+        unsharded_memory = max(run['peak_memory_bytes'] * run['plan'].get('shards', 1) for run in history)
+        needed = self._next_power_of_two(unsharded_memory * self.MEMORY_HEADROOM / self.memory_budget_bytes)
+        return min(max(configured, needed), max(self.max_shards, configured))
+
+    def _use_rollup(self, history: List[Dict[str, Any]]) -> bool:
+        raw_reads = [run['read_rows'] for run in history if not run['plan'].get('use_rollup')]
+        # Only rollup runs left in the window means an earlier plan already switched over
+        return max(raw_reads) >= Config.PLANNER_ROLLUP_MIN_READ_ROWS if raw_reads else True
+
+    def _settings(self, history: List[Dict[str, Any]], shards: int) -> Dict[str, Any]:
+        settings: Dict[str, Any] = {}
+
+        query_seconds = max(run['query_seconds'] or 0.0 for run in history)
+        settings['max_execution_time'] = int(min(max(query_seconds * 3, 300), 3600)) if query_seconds else self.DEFAULT_MAX_EXECUTION_TIME
+
+        shard_memory = max(run['peak_memory_bytes'] * run['plan'].get('shards', 1) for run in history) / shards
+        if shard_memory * self.MEMORY_HEADROOM > self.memory_budget_bytes:
+            settings['max_bytes_before_external_group_by'] = self.memory_budget_bytes // 2
+
+        if max(run['read_rows'] for run in history) < Config.PLANNER_SMALL_SCAN_ROWS:
+            settings['max_threads'] = Config.PLANNER_SMALL_SCAN_THREADS
+        return settings
+
+    def plan(self, job_name: str, shards: int = 1, use_rollup: Union[bool, str] = False,
+             rollup_supported: bool = True) -> Dict[str, Any]:
+        auto_rollup = use_rollup == 'auto' and rollup_supported
+        plan = {
+            'shards': shards,
+            'use_rollup': bool(use_rollup) and use_rollup != 'auto',
+            'settings': {'max_execution_time': self.DEFAULT_MAX_EXECUTION_TIME},
+            'history_runs': 0,
+        }
+
+        history = self.ledger.history(job_name, self.history_runs)
+        if not history:
+            logger.info(f"[{job_name}] no run history, using the configured plan")
+            return plan
+
+        plan['history_runs'] = len(history)
+        if auto_rollup:
+            plan['use_rollup'] = self._use_rollup(history)
+        plan['shards'] = self._shards(history, shards)
+        plan['settings'] = self._settings(history, plan['shards'])
+        logger.info(
+            f"[{job_name}] plan from {len(history)} runs: {plan['shards']} shard(s), "
+            f"{'rollup' if plan['use_rollup'] else 'raw scan'}, settings {plan['settings']}"
+        )
+        return plan
@@ -0,0 +1,65 @@
+import logging
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """In-process replacement for cron: runs each job at its next scheduled time,
+    never overlapping two runs of the same job, with at most max_parallel jobs at once."""
+
+    def __init__(self, jobs: List[str], next_run: Callable[[str], datetime], run_job: Callable[[str], int],
+                 max_parallel: int = 2, poll_seconds: float = 30.0):
+        self.jobs = jobs
+        self.next_run = next_run
+        self.run_job = run_job
+        self.max_parallel = max_parallel
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._running: Dict[str, Future] = {}
+
+    def stop(self, *_):
+        if not self._stop.is_set():
+            logger.info("Shutdown requested, letting running jobs finish")
+        self._stop.set()
+
+    def _run(self, job_name: str) -> int:
+        try:
+            return self.run_job(job_name)
+        except Exception as e:
+            logger.error(f"[{job_name}] crashed: {e}", exc_info=True)
+            return 1
+
+    def _dispatch(self, executor: ThreadPoolExecutor, job_name: str, due: datetime):
+        running = self._running.get(job_name)
+        if running and not running.done():
+            logger.warning(f"[{job_name}] previous run still in progress, skipping run due at {due:%H:%M:%S} UTC")
+            return
+        self._running[job_name] = executor.submit(self._run, job_name)
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        schedule = {job_name: self.next_run(job_name) for job_name in self.jobs}
+        for job_name, due in sorted(schedule.items(), key=lambda item: item[1]):
+            logger.info(f"[{job_name}] first run at {due:%Y-%m-%d %H:%M:%S} UTC")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='job')
+        try:
+            while not self._stop.is_set():
+                now = datetime.utcnow()
+                for job_name, due in sorted(schedule.items(), key=lambda item: item[1]):
+                    if due <= now:
+                        self._dispatch(executor, job_name, due)
+                        schedule[job_name] = self.next_run(job_name)
+
+                wait_seconds = (min(schedule.values()) - datetime.utcnow()).total_seconds()
+                self._stop.wait(min(max(wait_seconds, 0.5), self.poll_seconds))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Scheduler stopped")
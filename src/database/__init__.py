@@ -1,11 +1,37 @@
-from .db import ClickHouseClient, get_db_client
+from .db import ClickHouseClient, get_db_client, get_result_cache, query_settings
 from .postgres import PostgresClient, get_postgres_client
 from .redis_client import RedisClient
+from .redis_leaderboard import RedisLeaderboard
+from .prices import PriceService, PriceNotAvailableError
+from .sharding import merge_top_k, shard_filter
+from .run_ledger import RunLedger
+from .history import SnapshotHistory
+from .leaderboard import LeaderboardReader
+from .snapshot_export import SnapshotExporter, read_snapshot
+from .migrations import SchemaMigrator, SchemaVersionError
+from .token_leaderboard import TokenLeaderboardStore
+from .slice_prices import SlicePrices
 
 __all__ = [
     'ClickHouseClient',
     'get_db_client',
+    'get_result_cache',
+    'query_settings',
     'PostgresClient',
     'get_postgres_client',
-    'RedisClient'
+    'RedisClient',
+    'RedisLeaderboard',
+    'PriceService',
+    'PriceNotAvailableError',
+    'merge_top_k',
+    'shard_filter',
+    'RunLedger',
+    'SnapshotHistory',
+    'LeaderboardReader',
+    'SnapshotExporter',
+    'read_snapshot',
+    'SchemaMigrator',
+    'SchemaVersionError',
+    'TokenLeaderboardStore',
+    'SlicePrices'
 ]
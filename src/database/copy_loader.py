@@ -0,0 +1,117 @@
+import io
+import struct
+from typing import Any, Iterable, Iterator, Sequence
+import polars as pl
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('!h', -1)
+NULL_BINARY = struct.pack('!i', -1)
+
+_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+class BigInt(int):
+    """Marks an int destined for a BIGINT column; plain ints are sent as int4."""
+
+
+class ChunkReader:
+    """File-like adapter so copy_expert can pull COPY data from a generator."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer.extend(next(self._chunks))
+            except StopIteration:
+                break
+        if size < 0 or size >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+
+def _text_field(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return value.translate(_TEXT_ESCAPES)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _binary_field(value: Any) -> bytes:
+    if value is None:
+        return NULL_BINARY
+    if isinstance(value, bool):
+        return struct.pack('!i?', 1, value)
+    if isinstance(value, BigInt):
+        return struct.pack('!iq', 8, value)
+    if isinstance(value, int):
+        return struct.pack('!ii', 4, value)
+    if isinstance(value, float):
+        return struct.pack('!id', 8, value)
+    data = str(value).encode('utf-8')
+    return struct.pack('!i', len(data)) + data
+
+
+def encode_text(rows: Iterable[Sequence[Any]], rows_per_chunk: int = 1000) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append('\t'.join([_text_field(v) for v in row]))
+        if len(lines) >= rows_per_chunk:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def encode_binary(rows: Iterable[Sequence[Any]], rows_per_chunk: int = 1000) -> Iterator[bytes]:
+    yield PGCOPY_HEADER
+    chunk = bytearray()
+    pending = 0
+    for row in rows:
+        chunk += struct.pack('!h', len(row))
+        for value in row:
+            chunk += _binary_field(value)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield bytes(chunk)
+            chunk.clear()
+            pending = 0
+    yield bytes(chunk) + PGCOPY_TRAILER
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]], binary: bool = False) -> int:
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    column_list = ', '.join(columns)
+    if binary:
+        sql = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT binary)"
+        cur.copy_expert(sql, ChunkReader(encode_binary(counted())))
+    else:
+        sql = f"COPY {table} ({column_list}) FROM STDIN"
+        cur.copy_expert(sql, ChunkReader(encode_text(counted())))
+    return count
+
+
+def copy_frame(cur, table: str, columns: Sequence[str], frame: pl.DataFrame) -> int:
+    buffer = io.BytesIO()
+    frame.select(columns).write_csv(buffer, include_header=False)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return frame.height
@@ -1,11 +1,49 @@
+import contextvars
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from uuid import uuid4
 import clickhouse_connect
+from clickhouse_connect.driver import httputil
+from clickhouse_connect.driver.exceptions import OperationalError
+import polars as pl
 from ..config import Config
+from ..metrics import record, record_query, stage
+from .result_cache import ResultCache
+from .sharding import Shard
 
 logger = logging.getLogger(__name__)
 
+_settings_override: ContextVar[Dict[str, Any]] = ContextVar('clickhouse_settings', default={})
+
+
+@contextmanager
+def query_settings(settings: Dict[str, Any]) -> Iterator[None]:
+    """Apply planned ClickHouse settings to every query and command issued inside the block."""
+    token = _settings_override.set({**_settings_override.get(), **settings})
+    try:
+        yield
+    finally:
+        _settings_override.reset(token)
+
+
+_pool_manager = None
+_pool_lock = threading.Lock()
+
+
+def get_pool_manager():
+    """One keep-alive HTTP connection pool shared by the Solana and EVM ClickHouse clients."""
+    global _pool_manager
+    with _pool_lock:
+        if _pool_manager is None:
+            _pool_manager = httputil.get_pool_manager(maxsize=Config.CLICKHOUSE_POOL_SIZE, num_pools=2, block=True)
+        return _pool_manager
+
 
 class ClickHouseClient:
 
@@ -24,37 +62,260 @@ class ClickHouseClient:
                 port=Config.CLICKHOUSE_PORT,
                 username=Config.CLICKHOUSE_USER,
                 password=Config.CLICKHOUSE_PASSWORD,
-                database=database
+                database=database,
+                compress=Config.CLICKHOUSE_COMPRESSION if Config.CLICKHOUSE_COMPRESSION != 'none' else False,
+                pool_mgr=get_pool_manager()
             )
             logger.info(f'Connected to ClickHouse at {host}:{Config.CLICKHOUSE_PORT} (DB: {database})')
         except Exception as e:
             logger.error(f'Failed to connect to ClickHouse: {e}')
             raise
 
-    def execute_query_dict(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        attempts = 2
+    def _query_settings(self) -> Dict[str, Any]:
+        return {
+            'query_id': str(uuid4()),
+            'session_id': str(uuid4()),
+            'session_timeout': 900,
+            'max_execution_time': 900,
+            **_settings_override.get()
+        }
+
+    def _arrow_settings(self) -> Dict[str, Any]:
+        settings = self._query_settings()
+        if Config.CLICKHOUSE_ARROW_COMPRESSION != 'none':
+            settings['output_format_arrow_compression_method'] = Config.CLICKHOUSE_ARROW_COMPRESSION
+        return settings
+
+    @staticmethod
+    def _summary_stats(summary: Dict[str, Any]) -> Dict[str, Any]:
+        stats = {field: int(summary[field]) for field in ('read_rows', 'read_bytes', 'result_rows', 'memory_usage') if field in summary}
+        if 'elapsed_ns' in summary:
+            stats['elapsed_seconds'] = int(summary['elapsed_ns']) / 1e9
+        return stats
+
+    def _with_retry(self, run: Callable[[], Any]) -> Any:
+        attempts = Config.CLICKHOUSE_QUERY_RETRIES + 1
         for attempt in range(attempts):
             try:
-                logger.info('Executing query...')
-                settings = {
-                    'session_id': str(uuid4()),
-                    'session_timeout': 900,
-                    'max_execution_time': 900
-                }
-                result = self.client.query(query, parameters=parameters or {}, settings=settings)
-                column_names = result.column_names
-                dict_rows = [dict(zip(column_names, row)) for row in result.result_rows]
-                logger.info(f'Query completed: {len(dict_rows):,} rows')
-                return dict_rows
+                return run()
             except Exception as e:
                 msg = str(e)
-                if ('SESSION_IS_LOCKED' in msg or 'code: 373' in msg) and attempt < attempts - 1:
-                    logger.warning('Session locked, reconnecting...')
-                    self._connect()
-                    continue
+                if attempt < attempts - 1:
+                    if 'SESSION_IS_LOCKED' in msg or 'code: 373' in msg:
+                        logger.warning('Session locked, reconnecting...')
+                        self._connect()
+                        continue
+                    if isinstance(e, OperationalError):
+                        delay = 2 ** attempt
+                        logger.warning(f'ClickHouse connection error, retrying in {delay}s: {e}')
+                        record('clickhouse_query_retries', 1)
+                        time.sleep(delay)
+                        continue
                 logger.error(f'Query execution failed: {e}', exc_info=True)
                 raise
 
+    def execute_query_dict(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        def run():
+            logger.info('Executing query...')
+            settings = self._query_settings()
+            with stage('query'):
+                result = self.client.query(query, parameters=parameters or {}, settings=settings)
+            record_query(settings['query_id'], 'rows', self._summary_stats(result.summary))
+            column_names = result.column_names
+            dict_rows = [dict(zip(column_names, row)) for row in result.result_rows]
+            logger.info(f'Query completed: {len(dict_rows):,} rows')
+            return dict_rows
+
+        return self._with_retry(run)
+
+    def _query_frame(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> pl.DataFrame:
+        logger.info('Executing query (Arrow)...')
+        settings = self._arrow_settings()
+        with stage('query'):
+            table = self.client.query_arrow(query, parameters=parameters or {}, settings=settings, use_strings=True)
+            frame = pl.from_arrow(table)
+        record_query(settings['query_id'], 'arrow', {'result_rows': frame.height})
+        logger.info(f'Query completed: {frame.height:,} rows')
+        return frame
+
+    def execute_query_frame(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> pl.DataFrame:
+        return self._with_retry(lambda: self._query_frame(query, parameters))
+
+    def _execute_shard(self, build_query: Callable[[Shard], Tuple[str, Dict[str, Any]]], shard: Shard,
+                       retries: int) -> pl.DataFrame:
+        # The only retry layer for shards: every attempt gets a fresh session, and the shared
+        # client is never reconnected from a worker thread
+        query, parameters = build_query(shard)
+        for attempt in range(retries + 1):
+            try:
+                return self._query_frame(query, parameters)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f'Shard {shard[0] + 1}/{shard[1]} failed, retrying ({attempt + 1}/{retries}): {e}')
+                record('clickhouse_shard_retries', 1)
+                if isinstance(e, OperationalError):
+                    time.sleep(2 ** attempt)
+
+    def execute_query_frames_sharded(self, build_query: Callable[[Shard], Tuple[str, Dict[str, Any]]], shards: int,
+                                     max_parallel: Optional[int] = None, retries: Optional[int] = None) -> List[pl.DataFrame]:
+        """Run build_query once per wallet-hash shard with bounded concurrency; a failed shard is retried on its own."""
+        max_parallel = max_parallel or Config.CLICKHOUSE_SHARD_PARALLELISM
+        retries = Config.CLICKHOUSE_SHARD_RETRIES if retries is None else retries
+        logger.info(f'Executing query in {shards} wallet shards ({max_parallel} in parallel)...')
+        with ThreadPoolExecutor(max_workers=min(max_parallel, shards), thread_name_prefix='clickhouse-shard') as executor:
+            # Each shard runs in a copy of the caller's context so its query stats land in the active run
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._execute_shard, build_query, (index, shards), retries)
+                for index in range(shards)
+            ]
+            return [future.result() for future in futures]
+
+    def _stream_blocks(self, open_stream: Callable[[], Any], to_blocks: Callable[[Any], Iterator[Any]],
+                       prefetch_blocks: int) -> Iterator[Any]:
+        blocks: queue.Queue = queue.Queue(maxsize=prefetch_blocks)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                with open_stream() as stream:
+                    for block in to_blocks(stream):
+                        if not put(block):
+                            return
+                put(done)
+            except Exception as e:
+                put(e)
+
+        logger.info('Streaming query...')
+        producer = threading.Thread(target=produce, name='clickhouse-stream', daemon=True)
+        producer.start()
+        total_rows = 0
+        try:
+            while True:
+                with stage('query'):
+                    item = blocks.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    logger.error(f'Query streaming failed: {item}')
+                    raise item
+                total_rows += len(item)
+                yield item
+            logger.info(f'Query streamed: {total_rows:,} rows')
+        finally:
+            stop.set()
+            producer.join()
+
+    def stream_query_dict(self, query: str, parameters: Optional[Dict[str, Any]] = None,
+                          prefetch_blocks: int = 2) -> Iterator[List[Dict[str, Any]]]:
+        def dict_blocks(stream):
+            column_names = stream.source.column_names
+            for block in stream:
+                yield [dict(zip(column_names, row)) for row in block]
+
+        settings = self._query_settings()
+        record_query(settings['query_id'], 'row_stream')
+        return self._stream_blocks(
+            lambda: self.client.query_row_block_stream(query, parameters=parameters or {}, settings=settings),
+            dict_blocks,
+            prefetch_blocks,
+        )
+
+    def stream_query_frames(self, query: str, parameters: Optional[Dict[str, Any]] = None,
+                            prefetch_blocks: int = 2) -> Iterator[pl.DataFrame]:
+        settings = self._arrow_settings()
+        record_query(settings['query_id'], 'arrow_stream')
+        return self._stream_blocks(
+            lambda: self.client.query_arrow_stream(query, parameters=parameters or {}, settings=settings, use_strings=True),
+            lambda stream: (pl.from_arrow(batch) for batch in stream),
+            prefetch_blocks,
+        )
+
+    def source_watermark(self, table: str, where: str = '1', window_days: int = 31) -> Dict[str, Any]:
+        database, name = table.replace('"', '').split('.')
+        rows = self.execute_query_dict(f"""
+            SELECT
+                (SELECT max(block_time) FROM {table}
+                 WHERE block_time >= now() - INTERVAL {window_days} DAY AND {where}) AS max_block_time,
+                (SELECT count() FROM system.parts
+                 WHERE database = '{database}' AND table = '{name}' AND active
+                   AND (max_time >= now() - INTERVAL {window_days} DAY OR max_time = 0)) AS active_parts
+        """)
+        return rows[0]
+
+    def execute_query_frame_cached(self, query: str, cache: Optional[ResultCache], identity: str,
+                                   watermark: Dict[str, Any], execute: Optional[Callable[[], pl.DataFrame]] = None,
+                                   parameters: Optional[Dict[str, Any]] = None) -> pl.DataFrame:
+        execute = execute or (lambda: self.execute_query_frame(query, parameters))
+        if cache is None:
+            return execute()
+        key = cache.key(identity, watermark)
+        frame = cache.get(key)
+        if frame is None:
+            frame = execute()
+            cache.put(key, frame)
+        else:
+            record('result_cache_hits', 1)
+        return frame
+
+    def stream_query_frames_cached(self, query: str, cache: Optional[ResultCache], identity: str,
+                                   watermark: Dict[str, Any],
+                                   parameters: Optional[Dict[str, Any]] = None) -> Iterator[pl.DataFrame]:
+        if cache is None:
+            yield from self.stream_query_frames(query, parameters)
+            return
+        key = cache.key(identity, watermark)
+        parquet = cache.open_stream(key)
+        if parquet is not None:
+            record('result_cache_hits', 1)
+            yield from cache.read_stream(parquet)
+            return
+
+        # Each block goes to the cache entry as its own row group, never the whole result at once
+        yield from cache.put_stream(key, self.stream_query_frames(query, parameters))
+
+    def fetch_query_stats(self, query_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not query_ids:
+            return {}
+        try:
+            try:
+                self.client.command('SYSTEM FLUSH LOGS')
+            except Exception as e:
+                logger.debug(f'SYSTEM FLUSH LOGS not permitted, query_log may lag: {e}')
+            result = self.client.query("""
+                SELECT
+                    query_id,
+                    read_rows,
+                    read_bytes,
+                    result_rows,
+                    memory_usage,
+                    query_duration_ms / 1000 AS elapsed_seconds
+                FROM system.query_log
+                WHERE event_date >= yesterday() AND type = 'QueryFinish' AND query_id IN %(query_ids)s
+            """, parameters={'query_ids': query_ids})
+        except Exception as e:
+            logger.warning(f'Failed to read query statistics from system.query_log: {e}')
+            return {}
+        return {row[0]: dict(zip(result.column_names[1:], row[1:])) for row in result.result_rows}
+
+    def execute_command(self, query: str, parameters: Optional[Dict[str, Any]] = None):
+        try:
+            settings = {'max_execution_time': 900, **_settings_override.get()}
+            return self.client.command(query, parameters=parameters, settings=settings)
+        except Exception as e:
+            logger.error(f'Command execution failed: {e}', exc_info=True)
+            raise
+
     def close(self):
         if self.client:
             self.client.close()
@@ -65,6 +326,20 @@ _db_client = None
 _db_client_evm = None
 
 
+_result_cache = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    global _result_cache
+    if _result_cache is None and Config.RESULT_CACHE_DIR:
+        _result_cache = ResultCache(
+            Config.RESULT_CACHE_DIR,
+            max_bytes=Config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+            max_age_seconds=Config.RESULT_CACHE_MAX_AGE_SECONDS,
+        )
+    return _result_cache
+
+
 def get_db_client(use_evm_host: bool = False) -> ClickHouseClient:
     global _db_client, _db_client_evm
     
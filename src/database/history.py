@@ -0,0 +1,130 @@
+import logging
+from datetime import datetime, time, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+from .partition_swap import PartitionKey, PartitionSwap
+from .slice_prices import SlicePrices
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotHistory:
+    """Append-only history of every published leaderboard generation.
+
+    smartmoney_history is range-partitioned by UTC day on snapshot_at and each day
+    list-partitioned by chain, so per-wallet lookups over a time window prune to a
+    few leaves. Rows drop the live tables' id, fingerprint and created_at columns and
+    store Solana under the native column names, with USD values priced at the slice
+    price like every other reader. Retention detaches and drops whole day partitions.
+    """
+
+    TABLE_NAME = 'smartmoney_history'
+    LOCK_ID = 0x736d6868  # 'smhh'
+
+    COLUMNS = (
+        'chain', 'refresh_type', 'wallet_address',
+        'transactions_7d', 'buys_7d', 'sells_7d', 'unique_tokens_7d',
+        'realized_pnl_native_7d', 'realized_pnl_usd_7d', 'winrate_percent_7d',
+        'transactions_30d', 'buys_30d', 'sells_30d', 'unique_tokens_30d',
+        'realized_pnl_native_30d', 'realized_pnl_usd_30d', 'winrate_percent_30d',
+        'native_price_usd',
+    )
+
+    def __init__(self, conn, retention_days: int):
+        self.conn = conn
+        self.retention_days = retention_days
+
+    def _day_partition(self, day) -> str:
+        return f"{self.TABLE_NAME}__d{day:%Y%m%d}"
+
+    def _ensure_partition(self, cur, day, chain: str) -> str:
+        parent = self._day_partition(day)
+        leaf = f"{parent}__{PartitionSwap._check_identifier(chain)}"
+        start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (leaf,))
+        if cur.fetchone()[0]:
+            return leaf
+
+        # Serializes partition creation between jobs publishing on the same day
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (self.LOCK_ID,))
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {parent} PARTITION OF {self.TABLE_NAME} "
+            f"FOR VALUES FROM (%s) TO (%s) PARTITION BY LIST (chain)",
+            (start, start + timedelta(days=1))
+        )
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {leaf} PARTITION OF {parent} FOR VALUES IN (%s)", (chain,))
+        return leaf
+
+    def _select_list(self, native: str, chain: Optional[str]) -> str:
+        expressions = []
+        for column in self.COLUMNS:
+            if column == 'chain' and chain is not None:
+                expressions.append('%s')
+            elif column == 'native_price_usd':
+                expressions.append(SlicePrices.expression(f'{native}_price_usd', native))
+            else:
+                expressions.append(SlicePrices.expression(column.replace('_native_', f'_{native}_'), native))
+        return ', '.join(expressions)
+
+    def append(self, source_table: str, key_columns: Tuple[str, ...], keys: Sequence[PartitionKey],
+               native: str = 'native', chain: Optional[str] = None) -> int:
+        """Copy the freshly published slices of source_table into the history table.
+
+        chain is the literal chain of single-chain sources, whose rows have no chain column.
+        """
+        if not keys:
+            return 0
+
+        appended = 0
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT NOW()")
+                snapshot_at = cur.fetchone()[0]
+                day = snapshot_at.astimezone(timezone.utc).date()
+
+                where = ' AND '.join(f"t.{column} = %s" for column in key_columns)
+                select_list = self._select_list(native, chain)
+                join = SlicePrices.join('%s' if chain is not None else 't.chain')
+                for key in keys:
+                    labels = dict(zip(key_columns, key))
+                    key_chain = labels.get('chain', chain)
+                    self._ensure_partition(cur, day, key_chain)
+                    cur.execute(f"""
+                        INSERT INTO {self.TABLE_NAME} (snapshot_at, {', '.join(self.COLUMNS)})
+                        SELECT %s, {select_list} FROM {source_table} AS t {join} WHERE {where}
+                    """, (snapshot_at, *([chain, chain] if chain is not None else []), *key))
+                    appended += cur.rowcount
+                    logger.info(f'Appended {cur.rowcount:,} rows of {source_table} ({"/".join(key)}) to {self.TABLE_NAME}')
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"Failed to append {source_table} snapshot to {self.TABLE_NAME}: {e}")
+            return 0
+
+        self.apply_retention()
+        return appended
+
+    def apply_retention(self) -> List[str]:
+        cutoff = datetime.now(timezone.utc).date() - timedelta(days=self.retention_days)
+        expired = self._day_partition(cutoff)
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relname
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s)
+                """, (self.TABLE_NAME,))
+                # Day partition names sort chronologically, anything below the cutoff day is out of retention
+                dropped = sorted(row[0] for row in cur.fetchall() if row[0] < expired)
+                for partition in dropped:
+                    cur.execute(f"ALTER TABLE {self.TABLE_NAME} DETACH PARTITION {partition}")
+                    cur.execute(f"DROP TABLE {partition}")
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"Failed to apply {self.TABLE_NAME} retention: {e}")
+            return []
+
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} {self.TABLE_NAME} partition(s) older than {cutoff}: {', '.join(dropped)}")
+        return dropped
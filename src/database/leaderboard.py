@@ -0,0 +1,156 @@
+import json
+import logging
+import select
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import polars as pl
+from ..config import Config
+from .postgres import PostgresClient, connect
+
+logger = logging.getLogger(__name__)
+
+SliceKey = Tuple[str, str]
+
+
+class LeaderboardReader:
+    """In-memory read path for the published smartmoney_sol / smartmoney_evm leaderboards.
+
+    Each (chain, refresh_type) slice is loaded once, with a descending row order per
+    sort key and a wallet index, and then served from memory. A background LISTEN on
+    the refresh channel drops a slice when PostgresClient publishes a new generation
+    of it, so the next read reloads it; readers never poll Postgres between refreshes.
+    """
+
+    SORT_KEYS = ('realized_pnl_usd_30d', 'realized_pnl_usd_7d', 'winrate_percent_30d')
+    SOLANA_CHAIN = PostgresClient.SOURCES[PostgresClient.TABLE_NAME]['chain']
+
+    def __init__(self, connection_factory: Callable = connect, channel: Optional[str] = None,
+                 poll_interval: float = 5.0):
+        self.connection_factory = connection_factory
+        self.channel = channel or Config.POSTGRES_NOTIFY_CHANNEL
+        self.poll_interval = poll_interval
+        self._conn = None
+        self._slices: Dict[SliceKey, Dict[str, Any]] = {}
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+
+    def start(self) -> 'LeaderboardReader':
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='leaderboard-listener', daemon=True)
+            self._listener.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=self.poll_interval * 2)
+            self._listener = None
+        with self._load_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _source(self, chain: str) -> Tuple[str, Tuple[str, ...]]:
+        if chain == self.SOLANA_CHAIN:
+            return PostgresClient.TABLE_NAME, PostgresClient.SOL_COLUMNS
+        return PostgresClient.EVM_TABLE_NAME, PostgresClient.EVM_COLUMNS
+
+    def _fetch(self, key: SliceKey) -> pl.DataFrame:
+        chain, refresh_type = key
+        table, columns = self._source(chain)
+        columns = columns + ('created_at',)
+        query = PostgresClient.slice_select(table, columns)
+
+        for attempt in range(2):
+            if self._conn is None or self._conn.closed:
+                self._conn = self.connection_factory(autocommit=True)
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute(query, (chain, refresh_type))
+                    rows = cur.fetchall()
+                break
+            except Exception as e:
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+                logger.warning(f"Leaderboard read of {chain}/{refresh_type} failed, reconnecting: {e}")
+        return pl.DataFrame(rows, schema=list(columns), orient='row')
+
+    def _slice(self, chain: str, refresh_type: str) -> Dict[str, Any]:
+        key = (chain, refresh_type)
+        cached = self._slices.get(key)
+        if cached is not None:
+            return cached
+
+        with self._load_lock:
+            cached = self._slices.get(key)
+            if cached is not None:
+                return cached
+            frame = self._fetch(key)
+            cached = {
+                'frame': frame,
+                'order': {column: frame[column].arg_sort(descending=True, nulls_last=True) for column in self.SORT_KEYS},
+                'wallets': {wallet: row for row, wallet in enumerate(frame['wallet_address'].to_list())},
+            }
+            self._slices[key] = cached
+            logger.info(f"Loaded {frame.height:,} {chain}/{refresh_type} leaderboard rows")
+            return cached
+
+    def top(self, chain: str, refresh_type: str = 'daily', sort_by: str = 'realized_pnl_usd_30d',
+            limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort_by} (expected one of {', '.join(self.SORT_KEYS)})")
+        cached = self._slice(chain, refresh_type)
+        rows = cached['order'][sort_by].slice(offset, limit)
+        return cached['frame'][rows].to_dicts()
+
+    def wallet(self, chain: str, wallet_address: str, refresh_type: str = 'daily') -> Optional[Dict[str, Any]]:
+        cached = self._slice(chain, refresh_type)
+        row = cached['wallets'].get(wallet_address)
+        return cached['frame'].row(row, named=True) if row is not None else None
+
+    def count(self, chain: str, refresh_type: str = 'daily') -> int:
+        return self._slice(chain, refresh_type)['frame'].height
+
+    def invalidate(self, chain: Optional[str] = None, refresh_type: Optional[str] = None):
+        # Waits for an in-flight load, so a slice read before the refresh committed is dropped too
+        with self._load_lock:
+            for key in list(self._slices):
+                if (chain is None or key[0] == chain) and (refresh_type is None or key[1] == refresh_type):
+                    del self._slices[key]
+
+    def _on_notify(self, payload: str):
+        try:
+            refreshed = json.loads(payload)
+            chain, refresh_type = refreshed['chain'], refreshed['refresh_type']
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring malformed refresh notification {payload!r}: {e}")
+            return
+        logger.info(f"Refresh of {chain}/{refresh_type} published, dropping cached leaderboard")
+        self.invalidate(chain, refresh_type)
+
+    def _listen(self):
+        conn = None
+        while not self._stop.is_set():
+            try:
+                if conn is None:
+                    conn = self.connection_factory(autocommit=True)
+                    with conn.cursor() as cur:
+                        cur.execute(f'LISTEN "{self.channel}"')
+                    # Refreshes published while not listening were missed
+                    self.invalidate()
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    self._on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"Leaderboard listener on {self.channel} failed, reconnecting: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                self._stop.wait(self.poll_interval)
+        if conn is not None:
+            conn.close()
@@ -0,0 +1,259 @@
+import logging
+from typing import Callable, List, Tuple
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaVersionError(Exception):
+    pass
+
+
+def _smartmoney_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_sol (
+        id SERIAL PRIMARY KEY,
+        wallet_address VARCHAR(128) NOT NULL,
+        transactions_7d INTEGER DEFAULT 0,
+        buys_7d INTEGER DEFAULT 0,
+        sells_7d INTEGER DEFAULT 0,
+        unique_tokens_7d INTEGER DEFAULT 0,
+        realized_pnl_sol_7d DOUBLE PRECISION DEFAULT 0,
+        realized_pnl_usd_7d DOUBLE PRECISION DEFAULT 0,
+        winrate_percent_7d DOUBLE PRECISION DEFAULT 0,
+        transactions_30d INTEGER DEFAULT 0,
+        buys_30d INTEGER DEFAULT 0,
+        sells_30d INTEGER DEFAULT 0,
+        unique_tokens_30d INTEGER DEFAULT 0,
+        realized_pnl_sol_30d DOUBLE PRECISION DEFAULT 0,
+        realized_pnl_usd_30d DOUBLE PRECISION DEFAULT 0,
+        winrate_percent_30d DOUBLE PRECISION DEFAULT 0,
+        sol_price_usd DOUBLE PRECISION DEFAULT 0,
+        refresh_type VARCHAR(16) DEFAULT 'hourly',
+        row_fingerprint BIGINT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    ALTER TABLE smartmoney_sol ADD COLUMN IF NOT EXISTS row_fingerprint BIGINT;
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_wallet ON smartmoney_sol (wallet_address);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_refresh_type ON smartmoney_sol (refresh_type);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_pnl_30d ON smartmoney_sol (realized_pnl_usd_30d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_pnl_7d ON smartmoney_sol (realized_pnl_usd_7d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_winrate_30d ON smartmoney_sol (winrate_percent_30d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_created ON smartmoney_sol (created_at DESC);
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_evm (
+        id SERIAL PRIMARY KEY,
+        chain VARCHAR(32) NOT NULL,
+        wallet_address VARCHAR(128) NOT NULL,
+        transactions_7d INTEGER DEFAULT 0,
+        buys_7d INTEGER DEFAULT 0,
+        sells_7d INTEGER DEFAULT 0,
+        unique_tokens_7d INTEGER DEFAULT 0,
+        realized_pnl_native_7d DOUBLE PRECISION DEFAULT 0,
+        realized_pnl_usd_7d DOUBLE PRECISION DEFAULT 0,
+        winrate_percent_7d DOUBLE PRECISION DEFAULT 0,
+        transactions_30d INTEGER DEFAULT 0,
+        buys_30d INTEGER DEFAULT 0,
+        sells_30d INTEGER DEFAULT 0,
+        unique_tokens_30d INTEGER DEFAULT 0,
+        realized_pnl_native_30d DOUBLE PRECISION DEFAULT 0,
+        realized_pnl_usd_30d DOUBLE PRECISION DEFAULT 0,
+        winrate_percent_30d DOUBLE PRECISION DEFAULT 0,
+        native_price_usd DOUBLE PRECISION DEFAULT 0,
+        refresh_type VARCHAR(16) DEFAULT 'hourly',
+        row_fingerprint BIGINT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    ALTER TABLE smartmoney_evm ADD COLUMN IF NOT EXISTS row_fingerprint BIGINT;
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_wallet ON smartmoney_evm (chain, wallet_address);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_refresh_type ON smartmoney_evm (refresh_type);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_pnl_30d ON smartmoney_evm (chain, realized_pnl_usd_30d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_pnl_7d ON smartmoney_evm (chain, realized_pnl_usd_7d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_winrate_30d ON smartmoney_evm (chain, winrate_percent_30d DESC);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_created ON smartmoney_evm (created_at DESC);
+    """)
+
+
+def _run_ledger(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_run_ledger (
+        id BIGSERIAL PRIMARY KEY,
+        job_name VARCHAR(128) NOT NULL,
+        chain VARCHAR(64),
+        refresh_type VARCHAR(16),
+        success BOOLEAN NOT NULL,
+        started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        duration_seconds DOUBLE PRECISION,
+        query_seconds DOUBLE PRECISION,
+        queries INTEGER,
+        read_rows BIGINT,
+        read_bytes BIGINT,
+        peak_memory_bytes BIGINT,
+        result_rows BIGINT,
+        plan JSONB
+    );
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_run_ledger_job ON smartmoney_run_ledger (job_name, started_at DESC);
+    """)
+
+
+def _snapshot_history(cur):
+    # Fixed-width columns first so rows pack without alignment padding
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_history (
+        snapshot_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        realized_pnl_native_7d DOUBLE PRECISION,
+        realized_pnl_usd_7d DOUBLE PRECISION,
+        realized_pnl_native_30d DOUBLE PRECISION,
+        realized_pnl_usd_30d DOUBLE PRECISION,
+        transactions_7d INTEGER,
+        buys_7d INTEGER,
+        sells_7d INTEGER,
+        unique_tokens_7d INTEGER,
+        transactions_30d INTEGER,
+        buys_30d INTEGER,
+        sells_30d INTEGER,
+        unique_tokens_30d INTEGER,
+        winrate_percent_7d REAL,
+        winrate_percent_30d REAL,
+        native_price_usd REAL,
+        chain VARCHAR(32) NOT NULL,
+        refresh_type VARCHAR(16) NOT NULL,
+        wallet_address VARCHAR(128) NOT NULL
+    ) PARTITION BY RANGE (snapshot_at);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_history_snapshot ON smartmoney_history USING BRIN (snapshot_at);
+    CREATE INDEX IF NOT EXISTS idx_smartmoney_history_wallet ON smartmoney_history (wallet_address, snapshot_at);
+    """)
+
+
+def _token_outputs(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_token_leaderboard (
+        chain VARCHAR(32) NOT NULL,
+        refresh_type VARCHAR(16) NOT NULL,
+        traded_token VARCHAR(128) NOT NULL,
+        rank INTEGER NOT NULL,
+        wallet_address VARCHAR(128) NOT NULL,
+        wallet_rank INTEGER NOT NULL,
+        transactions_30d INTEGER,
+        buys_30d INTEGER,
+        sells_30d INTEGER,
+        realized_pnl_native_7d DOUBLE PRECISION,
+        realized_pnl_usd_7d DOUBLE PRECISION,
+        realized_pnl_native_30d DOUBLE PRECISION,
+        realized_pnl_usd_30d DOUBLE PRECISION,
+        native_price_usd DOUBLE PRECISION,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (chain, refresh_type, traded_token, rank)
+    );
+    CREATE TABLE IF NOT EXISTS smartmoney_wallet_top_tokens (
+        chain VARCHAR(32) NOT NULL,
+        refresh_type VARCHAR(16) NOT NULL,
+        wallet_address VARCHAR(128) NOT NULL,
+        top_tokens TEXT[] NOT NULL,
+        top_tokens_pnl_native_30d DOUBLE PRECISION[] NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (chain, refresh_type, wallet_address)
+    );
+    """)
+
+
+def _slice_prices(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS smartmoney_slice_prices (
+        chain VARCHAR(32) NOT NULL,
+        refresh_type VARCHAR(16) NOT NULL,
+        native_price_usd DOUBLE PRECISION NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (chain, refresh_type)
+    );
+    """)
+
+
+# Append-only: a released migration is never edited, schema changes get a new version.
+# Version 1 is idempotent so databases created before versioning adopt it in place.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'smartmoney_sol and smartmoney_evm tables with indexes', _smartmoney_tables),
+    (2, 'smartmoney_run_ledger table', _run_ledger),
+    (3, 'smartmoney_history table partitioned by day and chain', _snapshot_history),
+    (4, 'smartmoney_token_leaderboard and smartmoney_wallet_top_tokens tables', _token_outputs),
+    (5, 'smartmoney_slice_prices table', _slice_prices),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+class SchemaMigrator:
+    """Applies the numbered Postgres migrations, recording each in a schema-version table.
+
+    Job startup only reads the current version; DDL runs when it is behind, under an
+    advisory lock so concurrent workers never apply the same migration twice.
+    """
+
+    VERSION_TABLE = 'smartmoney_schema_version'
+    LOCK_ID = 0x736d6d76  # 'smmv'
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def current_version(self) -> int:
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {self.VERSION_TABLE}")
+                version = cur.fetchone()[0]
+            self.conn.commit()
+            return version
+        except psycopg2.errors.UndefinedTable:
+            self.conn.rollback()
+            return 0
+
+    def migrate(self) -> List[int]:
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (self.LOCK_ID,))
+                cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.VERSION_TABLE} (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                )
+                """)
+                cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {self.VERSION_TABLE}")
+                current = cur.fetchone()[0]
+
+                applied = []
+                for version, description, apply in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    logger.info(f"Applying schema migration {version}: {description}")
+                    apply(cur)
+                    cur.execute(
+                        f"INSERT INTO {self.VERSION_TABLE} (version, description) VALUES (%s, %s)",
+                        (version, description)
+                    )
+                    applied.append(version)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Schema migration failed: {e}")
+            raise
+
+        if applied:
+            logger.info(f"Schema migrated to version {applied[-1]}")
+        else:
+            logger.info(f"Schema already at version {current}")
+        return applied
+
+    def ensure_current(self, auto_migrate: bool = True):
+        version = self.current_version()
+        if version == LATEST_VERSION:
+            return
+        if version > LATEST_VERSION:
+            raise SchemaVersionError(
+                f"Database schema version {version} is newer than this worker ({LATEST_VERSION}), refusing to run"
+            )
+        if not auto_migrate:
+            raise SchemaVersionError(
+                f"Database schema is at version {version}, expected {LATEST_VERSION}: run `python worker_scheduled.py migrate`"
+            )
+        self.migrate()
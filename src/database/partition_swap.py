@@ -0,0 +1,170 @@
+import logging
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PartitionKey = Tuple[str, ...]
+
+_IDENTIFIER_RE = re.compile(r'^[a-z0-9_]+$')
+
+
+class PartitionSwap:
+    """Publishes each generation of a (chain, refresh_type) slice as a fresh list partition.
+
+    New rows are loaded and indexed in a standalone leaf table, then swapped in
+    with DETACH/ATTACH in one short transaction and the old leaf is dropped.
+    """
+
+    def __init__(self, conn, table: str, partition_keys: Sequence[str], indexes: List[Tuple[str, str]],
+                 lock_timeout_ms: int = 5000, swap_attempts: int = 3):
+        self.conn = conn
+        self.table = table
+        self.partition_keys = tuple(partition_keys)
+        self.indexes = indexes
+        self.lock_timeout_ms = lock_timeout_ms
+        self.swap_attempts = swap_attempts
+        self._layout_ready = False
+
+    @staticmethod
+    def _check_identifier(value: str) -> str:
+        if not _IDENTIFIER_RE.match(value):
+            raise ValueError(f"Partition value is not a safe identifier: {value!r}")
+        return value
+
+    def _partition_name(self, key: PartitionKey) -> str:
+        return '__'.join([self.table] + [self._check_identifier(v) for v in key])
+
+    def _default_partition(self, cur, parent: str):
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {parent}__default PARTITION OF {parent} DEFAULT")
+
+    def _parent_for(self, cur, key: PartitionKey) -> str:
+        parent = self.table
+        for depth, value in enumerate(key[:-1]):
+            child = self._partition_name(key[:depth + 1])
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {child} PARTITION OF {parent} FOR VALUES IN (%s) "
+                f"PARTITION BY LIST ({self.partition_keys[depth + 1]})",
+                (value,)
+            )
+            self._default_partition(cur, child)
+            parent = child
+        return parent
+
+    def _attached_leaves(self, cur, parent: str, key: PartitionKey) -> List[str]:
+        prefix = f"{self._partition_name(key)}__g"
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s) AND left(c.relname, length(%s)) = %s
+        """, (parent, prefix, prefix))
+        return [row[0] for row in cur.fetchall()]
+
+    def ensure_layout(self):
+        if self._layout_ready:
+            return
+
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (self.table,))
+                row = cur.fetchone()
+                if row and row[0] == 'r':
+                    self._convert_legacy_table(cur)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f'Failed to prepare partitioned layout for {self.table}: {e}')
+            raise
+        self._layout_ready = True
+
+    def _convert_legacy_table(self, cur):
+        legacy = f"{self.table}__legacy"
+        key_columns = ', '.join(self.partition_keys)
+        logger.info(f'Converting {self.table} to a list-partitioned table on ({key_columns})')
+
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (self.table,))
+        sequence = cur.fetchone()[0]
+        cur.execute(f"SELECT DISTINCT {key_columns} FROM {self.table} WHERE {' AND '.join(f'{k} IS NOT NULL' for k in self.partition_keys)}")
+        keys = [tuple(row) for row in cur.fetchall()]
+
+        cur.execute(f"ALTER TABLE {self.table} RENAME TO {legacy}")
+        cur.execute(f"CREATE TABLE {self.table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY LIST ({self.partition_keys[0]})")
+        if sequence:
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {self.table}.id")
+        self._default_partition(cur, self.table)
+
+        leaves = {}
+        for key in keys:
+            leaf = self.create_leaf(cur, key)
+            where = ' AND '.join(f"{k} = %s" for k in self.partition_keys)
+            cur.execute(f"INSERT INTO {leaf} SELECT * FROM {legacy} WHERE {where}", key)
+            self.finalize_leaf(cur, leaf, key)
+            leaves[key] = leaf
+
+        cur.execute(f"DROP TABLE {legacy}")
+        cur.execute(f"ALTER TABLE {self.table} ADD PRIMARY KEY (id, {key_columns})")
+        for name, columns in self.indexes:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} {columns}")
+        for key, leaf in leaves.items():
+            parent = self._parent_for(cur, key)
+            cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {leaf} FOR VALUES IN (%s)", (key[-1],))
+
+    def create_leaf(self, cur, key: PartitionKey) -> str:
+        generation = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+        leaf = f"{self._partition_name(key)}__g{generation}"
+        cur.execute(f"CREATE TABLE {leaf} (LIKE {self.table} INCLUDING DEFAULTS)")
+        return leaf
+
+    def finalize_leaf(self, cur, leaf: str, key: PartitionKey):
+        for column, value in zip(self.partition_keys, key):
+            cur.execute(f"ALTER TABLE {leaf} ADD CHECK ({column} IS NOT NULL AND {column} = %s)", (value,))
+        cur.execute(f"ALTER TABLE {leaf} ADD PRIMARY KEY (id, {', '.join(self.partition_keys)})")
+        for _, columns in self.indexes:
+            cur.execute(f"CREATE INDEX ON {leaf} {columns}")
+        cur.execute(f"ANALYZE {leaf}")
+
+    def swap(self, leaves: Dict[PartitionKey, str], on_swap: Optional[Callable[[Any], None]] = None):
+        """Attach leaves in place of the current generations; on_swap(cur) runs in the same transaction."""
+        old_leaves: List[str] = []
+        for attempt in range(self.swap_attempts):
+            old_leaves = []
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(f"SET LOCAL lock_timeout = '{int(self.lock_timeout_ms)}ms'")
+                    for key, leaf in leaves.items():
+                        parent = self._parent_for(cur, key)
+                        for old in self._attached_leaves(cur, parent, key):
+                            cur.execute(f"ALTER TABLE {parent} DETACH PARTITION {old}")
+                            old_leaves.append(old)
+                        where = ' AND '.join(f"{k} = %s" for k in self.partition_keys)
+                        cur.execute(f"DELETE FROM {parent}__default WHERE {where}", key)
+                        cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {leaf} FOR VALUES IN (%s)", (key[-1],))
+                    if on_swap is not None:
+                        on_swap(cur)
+                self.conn.commit()
+                break
+            except Exception as e:
+                self.conn.rollback()
+                if attempt < self.swap_attempts - 1 and 'lock timeout' in str(e):
+                    logger.warning(f'Partition swap on {self.table} hit lock timeout, retrying...')
+                    continue
+                logger.error(f'Partition swap on {self.table} failed: {e}')
+                self.drop(list(leaves.values()))
+                raise
+
+        logger.info(f"Swapped in {len(leaves)} partition(s) of {self.table}, dropping {len(old_leaves)} old")
+        self.drop(old_leaves)
+
+    def drop(self, tables: List[str]):
+        if not tables:
+            return
+        try:
+            with self.conn.cursor() as cur:
+                for table in tables:
+                    cur.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f'Failed to drop partitions {", ".join(tables)}: {e}')
@@ -1,178 +1,535 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple, Union
+import polars as pl
 import psycopg2
 from psycopg2.extras import execute_values
 from ..config import Config
+from ..metrics import record, stage
+from .copy_loader import BigInt, copy_frame, copy_rows
+from .history import SnapshotHistory
+from .slice_prices import SlicePrices
+from .snapshot_export import SnapshotExporter
+from .token_leaderboard import TokenLeaderboardStore
+from .migrations import SchemaMigrator
+from .partition_swap import PartitionSwap, PartitionKey
 
 logger = logging.getLogger(__name__)
 
+Rows = Union[Iterable[Tuple], pl.DataFrame]
+
+
+def connect(autocommit: bool = False):
+    try:
+        if Config.POSTGRES_CONNECTION_STRING:
+            conn = psycopg2.connect(Config.POSTGRES_CONNECTION_STRING)
+        else:
+            conn = psycopg2.connect(
+                host=Config.POSTGRES_HOST,
+                port=Config.POSTGRES_PORT,
+                user=Config.POSTGRES_USER,
+                password=Config.POSTGRES_PASSWORD,
+                database=Config.POSTGRES_DATABASE
+            )
+        conn.autocommit = autocommit
+        logger.info(f'Connected to PostgreSQL at {Config.POSTGRES_HOST}:{Config.POSTGRES_PORT}')
+        return conn
+    except Exception as e:
+        logger.error(f'Failed to connect to PostgreSQL: {e}')
+        raise
+
 
 class PostgresClient:
 
     TABLE_NAME = "smartmoney_sol"
     EVM_TABLE_NAME = "smartmoney_evm"
 
-    def __init__(self):
+    SOL_COLUMNS = (
+        'wallet_address', 'transactions_7d', 'buys_7d', 'sells_7d', 'unique_tokens_7d',
+        'realized_pnl_sol_7d', 'realized_pnl_usd_7d', 'winrate_percent_7d',
+        'transactions_30d', 'buys_30d', 'sells_30d', 'unique_tokens_30d',
+        'realized_pnl_sol_30d', 'realized_pnl_usd_30d', 'winrate_percent_30d',
+        'sol_price_usd', 'refresh_type',
+    )
+    EVM_COLUMNS = (
+        'chain', 'wallet_address', 'transactions_7d', 'buys_7d', 'sells_7d', 'unique_tokens_7d',
+        'realized_pnl_native_7d', 'realized_pnl_usd_7d', 'winrate_percent_7d',
+        'transactions_30d', 'buys_30d', 'sells_30d', 'unique_tokens_30d',
+        'realized_pnl_native_30d', 'realized_pnl_usd_30d', 'winrate_percent_30d',
+        'native_price_usd', 'refresh_type',
+    )
+
+    SOL_INDEXES = [
+        ('idx_smartmoney_sol_wallet', '(wallet_address)'),
+        ('idx_smartmoney_sol_refresh_type', '(refresh_type)'),
+        ('idx_smartmoney_sol_pnl_30d', '(realized_pnl_usd_30d DESC)'),
+        ('idx_smartmoney_sol_pnl_7d', '(realized_pnl_usd_7d DESC)'),
+        ('idx_smartmoney_sol_winrate_30d', '(winrate_percent_30d DESC)'),
+        ('idx_smartmoney_sol_created', '(created_at DESC)'),
+    ]
+    EVM_INDEXES = [
+        ('idx_smartmoney_evm_chain_wallet', '(chain, wallet_address)'),
+        ('idx_smartmoney_evm_refresh_type', '(refresh_type)'),
+        ('idx_smartmoney_evm_chain_pnl_30d', '(chain, realized_pnl_usd_30d DESC)'),
+        ('idx_smartmoney_evm_chain_pnl_7d', '(chain, realized_pnl_usd_7d DESC)'),
+        ('idx_smartmoney_evm_chain_winrate_30d', '(chain, winrate_percent_30d DESC)'),
+        ('idx_smartmoney_evm_created', '(created_at DESC)'),
+    ]
+
+    # Native column prefix and literal chain of each live table, for history and refresh notifications
+    SOURCES = {
+        TABLE_NAME: {'native': 'sol', 'chain': 'solana'},
+        EVM_TABLE_NAME: {'native': 'native'},
+    }
+
+    LOADERS = ('values', 'copy_text', 'copy_binary')
+    PUBLISH_MODES = ('delete', 'swap', 'delta')
+
+    def __init__(self, migrate: bool = False):
         self.conn = None
+        self.loader = 'values'
+        self.publish_mode = 'delete'
+        self.delta_stats: Dict[str, Dict[str, int]] = {}
+        self.set_loader(Config.POSTGRES_LOADER)
+        self.set_publish_mode(Config.POSTGRES_PUBLISH_MODE)
         self._connect()
-        self._ensure_table()
+        SchemaMigrator(self.conn).ensure_current(auto_migrate=migrate or Config.POSTGRES_AUTO_MIGRATE)
+        self.partitions = {
+            self.TABLE_NAME: PartitionSwap(self.conn, self.TABLE_NAME, ('refresh_type',), self.SOL_INDEXES),
+            self.EVM_TABLE_NAME: PartitionSwap(self.conn, self.EVM_TABLE_NAME, ('chain', 'refresh_type'), self.EVM_INDEXES),
+        }
+        self.history = SnapshotHistory(self.conn, Config.POSTGRES_HISTORY_RETENTION_DAYS) if Config.POSTGRES_HISTORY_ENABLED else None
+        # Sinks get each committed (chain, refresh_type) generation as a frame: sink.publish(chain, refresh_type, frame)
+        self.sinks: Dict[str, Any] = {}
+        if Config.SNAPSHOT_EXPORT_DIR:
+            self.add_sink('snapshot_export', SnapshotExporter(Config.SNAPSHOT_EXPORT_DIR))
 
     def _connect(self):
-        try:
-            if Config.POSTGRES_CONNECTION_STRING:
-                self.conn = psycopg2.connect(Config.POSTGRES_CONNECTION_STRING)
+        self.conn = connect()
+
+    def set_loader(self, loader: str):
+        if loader not in self.LOADERS:
+            raise ValueError(f"Unknown Postgres loader: {loader} (expected one of {', '.join(self.LOADERS)})")
+        self.loader = loader
+
+    def set_publish_mode(self, publish_mode: str):
+        if publish_mode not in self.PUBLISH_MODES:
+            raise ValueError(f"Unknown publish mode: {publish_mode} (expected one of {', '.join(self.PUBLISH_MODES)})")
+        self.publish_mode = publish_mode
+
+    def _write_rows(self, cur, table: str, columns: Tuple[str, ...], values: Rows) -> int:
+        if isinstance(values, pl.DataFrame):
+            if self.loader == 'copy_text':
+                return copy_frame(cur, table, columns, values)
+            values = self._frame_rows(values, columns)
+        if self.loader == 'values':
+            values = list(values)
+            insert_sql = f"INSERT INTO {table} ({', '.join(columns)}, created_at) VALUES %s"
+            template = f"({', '.join(['%s'] * len(columns))}, NOW())"
+            execute_values(cur, insert_sql, values, template=template)
+            return len(values)
+        # created_at is left to its NOW() default, which is the same transaction timestamp
+        return copy_rows(cur, table, columns, values, binary=self.loader == 'copy_binary')
+
+    @staticmethod
+    def _frame_rows(frame: pl.DataFrame, columns: Tuple[str, ...]) -> Iterable[Tuple]:
+        rows = frame.select(columns).iter_rows()
+        if 'row_fingerprint' not in columns:
+            return rows
+        # Binary COPY sends plain ints as int4, so the BIGINT fingerprint is marked as on the tuple path
+        position = columns.index('row_fingerprint')
+        return (row[:position] + (BigInt(row[position]),) + row[position + 1:] for row in rows)
+
+    def _publish(self, table: str, columns: Tuple[str, ...], keyed_blocks: Iterable[Dict[PartitionKey, Rows]],
+                 prices: Dict[PartitionKey, float]) -> Dict[PartitionKey, int]:
+        partition = self.partitions[table]
+        keyed_blocks = self._fingerprinted(keyed_blocks, columns)
+        written = columns + ('row_fingerprint',)
+        with stage('publish'):
+            if self.publish_mode == 'swap':
+                counts = self._swap_publish(partition, written, keyed_blocks, prices)
+            elif self.publish_mode == 'delta':
+                counts = self._delta_publish(table, written, partition.partition_keys, keyed_blocks, prices)
             else:
-                self.conn = psycopg2.connect(
-                    host=Config.POSTGRES_HOST,
-                    port=Config.POSTGRES_PORT,
-                    user=Config.POSTGRES_USER,
-                    password=Config.POSTGRES_PASSWORD,
-                    database=Config.POSTGRES_DATABASE
-                )
-            self.conn.autocommit = False
-            logger.info(f'Connected to PostgreSQL at {Config.POSTGRES_HOST}:{Config.POSTGRES_PORT}')
-        except Exception as e:
-            logger.error(f'Failed to connect to PostgreSQL: {e}')
-            raise
+                counts = self._delete_publish(table, written, partition.partition_keys, keyed_blocks, prices)
 
-    def _ensure_table(self):
-        create_sol_sql = f"""
-        CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
-            id SERIAL PRIMARY KEY,
-            wallet_address VARCHAR(128) NOT NULL,
-            transactions_7d INTEGER DEFAULT 0,
-            buys_7d INTEGER DEFAULT 0,
-            sells_7d INTEGER DEFAULT 0,
-            unique_tokens_7d INTEGER DEFAULT 0,
-            realized_pnl_sol_7d DOUBLE PRECISION DEFAULT 0,
-            realized_pnl_usd_7d DOUBLE PRECISION DEFAULT 0,
-            winrate_percent_7d DOUBLE PRECISION DEFAULT 0,
-            transactions_30d INTEGER DEFAULT 0,
-            buys_30d INTEGER DEFAULT 0,
-            sells_30d INTEGER DEFAULT 0,
-            unique_tokens_30d INTEGER DEFAULT 0,
-            realized_pnl_sol_30d DOUBLE PRECISION DEFAULT 0,
-            realized_pnl_usd_30d DOUBLE PRECISION DEFAULT 0,
-            winrate_percent_30d DOUBLE PRECISION DEFAULT 0,
-            sol_price_usd DOUBLE PRECISION DEFAULT 0,
-            refresh_type VARCHAR(16) DEFAULT 'hourly',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_wallet ON {self.TABLE_NAME} (wallet_address);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_refresh_type ON {self.TABLE_NAME} (refresh_type);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_pnl_30d ON {self.TABLE_NAME} (realized_pnl_usd_30d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_pnl_7d ON {self.TABLE_NAME} (realized_pnl_usd_7d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_winrate_30d ON {self.TABLE_NAME} (winrate_percent_30d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_sol_created ON {self.TABLE_NAME} (created_at DESC);
-        """
+        published = [key for key, rows in counts.items() if rows]
+        if self.history is not None:
+            with stage('history'):
+                self.history.append(table, partition.partition_keys, published, **self.SOURCES[table])
+        for key in published:
+            self._publish_to_sinks(table, columns, *self._slice_labels(table, partition.partition_keys, key))
+        self._notify_refresh(table, partition.partition_keys, published)
+        return counts
 
-        create_evm_sql = f"""
-        CREATE TABLE IF NOT EXISTS {self.EVM_TABLE_NAME} (
-            id SERIAL PRIMARY KEY,
-            chain VARCHAR(32) NOT NULL,
-            wallet_address VARCHAR(128) NOT NULL,
-            transactions_7d INTEGER DEFAULT 0,
-            buys_7d INTEGER DEFAULT 0,
-            sells_7d INTEGER DEFAULT 0,
-            unique_tokens_7d INTEGER DEFAULT 0,
-            realized_pnl_native_7d DOUBLE PRECISION DEFAULT 0,
-            realized_pnl_usd_7d DOUBLE PRECISION DEFAULT 0,
-            winrate_percent_7d DOUBLE PRECISION DEFAULT 0,
-            transactions_30d INTEGER DEFAULT 0,
-            buys_30d INTEGER DEFAULT 0,
-            sells_30d INTEGER DEFAULT 0,
-            unique_tokens_30d INTEGER DEFAULT 0,
-            realized_pnl_native_30d DOUBLE PRECISION DEFAULT 0,
-            realized_pnl_usd_30d DOUBLE PRECISION DEFAULT 0,
-            winrate_percent_30d DOUBLE PRECISION DEFAULT 0,
-            native_price_usd DOUBLE PRECISION DEFAULT 0,
-            refresh_type VARCHAR(16) DEFAULT 'hourly',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_wallet ON {self.EVM_TABLE_NAME} (chain, wallet_address);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_refresh_type ON {self.EVM_TABLE_NAME} (refresh_type);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_pnl_30d ON {self.EVM_TABLE_NAME} (chain, realized_pnl_usd_30d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_pnl_7d ON {self.EVM_TABLE_NAME} (chain, realized_pnl_usd_7d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_chain_winrate_30d ON {self.EVM_TABLE_NAME} (chain, winrate_percent_30d DESC);
-        CREATE INDEX IF NOT EXISTS idx_smartmoney_evm_created ON {self.EVM_TABLE_NAME} (created_at DESC);
-        """
+    def add_sink(self, name: str, sink: Any):
+        self.sinks[name] = sink
+
+    @classmethod
+    def slice_select(cls, table: str, columns: Tuple[str, ...]) -> str:
+        """SELECT of one committed (chain, refresh_type) slice of table, priced at its slice price.
 
+        Parameters are (chain, refresh_type).
+        """
+        native = cls.SOURCES[table]['native']
+        select_list = ', '.join(f"{SlicePrices.expression(column, native)} AS {column}" for column in columns)
+        if 'chain' in cls.SOURCES[table]:
+            join, where = SlicePrices.join('%s'), 't.refresh_type = %s'
+        else:
+            join, where = SlicePrices.join('t.chain'), 't.chain = %s AND t.refresh_type = %s'
+        return f"SELECT {select_list} FROM {table} AS t {join} WHERE {where}"
+
+    def _publish_to_sinks(self, table: str, columns: Tuple[str, ...], chain: str, refresh_type: str):
+        # Sinks read the committed slice back, one slice at a time, instead of the publisher
+        # holding a copy of every streamed block until the last one commits
+        if not self.sinks:
+            return
+        try:
+            with stage('sink_read'), self.conn.cursor() as cur:
+                cur.execute(self.slice_select(table, columns), (chain, refresh_type))
+                frame = pl.DataFrame(cur.fetchall(), schema=list(columns), orient='row')
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"Read of {chain}/{refresh_type} for sinks failed, skipping them: {e}")
+            return
+        for name, sink in self.sinks.items():
+            try:
+                with stage(name):
+                    sink.publish(chain, refresh_type, frame)
+            except Exception as e:
+                logger.warning(f"Publish of {chain}/{refresh_type} to {name} failed: {e}")
+
+    def _slice_labels(self, table: str, key_columns: Tuple[str, ...], key: PartitionKey) -> Tuple[str, str]:
+        labels = dict(zip(key_columns, key))
+        return labels.get('chain', self.SOURCES[table].get('chain')), labels['refresh_type']
+
+    def _notify_refresh(self, table: str, key_columns: Tuple[str, ...], published: List[PartitionKey]):
+        """Tell LeaderboardReader listeners which (chain, refresh_type) slices just committed."""
         try:
             with self.conn.cursor() as cur:
-                cur.execute(create_sol_sql)
-                cur.execute(create_evm_sql)
+                for key in published:
+                    chain, refresh_type = self._slice_labels(table, key_columns, key)
+                    payload = {'table': table, 'chain': chain, 'refresh_type': refresh_type}
+                    cur.execute("SELECT pg_notify(%s, %s)", (Config.POSTGRES_NOTIFY_CHANNEL, json.dumps(payload)))
             self.conn.commit()
-            logger.info(f'Ensured tables {self.TABLE_NAME} and {self.EVM_TABLE_NAME} exist')
         except Exception as e:
             self.conn.rollback()
-            logger.error(f'Failed to create tables: {e}')
-            raise
+            logger.warning(f"Failed to notify refresh of {table}: {e}")
 
-    def refresh_evm_smart_money(self, metrics: List[Dict[str, Any]], chain: str, native_price: float, refresh_type: str = 'hourly') -> int:
-        if not metrics:
-            logger.warning("No metrics to insert")
-            return 0
+    def _commit(self):
+        with stage('postgres_commit'):
+            self.conn.commit()
 
+    def _store_slice_prices(self, cur, table: str, key_columns: Tuple[str, ...], counts: Dict[PartitionKey, int],
+                            prices: Dict[PartitionKey, float]):
+        # On the publisher's cursor, so a generation and its slice price commit together
+        SlicePrices.store(cur, {
+            self._slice_labels(table, key_columns, key): prices[key] for key, rows in counts.items() if rows
+        })
+
+    def _record_rows(self, table: str, key_columns: Tuple[str, ...], key: PartitionKey, **counts: int):
+        labels = dict(zip(key_columns, key))
+        for action, rows in counts.items():
+            record(f'postgres_rows_{action}', rows, table=table, **labels)
+
+    def _delete_publish(self, table: str, columns: Tuple[str, ...], key_columns: Tuple[str, ...],
+                        keyed_blocks: Iterable[Dict[PartitionKey, Rows]],
+                        prices: Dict[PartitionKey, float]) -> Dict[PartitionKey, int]:
+        counts: Dict[PartitionKey, int] = {}
         try:
             with self.conn.cursor() as cur:
                 cur.execute("SELECT NOW()")
                 insert_timestamp = cur.fetchone()[0]
 
-                insert_sql = f"""
-                INSERT INTO {self.EVM_TABLE_NAME} (
-                    chain, wallet_address, transactions_7d, buys_7d, sells_7d, unique_tokens_7d,
-                    realized_pnl_native_7d, realized_pnl_usd_7d, winrate_percent_7d,
-                    transactions_30d, buys_30d, sells_30d, unique_tokens_30d,
-                    realized_pnl_native_30d, realized_pnl_usd_30d, winrate_percent_30d,
-                    native_price_usd, refresh_type, created_at
-                ) VALUES %s
-                """
-
-                values = []
-                for m in metrics:
-                    pnl_native_7d = float(m.get('realized_pnl_native_7d', 0))
-                    pnl_native_30d = float(m.get('realized_pnl_native_30d', 0))
-                    wallet = m['wallet_address']
-                    if isinstance(wallet, bytes):
-                        wallet = wallet.decode('utf-8').rstrip('\\x00')
-                    values.append((
-                        chain,
-                        wallet,
-                        int(m.get('transactions_7d', 0)),
-                        int(m.get('buys_7d', 0)),
-                        int(m.get('sells_7d', 0)),
-                        int(m.get('unique_tokens_7d', 0)),
-                        pnl_native_7d,
-                        pnl_native_7d * native_price,
-                        float(m.get('winrate_percent_7d', 0)),
-                        int(m.get('transactions_30d', 0)),
-                        int(m.get('buys_30d', 0)),
-                        int(m.get('sells_30d', 0)),
-                        int(m.get('unique_tokens_30d', 0)),
-                        pnl_native_30d,
-                        pnl_native_30d * native_price,
-                        float(m.get('winrate_percent_30d', 0)),
-                        native_price,
-                        refresh_type,
-                    ))
-
-                execute_values(
-                    cur, insert_sql, values,
-                    template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
-                )
-                logger.info(f'Inserted {len(metrics):,} fresh EVM smart money records for {chain} ({refresh_type})')
-
-                cur.execute(f"DELETE FROM {self.EVM_TABLE_NAME} WHERE chain = %s AND refresh_type = %s AND created_at < %s", (chain, refresh_type, insert_timestamp))
-                deleted_count = cur.rowcount
-                logger.info(f'Deleted {deleted_count:,} old {refresh_type} records for {chain}')
+                for keyed_values in keyed_blocks:
+                    for key, values in keyed_values.items():
+                        counts[key] = counts.get(key, 0) + self._write_rows(cur, table, columns, values)
+
+                where = ' AND '.join(f"{column} = %s" for column in key_columns)
+                for key, inserted in counts.items():
+                    if not inserted:
+                        continue
+                    logger.info(f'Inserted {inserted:,} fresh records into {table} ({"/".join(key)})')
+                    cur.execute(f"DELETE FROM {table} WHERE {where} AND created_at < %s", (*key, insert_timestamp))
+                    logger.info(f'Deleted {cur.rowcount:,} old records from {table} ({"/".join(key)})')
+                    self._record_rows(table, key_columns, key, inserted=inserted, deleted=cur.rowcount)
+                self._store_slice_prices(cur, table, key_columns, counts, prices)
+
+            self._commit()
+            return counts
+        except Exception:
+            self.conn.rollback()
+            raise
 
-            self.conn.commit()
-            return len(metrics)
+    def _swap_publish(self, partition: PartitionSwap, columns: Tuple[str, ...],
+                      keyed_blocks: Iterable[Dict[PartitionKey, Rows]],
+                      prices: Dict[PartitionKey, float]) -> Dict[PartitionKey, int]:
+        partition.ensure_layout()
+        leaves: Dict[PartitionKey, str] = {}
+        counts: Dict[PartitionKey, int] = {}
+        try:
+            with self.conn.cursor() as cur:
+                for keyed_values in keyed_blocks:
+                    for key, values in keyed_values.items():
+                        if key not in leaves:
+                            leaves[key] = partition.create_leaf(cur, key)
+                        counts[key] = counts.get(key, 0) + self._write_rows(cur, leaves[key], columns, values)
+
+                for key, leaf in leaves.items():
+                    partition.finalize_leaf(cur, leaf, key)
+            self._commit()
+        except Exception:
+            self.conn.rollback()
+            raise
 
-        except Exception as e:
+        with stage('postgres_swap'):
+            partition.swap(leaves, on_swap=lambda cur: self._store_slice_prices(
+                cur, partition.table, partition.partition_keys, counts, prices
+            ))
+        for key, inserted in counts.items():
+            logger.info(f'Swapped in {inserted:,} fresh records for {partition.table} ({"/".join(key)})')
+            self._record_rows(partition.table, partition.partition_keys, key, inserted=inserted)
+        return counts
+
+    @staticmethod
+    def _fingerprint_columns(columns: Tuple[str, ...]) -> List[int]:
+        """Positions of the native metrics; keys, prices and USD values never mark a row changed."""
+        return [
+            i for i, column in enumerate(columns)
+            if column not in ('chain', 'wallet_address', 'refresh_type') and '_usd' not in column
+        ]
+
+    @staticmethod
+    def _fingerprint(metrics: Tuple) -> BigInt:
+        normalized = tuple(float(f'{v:.{Config.POSTGRES_DELTA_PRECISION}g}') if isinstance(v, float) else v for v in metrics)
+        digest = hashlib.blake2b(repr(normalized).encode('utf-8'), digest_size=8).digest()
+        return BigInt(int.from_bytes(digest, 'big', signed=True))
+
+    def _fingerprinted(self, keyed_blocks: Iterable[Dict[PartitionKey, Rows]],
+                       columns: Tuple[str, ...]) -> Iterable[Dict[PartitionKey, Rows]]:
+        positions = self._fingerprint_columns(columns)
+        for keyed_values in keyed_blocks:
+            yield {key: self._with_fingerprint(values, columns, positions) for key, values in keyed_values.items()}
+
+    def _with_fingerprint(self, values: Rows, columns: Tuple[str, ...], positions: List[int]) -> Rows:
+        # Frames and tuples go through the same blake2b of the same Python values, so both paths agree
+        if isinstance(values, pl.DataFrame):
+            metrics = values.select([columns[i] for i in positions]).iter_rows()
+            fingerprints = pl.Series('row_fingerprint', [self._fingerprint(m) for m in metrics], dtype=pl.Int64)
+            return values.with_columns(fingerprints)
+        return (row + (self._fingerprint(tuple(row[i] for i in positions)),) for row in values)
+
+    def _repricing(self, table: str, columns: Tuple[str, ...]) -> Tuple[str, int]:
+        """SET list pricing a row's USD columns from its native ones, and how many price parameters it takes."""
+        native = self.SOURCES[table]['native']
+        assignments = []
+        for column in columns:
+            if column.endswith('_price_usd'):
+                assignments.append(f"{column} = %s")
+            elif '_usd_' in column:
+                assignments.append(f"{column} = {column.replace('_usd_', f'_{native}_')} * %s")
+        return ', '.join(assignments), len(assignments)
+
+    def _delta_publish(self, table: str, columns: Tuple[str, ...], key_columns: Tuple[str, ...],
+                       keyed_blocks: Iterable[Dict[PartitionKey, Rows]],
+                       prices: Dict[PartitionKey, float]) -> Dict[PartitionKey, int]:
+        staging = f"{table}__delta"
+        match_columns = key_columns + ('wallet_address',)
+        counts: Dict[PartitionKey, int] = {}
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                for keyed_values in keyed_blocks:
+                    for key, values in keyed_values.items():
+                        counts[key] = counts.get(key, 0) + self._write_rows(cur, staging, columns, values)
+                cur.execute(f"CREATE INDEX ON {staging} ({', '.join(match_columns)})")
+                cur.execute(f"ANALYZE {staging}")
+
+                match = ' AND '.join(f"t.{c} = s.{c}" for c in match_columns)
+                target_slice = ' AND '.join(f"t.{c} = %s" for c in key_columns)
+                staged_slice = ' AND '.join(f"s.{c} = %s" for c in key_columns)
+                assignments = ', '.join(f"{c} = s.{c}" for c in columns if c not in match_columns)
+                column_list = ', '.join(columns)
+                repricing, price_parameters = self._repricing(table, columns)
+                price_column = next(c for c in columns if c.endswith('_price_usd'))
+                for key, staged in counts.items():
+                    if not staged:
+                        continue
+                    cur.execute(f"""
+                        DELETE FROM {table} AS t
+                        WHERE {target_slice} AND NOT EXISTS (SELECT 1 FROM {staging} AS s WHERE {match})
+                    """, key)
+                    deleted = cur.rowcount
+                    cur.execute(f"""
+                        UPDATE {table} AS t SET {assignments}, created_at = NOW()
+                        FROM {staging} AS s
+                        WHERE {target_slice} AND {match} AND t.row_fingerprint IS DISTINCT FROM s.row_fingerprint
+                    """, key)
+                    updated = cur.rowcount
+                    cur.execute(f"""
+                        INSERT INTO {table} ({column_list})
+                        SELECT {', '.join(f's.{c}' for c in columns)} FROM {staging} AS s
+                        WHERE {staged_slice} AND NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {match})
+                    """, key)
+                    inserted = cur.rowcount
+                    # Unchanged rows still carry the USD values of their last write; one set-based
+                    # UPDATE moves them to this publish's price so the table and its USD indexes agree
+                    price = float(prices[key])
+                    cur.execute(f"""
+                        UPDATE {table} AS t SET {repricing}
+                        WHERE {target_slice} AND t.{price_column} IS DISTINCT FROM %s
+                    """, (price,) * price_parameters + tuple(key) + (price,))
+                    repriced = cur.rowcount
+
+                    label = '/'.join(key)
+                    self.delta_stats[label] = {
+                        'inserted': inserted,
+                        'updated': updated,
+                        'deleted': deleted,
+                        'unchanged': max(staged - inserted - updated, 0),
+                        'repriced': repriced,
+                    }
+                    logger.info(
+                        f'Delta refresh of {table} ({label}): {inserted:,} inserted, {updated:,} updated, '
+                        f'{deleted:,} deleted, {self.delta_stats[label]["unchanged"]:,} unchanged, {repriced:,} repriced'
+                    )
+                    self._record_rows(table, key_columns, key, inserted=inserted, updated=updated, deleted=deleted,
+                                      repriced=repriced)
+                self._store_slice_prices(cur, table, key_columns, counts, prices)
+
+            self._commit()
+            return counts
+        except Exception:
             self.conn.rollback()
+            raise
+
+    @staticmethod
+    def _frame_values(frame: pl.DataFrame, columns: Tuple[str, ...], native: str, native_price: float,
+                      refresh_type: str, chain: str = None) -> pl.DataFrame:
+        wallet = pl.col('wallet_address')
+        if frame.schema['wallet_address'] == pl.Binary:
+            wallet = wallet.cast(pl.Utf8)
+        exprs = []
+        for column in columns:
+            if column == 'chain':
+                exprs.append(pl.lit(chain).alias(column))
+            elif column == 'wallet_address':
+                exprs.append(wallet.str.strip_chars_end('\x00').alias(column))
+            elif column == 'refresh_type':
+                exprs.append(pl.lit(refresh_type).alias(column))
+            elif column.endswith('_price_usd'):
+                exprs.append(pl.lit(float(native_price)).alias(column))
+            elif '_usd_' in column:
+                source = column.replace('_usd_', f'_{native}_')
+                exprs.append((pl.col(source).fill_null(0).cast(pl.Float64) * float(native_price)).alias(column))
+            elif column.startswith(('transactions_', 'buys_', 'sells_', 'unique_tokens_')):
+                exprs.append(pl.col(column).fill_null(0).cast(pl.Int64))
+            else:
+                exprs.append(pl.col(column).fill_null(0).cast(pl.Float64))
+        return frame.select(exprs)
+
+    def _evm_rows(self, metrics: Union[List[Dict[str, Any]], pl.DataFrame], chain: str, native_price: float, refresh_type: str) -> Rows:
+        if isinstance(metrics, pl.DataFrame):
+            with stage('conversion'):
+                return self._frame_values(metrics, self.EVM_COLUMNS, 'native', native_price, refresh_type, chain=chain)
+        return (self._evm_values(m, chain, native_price, refresh_type) for m in metrics)
+
+    def _sol_rows(self, metrics: Union[List[Dict[str, Any]], pl.DataFrame], sol_price: float, refresh_type: str) -> Rows:
+        if isinstance(metrics, pl.DataFrame):
+            with stage('conversion'):
+                return self._frame_values(metrics, self.SOL_COLUMNS, 'sol', sol_price, refresh_type)
+        return (self._sol_values(m, sol_price, refresh_type) for m in metrics)
+
+    @staticmethod
+    def _evm_values(m: Dict[str, Any], chain: str, native_price: float, refresh_type: str) -> Tuple:
+        pnl_native_7d = float(m.get('realized_pnl_native_7d', 0))
+        pnl_native_30d = float(m.get('realized_pnl_native_30d', 0))
+        wallet = m['wallet_address']
+        if isinstance(wallet, bytes):
+            wallet = wallet.decode('utf-8').rstrip('\x00')
+        return (
+            chain,
+            wallet,
+            int(m.get('transactions_7d', 0)),
+            int(m.get('buys_7d', 0)),
+            int(m.get('sells_7d', 0)),
+            int(m.get('unique_tokens_7d', 0)),
+            pnl_native_7d,
+            pnl_native_7d * native_price,
+            float(m.get('winrate_percent_7d', 0)),
+            int(m.get('transactions_30d', 0)),
+            int(m.get('buys_30d', 0)),
+            int(m.get('sells_30d', 0)),
+            int(m.get('unique_tokens_30d', 0)),
+            pnl_native_30d,
+            pnl_native_30d * native_price,
+            float(m.get('winrate_percent_30d', 0)),
+            float(native_price),
+            refresh_type,
+        )
+
+    def refresh_evm_smart_money(self, metrics: Union[List[Dict[str, Any]], pl.DataFrame], chain: str, native_price: float,
+                                refresh_type: str = 'hourly') -> int:
+        if len(metrics) == 0:
+            logger.warning("No metrics to insert")
+            return 0
+
+        key = (chain, refresh_type)
+        values = self._evm_rows(metrics, chain, native_price, refresh_type)
+        try:
+            counts = self._publish(self.EVM_TABLE_NAME, self.EVM_COLUMNS, [{key: values}], {key: native_price})
+        except Exception as e:
             logger.error(f'Failed to refresh EVM smart money data: {e}')
             raise
+        return counts.get(key, 0)
+
+    def stream_refresh_evm_smart_money(self, blocks: Iterable[Union[List[Dict[str, Any]], pl.DataFrame]], prices: Dict[str, float],
+                                       refresh_limits: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        counts = {chain: {refresh_type: 0 for refresh_type in refresh_limits} for chain in prices}
+
+        def keyed_blocks():
+            for block in blocks:
+                keyed_values: Dict[PartitionKey, Rows] = {}
+                if isinstance(block, pl.DataFrame):
+                    for chain in prices:
+                        chain_block = block.filter(pl.col('chain') == chain)
+                        for refresh_type, refresh_limit in refresh_limits.items():
+                            take = chain_block[:max(refresh_limit - counts[chain][refresh_type], 0)]
+                            if len(take):
+                                keyed_values[(chain, refresh_type)] = self._evm_rows(take, chain, prices[chain], refresh_type)
+                                counts[chain][refresh_type] += len(take)
+                    yield keyed_values
+                    continue
+
+                for m in block:
+                    chain = m['chain']
+                    for refresh_type, refresh_limit in refresh_limits.items():
+                        if counts[chain][refresh_type] < refresh_limit:
+                            keyed_values.setdefault((chain, refresh_type), []).append(
+                                self._evm_values(m, chain, prices[chain], refresh_type)
+                            )
+                            counts[chain][refresh_type] += 1
+                yield keyed_values
+
+        try:
+            self._publish(self.EVM_TABLE_NAME, self.EVM_COLUMNS, keyed_blocks(), {
+                (chain, refresh_type): price for chain, price in prices.items() for refresh_type in refresh_limits
+            })
+        except Exception as e:
+            logger.error(f'Failed to stream-refresh EVM smart money data: {e}')
+            raise
+
+        for chain, chain_counts in counts.items():
+            for refresh_type, inserted in chain_counts.items():
+                if not inserted:
+                    logger.warning(f"No {refresh_type} metrics streamed for {chain}, keeping previous records")
+        return counts
+
+    def refresh_token_outputs(self, chain: str, refresh_type: str, tokens: pl.DataFrame, wallets: pl.DataFrame,
+                              native_price: float) -> Tuple[int, int]:
+        return TokenLeaderboardStore(self.conn).publish(chain, refresh_type, tokens, wallets, native_price)
 
     def get_evm_wallet_count(self, chain: str) -> int:
         try:
@@ -184,70 +541,73 @@ class PostgresClient:
             logger.error(f'Failed to get EVM wallet count: {e}')
             return 0
 
-    def refresh_smart_money(self, metrics: List[Dict[str, Any]], sol_price: float, refresh_type: str = 'hourly') -> int:
-        if not metrics:
+    @staticmethod
+    def _sol_values(m: Dict[str, Any], sol_price: float, refresh_type: str) -> Tuple:
+        pnl_sol_7d = float(m.get('realized_pnl_sol_7d', 0))
+        pnl_sol_30d = float(m.get('realized_pnl_sol_30d', 0))
+        wallet = m['wallet_address']
+        if isinstance(wallet, bytes):
+            wallet = wallet.decode('utf-8').rstrip('\x00')
+        return (
+            wallet,
+            int(m.get('transactions_7d', 0)),
+            int(m.get('buys_7d', 0)),
+            int(m.get('sells_7d', 0)),
+            int(m.get('unique_tokens_7d', 0)),
+            pnl_sol_7d,
+            pnl_sol_7d * sol_price,
+            float(m.get('winrate_percent_7d', 0)),
+            int(m.get('transactions_30d', 0)),
+            int(m.get('buys_30d', 0)),
+            int(m.get('sells_30d', 0)),
+            int(m.get('unique_tokens_30d', 0)),
+            pnl_sol_30d,
+            pnl_sol_30d * sol_price,
+            float(m.get('winrate_percent_30d', 0)),
+            float(sol_price),
+            refresh_type,
+        )
+
+    def refresh_smart_money(self, metrics: Union[List[Dict[str, Any]], pl.DataFrame], sol_price: float,
+                            refresh_type: str = 'hourly') -> int:
+        if len(metrics) == 0:
             logger.warning("No metrics to insert")
             return 0
 
+        key = (refresh_type,)
+        values = self._sol_rows(metrics, sol_price, refresh_type)
         try:
-            with self.conn.cursor() as cur:
-                cur.execute("SELECT NOW()")
-                insert_timestamp = cur.fetchone()[0]
-
-                insert_sql = f"""
-                INSERT INTO {self.TABLE_NAME} (
-                    wallet_address, transactions_7d, buys_7d, sells_7d, unique_tokens_7d,
-                    realized_pnl_sol_7d, realized_pnl_usd_7d, winrate_percent_7d,
-                    transactions_30d, buys_30d, sells_30d, unique_tokens_30d,
-                    realized_pnl_sol_30d, realized_pnl_usd_30d, winrate_percent_30d,
-                    sol_price_usd, refresh_type, created_at
-                ) VALUES %s
-                """
-
-                values = []
-                for m in metrics:
-                    pnl_sol_7d = float(m.get('realized_pnl_sol_7d', 0))
-                    pnl_sol_30d = float(m.get('realized_pnl_sol_30d', 0))
-                    wallet = m['wallet_address']
-                    if isinstance(wallet, bytes):
-                        wallet = wallet.decode('utf-8').rstrip('\x00')
-                    values.append((
-                        wallet,
-                        int(m.get('transactions_7d', 0)),
-                        int(m.get('buys_7d', 0)),
-                        int(m.get('sells_7d', 0)),
-                        int(m.get('unique_tokens_7d', 0)),
-                        pnl_sol_7d,
-                        pnl_sol_7d * sol_price,
-                        float(m.get('winrate_percent_7d', 0)),
-                        int(m.get('transactions_30d', 0)),
-                        int(m.get('buys_30d', 0)),
-                        int(m.get('sells_30d', 0)),
-                        int(m.get('unique_tokens_30d', 0)),
-                        pnl_sol_30d,
-                        pnl_sol_30d * sol_price,
-                        float(m.get('winrate_percent_30d', 0)),
-                        sol_price,
-                        refresh_type,
-                    ))
-
-                execute_values(
-                    cur, insert_sql, values,
-                    template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
-                )
-                logger.info(f'Inserted {len(metrics):,} fresh smart money records ({refresh_type})')
-
-                cur.execute(f"DELETE FROM {self.TABLE_NAME} WHERE refresh_type = %s AND created_at < %s", (refresh_type, insert_timestamp))
-                deleted_count = cur.rowcount
-                logger.info(f'Deleted {deleted_count:,} old {refresh_type} records')
-
-            self.conn.commit()
-            return len(metrics)
-
+            counts = self._publish(self.TABLE_NAME, self.SOL_COLUMNS, [{key: values}], {key: sol_price})
         except Exception as e:
-            self.conn.rollback()
             logger.error(f'Failed to refresh smart money data: {e}')
             raise
+        return counts.get(key, 0)
+
+    def stream_refresh_smart_money(self, blocks: Iterable[Union[List[Dict[str, Any]], pl.DataFrame]], sol_price: float,
+                                   refresh_limits: Dict[str, int]) -> Dict[str, int]:
+        counts = {refresh_type: 0 for refresh_type in refresh_limits}
+
+        def keyed_blocks():
+            for block in blocks:
+                keyed_values: Dict[PartitionKey, Rows] = {}
+                for refresh_type, refresh_limit in refresh_limits.items():
+                    take = block[:max(refresh_limit - counts[refresh_type], 0)]
+                    if len(take):
+                        keyed_values[(refresh_type,)] = self._sol_rows(take, sol_price, refresh_type)
+                        counts[refresh_type] += len(take)
+                yield keyed_values
+
+        try:
+            self._publish(self.TABLE_NAME, self.SOL_COLUMNS, keyed_blocks(),
+                          {(refresh_type,): sol_price for refresh_type in refresh_limits})
+        except Exception as e:
+            logger.error(f'Failed to stream-refresh smart money data: {e}')
+            raise
+
+        for refresh_type, inserted in counts.items():
+            if not inserted:
+                logger.warning(f"No {refresh_type} metrics streamed, keeping previous records")
+        return counts
 
     def get_wallet_count(self) -> int:
         try:
@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from ..config import Config
+from ..metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class PriceNotAvailableError(Exception):
+    pass
+
+
+class PriceService:
+    """Native-asset USD prices from Redis, driven by Config.PRICE_KEYS.
+
+    All requested assets are fetched with one MGET and kept in a short in-process
+    cache. Every successful fetch is persisted as a last-known-good snapshot so a job
+    can fall back to a price no older than PRICE_MAX_STALENESS_SECONDS.
+    """
+
+    _cache: Dict[str, Tuple[float, float]] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, client=None, price_keys: Optional[Dict[str, str]] = None,
+                 snapshot_path: Optional[str] = None, cache_ttl: Optional[float] = None,
+                 max_staleness: Optional[float] = None):
+        self.client = client
+        self.price_keys = price_keys or Config.PRICE_KEYS
+        self.snapshot_path = snapshot_path or Config.PRICE_SNAPSHOT_PATH
+        self.cache_ttl = Config.PRICE_CACHE_TTL_SECONDS if cache_ttl is None else cache_ttl
+        self.max_staleness = Config.PRICE_MAX_STALENESS_SECONDS if max_staleness is None else max_staleness
+
+    def _key(self, asset: str) -> str:
+        if asset not in self.price_keys:
+            raise ValueError(f"Unknown price asset: {asset} (expected one of {', '.join(self.price_keys)})")
+        return self.price_keys[asset]
+
+    def _fetch(self, assets: List[str]) -> Dict[str, float]:
+        if not self.client:
+            logger.warning("Redis client is not connected, skipping price fetch")
+            return {}
+
+        try:
+            values = self.client.mget([self._key(asset) for asset in assets])
+        except Exception as e:
+            logger.warning(f"Error fetching prices for {', '.join(assets)}: {e}")
+            return {}
+
+        fetched = {}
+        for asset, value in zip(assets, values):
+            try:
+                price = float(value) if value else 0.0
+            except ValueError:
+                price = 0.0
+            if price > 0:
+                fetched[asset] = price
+            else:
+                logger.warning(f"Key '{self.price_keys[asset]}' missing or invalid in Redis: {value!r}")
+        return fetched
+
+    def _load_snapshot(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(self.snapshot_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Failed to read price snapshot {self.snapshot_path}: {e}")
+            return {}
+
+    def _save_snapshot(self, fetched: Dict[str, float], fetched_at: float):
+        # Called under _lock so concurrent jobs cannot drop each other's assets; the unique
+        # temp file keeps writers in other processes from interleaving into one file
+        snapshot = self._load_snapshot()
+        snapshot.update({asset: {'price': price, 'fetched_at': fetched_at} for asset, price in fetched.items()})
+        tmp_path = None
+        try:
+            directory = os.path.dirname(self.snapshot_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(self.snapshot_path)}.", suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Failed to write price snapshot {self.snapshot_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_prices(self, assets: List[str]) -> Dict[str, float]:
+        assets = list(dict.fromkeys(assets))
+        for asset in assets:
+            self._key(asset)
+
+        now = time.time()
+        prices = {}
+        with self._lock:
+            for asset in assets:
+                cached = self._cache.get(asset)
+                if cached and now - cached[1] <= self.cache_ttl:
+                    prices[asset] = cached[0]
+
+        missing = [asset for asset in assets if asset not in prices]
+        if missing:
+            with stage('price'):
+                fetched = self._fetch(missing)
+            if fetched:
+                with self._lock:
+                    self._cache.update({asset: (price, now) for asset, price in fetched.items()})
+                    self._save_snapshot(fetched, now)
+                for asset, price in fetched.items():
+                    logger.info(f"{asset.upper()} price from Redis: ${price:.2f}")
+            prices.update(fetched)
+
+        stale = [asset for asset in assets if asset not in prices]
+        if stale:
+            snapshot = self._load_snapshot()
+            for asset in stale:
+                entry = snapshot.get(asset)
+                age = now - entry['fetched_at'] if entry else None
+                if age is None or age > self.max_staleness:
+                    raise PriceNotAvailableError(
+                        f"No {asset.upper()} price in Redis and no snapshot newer than {self.max_staleness:.0f}s"
+                    )
+                logger.warning(f"Using last-known-good {asset.upper()} price ${entry['price']:.2f} ({age:.0f}s old)")
+                prices[asset] = entry['price']
+
+        return prices
+
+    def get_price(self, asset: str) -> float:
+        return self.get_prices([asset])[asset]
@@ -1,6 +1,9 @@
 import redis
 import logging
+from typing import Dict, List
 from ..config import Config
+from .prices import PriceService
+from .redis_leaderboard import RedisLeaderboard
 
 logger = logging.getLogger(__name__)
 
@@ -9,10 +12,6 @@ class RedisConnectionError(Exception):
     pass
 
 
-class RedisPriceNotFoundError(Exception):
-    pass
-
-
 class RedisClient:
 
     def __init__(self):
@@ -36,58 +35,20 @@ class RedisClient:
             self.client.ping()
             self.enabled = True
             logger.info(f"Connected to Redis")
-        except redis.ConnectionError as e:
-            raise RedisConnectionError(f"Failed to connect to Redis: {e}")
         except Exception as e:
-            raise RedisConnectionError(f"Unexpected Redis error: {e}")
+            logger.error(f"Failed to connect to Redis, prices will fall back to the last-known-good snapshot: {e}")
 
-    def get_sol_price(self) -> float:
-        if not self.enabled or not self.client:
-            raise RedisPriceNotFoundError("Redis client is not connected")
+        self.prices = PriceService(self.client if self.enabled else None)
+        self.leaderboard = RedisLeaderboard(self.client) if self.enabled and Config.REDIS_LEADERBOARD_ENABLED else None
 
-        try:
-            price_str = self.client.get(Config.SOL_PRICE_KEY)
-            if price_str:
-                price = float(price_str)
-                logger.info(f"SOL price from Redis: ${price:.2f}")
-                return price
-            else:
-                raise RedisPriceNotFoundError(f"Key '{Config.SOL_PRICE_KEY}' not found in Redis")
-        except RedisPriceNotFoundError:
-            raise
-        except Exception as e:
-            raise RedisPriceNotFoundError(f"Error fetching SOL price: {e}")
+    def get_prices(self, assets: List[str]) -> Dict[str, float]:
+        return self.prices.get_prices(assets)
 
-    def get_eth_price(self) -> float:
-        if not self.enabled or not self.client:
-            raise RedisPriceNotFoundError("Redis client is not connected")
+    def get_sol_price(self) -> float:
+        return self.prices.get_price('sol')
 
-        try:
-            price_str = self.client.get(Config.ETH_PRICE_KEY)
-            if price_str:
-                price = float(price_str)
-                logger.info(f"ETH price from Redis: ${price:.2f}")
-                return price
-            else:
-                raise RedisPriceNotFoundError(f"Key '{Config.ETH_PRICE_KEY}' not found in Redis")
-        except RedisPriceNotFoundError:
-            raise
-        except Exception as e:
-            raise RedisPriceNotFoundError(f"Error fetching ETH price: {e}")
+    def get_eth_price(self) -> float:
+        return self.prices.get_price('eth')
 
     def get_matic_price(self) -> float:
-        if not self.enabled or not self.client:
-            raise RedisPriceNotFoundError("Redis client is not connected")
-
-        try:
-            price_str = self.client.get(Config.MATIC_PRICE_KEY)
-            if price_str:
-                price = float(price_str)
-                logger.info(f"MATIC price from Redis: ${price:.2f}")
-                return price
-            else:
-                raise RedisPriceNotFoundError(f"Key '{Config.MATIC_PRICE_KEY}' not found in Redis")
-        except RedisPriceNotFoundError:
-            raise
-        except Exception as e:
-            raise RedisPriceNotFoundError(f"Error fetching MATIC price: {e}")
+        return self.prices.get_price('matic')
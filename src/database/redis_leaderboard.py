@@ -0,0 +1,110 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import polars as pl
+import redis
+from ..config import Config
+from .leaderboard import LeaderboardReader
+
+logger = logging.getLogger(__name__)
+
+
+class RedisLeaderboard:
+    """Publishes each leaderboard generation to Redis for per-wallet lookups and rank queries.
+
+    A generation is one hash of wallet -> JSON-packed metrics plus one sorted set per
+    rank metric, all under a generation-scoped key prefix. Keys are written with
+    pipelined chunks under a staging TTL; a MULTI then persists them and flips the
+    slice's current pointer, so readers resolve either the old or the new generation,
+    never a partial one. The pointer is WATCHed while the replaced generation is read,
+    so a concurrent publish retries the switch instead of leaving a generation behind
+    without a TTL, and a generation older than the current one is never switched to.
+    The replaced generation expires after a grace period.
+    """
+
+    RANK_METRICS = LeaderboardReader.SORT_KEYS
+    KEY_COLUMNS = ('chain', 'wallet_address', 'refresh_type')
+
+    def __init__(self, client, prefix: Optional[str] = None, chunk_size: int = 1000,
+                 staging_ttl_seconds: int = 3600, grace_seconds: int = 120):
+        self.client = client
+        self.prefix = prefix or Config.REDIS_LEADERBOARD_PREFIX
+        self.chunk_size = chunk_size
+        self.staging_ttl_seconds = staging_ttl_seconds
+        self.grace_seconds = grace_seconds
+
+    def _slice_key(self, chain: str, refresh_type: str) -> str:
+        return f"{self.prefix}:{chain}:{refresh_type}"
+
+    def _generation_keys(self, slice_key: str, generation: str) -> Dict[str, str]:
+        keys = {'wallets': f"{slice_key}:{generation}:wallets"}
+        keys.update({metric: f"{slice_key}:{generation}:rank:{metric}" for metric in self.RANK_METRICS})
+        return keys
+
+    def publish(self, chain: str, refresh_type: str, frame: pl.DataFrame) -> Optional[str]:
+        slice_key = self._slice_key(chain, refresh_type)
+        generation = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+        keys = self._generation_keys(slice_key, generation)
+
+        wallets = frame['wallet_address'].to_list()
+        packed = frame.select(
+            pl.struct([c for c in frame.columns if c not in self.KEY_COLUMNS]).struct.json_encode()
+        ).to_series().to_list()
+        scores = {metric: frame[metric].fill_null(0).to_list() for metric in self.RANK_METRICS}
+
+        pipe = self.client.pipeline(transaction=False)
+        for start in range(0, len(wallets), self.chunk_size):
+            end = start + self.chunk_size
+            pipe.hset(keys['wallets'], mapping=dict(zip(wallets[start:end], packed[start:end])))
+            for metric in self.RANK_METRICS:
+                pipe.zadd(keys[metric], dict(zip(wallets[start:end], scores[metric][start:end])))
+            for key in keys.values():
+                pipe.expire(key, self.staging_ttl_seconds)
+            pipe.execute()
+
+        current_key = f"{slice_key}:current"
+        with self.client.pipeline(transaction=True) as switch:
+            while True:
+                try:
+                    switch.watch(current_key)
+                    previous = switch.get(current_key)
+                    if previous and previous > generation:
+                        switch.unwatch()
+                        logger.info(f"Skipped Redis generation {generation} of {chain}/{refresh_type}, {previous} is newer")
+                        return None
+                    switch.multi()
+                    for key in keys.values():
+                        switch.persist(key)
+                    switch.set(current_key, generation)
+                    if previous and previous != generation:
+                        for key in self._generation_keys(slice_key, previous).values():
+                            switch.expire(key, self.grace_seconds)
+                    switch.execute()
+                    break
+                except redis.WatchError:
+                    logger.info(f"{current_key} changed during the switch, retrying")
+
+        logger.info(f"Published {len(wallets):,} {chain}/{refresh_type} wallets to Redis generation {generation}")
+        return generation
+
+    def generation(self, chain: str, refresh_type: str = 'daily') -> Optional[str]:
+        return self.client.get(f"{self._slice_key(chain, refresh_type)}:current")
+
+    def wallet(self, chain: str, wallet_address: str, refresh_type: str = 'daily') -> Optional[Dict[str, Any]]:
+        generation = self.generation(chain, refresh_type)
+        if generation is None:
+            return None
+        keys = self._generation_keys(self._slice_key(chain, refresh_type), generation)
+        packed = self.client.hget(keys['wallets'], wallet_address)
+        return json.loads(packed) if packed is not None else None
+
+    def top(self, chain: str, metric: str = 'realized_pnl_usd_30d', limit: int = 100, offset: int = 0,
+            refresh_type: str = 'daily') -> List[Tuple[str, float]]:
+        if metric not in self.RANK_METRICS:
+            raise ValueError(f"Unknown rank metric: {metric} (expected one of {', '.join(self.RANK_METRICS)})")
+        generation = self.generation(chain, refresh_type)
+        if generation is None:
+            return []
+        keys = self._generation_keys(self._slice_key(chain, refresh_type), generation)
+        return self.client.zrevrange(keys[metric], offset, offset + limit - 1, withscores=True)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+import polars as pl
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Parquet files on local disk keyed by query identity plus source watermark.
+
+    Entries older than max_age_seconds are ignored (the query windows slide with
+    now()), and the least recently used files are evicted above max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(identity: str, watermark: Dict[str, Any]) -> str:
+        payload = json.dumps({'identity': identity, 'watermark': watermark}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def _fresh(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        if age > self.max_age_seconds:
+            return None
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+        return path
+
+    def get(self, key: str) -> Optional[pl.DataFrame]:
+        path = self._fresh(key)
+        if path is None:
+            return None
+        try:
+            frame = pl.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        logger.info(f"Result cache hit: {frame.height:,} rows")
+        return frame
+
+    def open_stream(self, key: str) -> Optional[pq.ParquetFile]:
+        """Open a fresh entry for reading one row group at a time, None on a miss."""
+        path = self._fresh(key)
+        if path is None:
+            return None
+        try:
+            parquet = pq.ParquetFile(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        logger.info(f"Result cache hit: {parquet.metadata.num_rows:,} rows in {parquet.num_row_groups} row groups")
+        return parquet
+
+    @staticmethod
+    def read_stream(parquet: pq.ParquetFile) -> Iterator[pl.DataFrame]:
+        with parquet:
+            for index in range(parquet.num_row_groups):
+                yield pl.from_arrow(parquet.read_row_group(index))
+
+    def put_stream(self, key: str, blocks: Iterable[pl.DataFrame]) -> Iterator[pl.DataFrame]:
+        """Pass blocks through while appending each one to the entry as a row group.
+
+        The entry only replaces the cached file once the stream is exhausted, a
+        stream abandoned or failing midway leaves no entry behind. A write error
+        stops caching but not the stream.
+        """
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        writer = None
+        try:
+            for block in blocks:
+                if tmp_path is not None:
+                    try:
+                        table = block.to_arrow()
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp_path, table.schema, compression='zstd')
+                        writer.write_table(table)
+                    except Exception as e:
+                        logger.warning(f"Failed to write cache entry {path}: {e}")
+                        self._discard(writer, tmp_path)
+                        writer, tmp_path = None, None
+                yield block
+
+            if writer is not None:
+                writer.close()
+                os.replace(tmp_path, path)
+                writer, tmp_path = None, None
+                self._evict()
+        finally:
+            if tmp_path is not None:
+                self._discard(writer, tmp_path)
+
+    @staticmethod
+    def _discard(writer: Optional[pq.ParquetWriter], tmp_path: str):
+        try:
+            if writer is not None:
+                writer.close()
+        finally:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def put(self, key: str, frame: pl.DataFrame):
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            frame.write_parquet(tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            os.remove(tmp_path)
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.parquet'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_atime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+            logger.info(f"Evicted result cache entry {name}")
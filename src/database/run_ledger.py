@@ -0,0 +1,74 @@
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from ..metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class RunLedger:
+    """Postgres history of every job run: duration, ClickHouse rows read, peak memory and result size.
+
+    Each entry keeps the execution plan the run used, so the QueryPlanner can tell
+    how much of the cost came from the plan and how much from the data. The table
+    is created by schema migration 2.
+    """
+
+    TABLE_NAME = 'smartmoney_run_ledger'
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def record(self, run: RunMetrics, plan: Optional[Dict[str, Any]] = None):
+        totals = run.query_totals()
+        finished_at = run.finished_at or run.started_at
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"""
+                INSERT INTO {self.TABLE_NAME} (
+                    job_name, chain, refresh_type, success, started_at, duration_seconds, query_seconds,
+                    queries, read_rows, read_bytes, peak_memory_bytes, result_rows, plan
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
+                    run.job,
+                    run.labels.get('chain'),
+                    run.labels.get('refresh_type'),
+                    bool(run.success),
+                    datetime.fromtimestamp(run.started_at, tz=timezone.utc),
+                    round(finished_at - run.started_at, 4),
+                    round(totals['elapsed_seconds'], 4),
+                    totals['queries'],
+                    int(totals['read_rows']),
+                    int(totals['read_bytes']),
+                    int(totals['memory_usage']),
+                    int(totals['result_rows']),
+                    json.dumps(plan) if plan is not None else None,
+                ))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"Failed to record run of {run.job} in {self.TABLE_NAME}: {e}")
+
+    def history(self, job_name: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """The job's most recent successful runs, newest first."""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"""
+                SELECT started_at, duration_seconds, query_seconds, read_rows, read_bytes,
+                       peak_memory_bytes, result_rows, plan
+                FROM {self.TABLE_NAME}
+                WHERE job_name = %s AND success
+                ORDER BY started_at DESC
+                LIMIT %s
+                """, (job_name, limit))
+                columns = [desc[0] for desc in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"Failed to read run history of {job_name}: {e}")
+            return []
+        for row in rows:
+            row['plan'] = row['plan'] or {}
+        return rows
@@ -0,0 +1,56 @@
+import heapq
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+import polars as pl
+
+Shard = Tuple[int, int]
+
+
+def shard_filter(column: str, shard: Optional[Shard]) -> str:
+    """SQL predicate keeping the wallets of one hash shard, or '1' when unsharded.
+
+    The shard is bound through the shard_index / shard_count server-side parameters.
+    """
+    if shard is None:
+        return '1'
+    return f"cityHash64({column}) % {{shard_count:UInt32}} = {{shard_index:UInt32}}"
+
+
+def shard_parameters(shard: Optional[Shard]) -> Dict[str, Any]:
+    if shard is None:
+        return {}
+    index, count = shard
+    return {'shard_index': index, 'shard_count': count}
+
+
+def merge_top_k(frames: List[pl.DataFrame], key: str, limit: int, by: Optional[str] = None) -> pl.DataFrame:
+    """Merge per-shard top-K frames, each sorted by key descending, into the global top-K.
+
+    Shards partition wallets, so the global top-K is the K largest rows across shards.
+    With by set the limit applies per group, matching LIMIT n BY, and groups keep sorted order.
+    """
+    non_empty = [frame for frame in frames if not frame.is_empty()]
+    if not non_empty:
+        return frames[0] if frames else pl.DataFrame()
+
+    if by is None:
+        groups = [non_empty]
+    else:
+        by_value = {}
+        for frame in non_empty:
+            for (value,), part in frame.partition_by(by, as_dict=True, maintain_order=True).items():
+                by_value.setdefault(value, []).append(part)
+        groups = [by_value[value] for value in sorted(by_value)]
+
+    merged = []
+    for group in groups:
+        offsets = [0]
+        for frame in group[:-1]:
+            offsets.append(offsets[-1] + frame.height)
+        ranked = heapq.merge(*[
+            [(-value, shard, row) for row, value in enumerate(frame[key].to_list())]
+            for shard, frame in enumerate(group)
+        ])
+        picked = [offsets[shard] + row for _, shard, row in islice(ranked, limit)]
+        merged.append(pl.concat(group)[picked])
+    return pl.concat(merged)
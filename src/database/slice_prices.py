@@ -0,0 +1,42 @@
+from typing import Dict, Tuple
+from psycopg2.extras import execute_values
+
+SliceKey = Tuple[str, str]
+
+
+class SlicePrices:
+    """Native USD price of each published (chain, refresh_type) leaderboard slice.
+
+    The price is written in the same transaction as the slice's rows, and a delta
+    publish reprices the stored USD columns of untouched rows in that transaction too,
+    so the live tables, their USD indexes and the readers joining this table all see
+    one price per generation.
+    """
+
+    TABLE_NAME = 'smartmoney_slice_prices'
+
+    @classmethod
+    def store(cls, cur, prices: Dict[SliceKey, float]):
+        """Upsert slice prices on the publisher's cursor; the caller commits them with the rows."""
+        if not prices:
+            return
+        execute_values(cur, f"""
+            INSERT INTO {cls.TABLE_NAME} (chain, refresh_type, native_price_usd) VALUES %s
+            ON CONFLICT (chain, refresh_type)
+            DO UPDATE SET native_price_usd = EXCLUDED.native_price_usd, updated_at = NOW()
+        """, [(chain, refresh_type, float(price)) for (chain, refresh_type), price in prices.items()])
+
+    @staticmethod
+    def expression(column: str, native: str, alias: str = 't') -> str:
+        """SQL for column of a live table row (aliased `alias`) priced at its slice's current price."""
+        if column.endswith('_price_usd'):
+            return f"COALESCE(p.native_price_usd, {alias}.{column})"
+        if '_usd_' in column:
+            native_column = column.replace('_usd_', f'_{native}_')
+            return f"COALESCE({alias}.{native_column} * p.native_price_usd, {alias}.{column})"
+        return f"{alias}.{column}"
+
+    @classmethod
+    def join(cls, chain_sql: str, alias: str = 't') -> str:
+        """LEFT JOIN of the slice price as `p`; chain_sql is the row's chain (a column or a %s placeholder)."""
+        return f"LEFT JOIN {cls.TABLE_NAME} AS p ON p.chain = {chain_sql} AND p.refresh_type = {alias}.refresh_type"
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+import polars as pl
+from .partition_swap import PartitionSwap
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotExporter:
+    """Writes each published leaderboard generation as an uncompressed Arrow IPC file.
+
+    Files live under <directory>/<chain>/<refresh_type>/ and are renamed into place
+    complete; manifest.json in the same directory then switches to the new file, so a
+    consumer reading the manifest always opens a finished generation and can
+    memory-map it (pl.read_ipc maps uncompressed IPC by default). The previous generation is kept
+    for readers that resolved the manifest just before the switch.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory: str, keep_generations: int = 2):
+        self.directory = directory
+        self.keep_generations = keep_generations
+
+    @staticmethod
+    def _replace(path: str, write: Callable[[str], None]):
+        """Write through a unique temp file next to path, so concurrent publishers never share one."""
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def _write_json(cls, path: str, payload: Dict):
+        def write(tmp_path: str):
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, indent=2)
+        cls._replace(path, write)
+
+    def _prune(self, directory: str, current: str):
+        generations = sorted(name for name in os.listdir(directory) if name.endswith('.arrow'))
+        for name in generations[:-self.keep_generations]:
+            if name != current:
+                os.remove(os.path.join(directory, name))
+
+    def publish(self, chain: str, refresh_type: str, frame: pl.DataFrame) -> Optional[str]:
+        directory = os.path.join(
+            self.directory, PartitionSwap._check_identifier(chain), PartitionSwap._check_identifier(refresh_type)
+        )
+        generation = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+        name = f"{generation}.arrow"
+        path = os.path.join(directory, name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._replace(path, lambda tmp_path: frame.write_ipc(tmp_path, compression='uncompressed'))
+            self._write_json(os.path.join(directory, self.MANIFEST), {
+                'chain': chain,
+                'refresh_type': refresh_type,
+                'generation': generation,
+                'file': name,
+                'format': 'arrow_ipc',
+                'rows': frame.height,
+                'columns': frame.columns,
+                'published_at': datetime.now(timezone.utc).isoformat(),
+            })
+            self._prune(directory, name)
+        except Exception as e:
+            logger.warning(f"Failed to export {chain}/{refresh_type} snapshot to {directory}: {e}")
+            return None
+
+        logger.info(f"Exported {frame.height:,} {chain}/{refresh_type} rows to {path}")
+        return path
+
+
+def read_snapshot(directory: str, chain: str, refresh_type: str) -> pl.DataFrame:
+    """Memory-map the latest exported generation of a (chain, refresh_type) leaderboard."""
+    slice_dir = os.path.join(directory, chain, refresh_type)
+    with open(os.path.join(slice_dir, SnapshotExporter.MANIFEST)) as f:
+        manifest = json.load(f)
+    return pl.read_ipc(os.path.join(slice_dir, manifest['file']))
@@ -0,0 +1,67 @@
+import logging
+from typing import Tuple
+import polars as pl
+from psycopg2.extras import execute_values
+from ..metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class TokenLeaderboardStore:
+    """Publishes the token outputs of a run: per-token smart-money leaderboards and per-wallet top tokens.
+
+    Both tables are replaced per (chain, refresh_type) slice in one transaction, so
+    readers see the two outputs of the same run together.
+    """
+
+    TOKEN_TABLE = 'smartmoney_token_leaderboard'
+    WALLET_TABLE = 'smartmoney_wallet_top_tokens'
+
+    TOKEN_COLUMNS = (
+        'chain', 'refresh_type', 'traded_token', 'rank', 'wallet_address', 'wallet_rank',
+        'transactions_30d', 'buys_30d', 'sells_30d',
+        'realized_pnl_native_7d', 'realized_pnl_usd_7d', 'realized_pnl_native_30d', 'realized_pnl_usd_30d',
+        'native_price_usd',
+    )
+    WALLET_COLUMNS = ('chain', 'refresh_type', 'wallet_address', 'top_tokens', 'top_tokens_pnl_native_30d')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _insert(self, cur, table: str, columns: Tuple[str, ...], frame: pl.DataFrame):
+        execute_values(
+            cur,
+            f"INSERT INTO {table} ({', '.join(columns)}, created_at) VALUES %s",
+            list(frame.select(columns).iter_rows()),
+            template=f"({', '.join(['%s'] * len(columns))}, NOW())",
+        )
+
+    def publish(self, chain: str, refresh_type: str, tokens: pl.DataFrame, wallets: pl.DataFrame,
+                native_price: float) -> Tuple[int, int]:
+        price = float(native_price)
+        tokens = tokens.with_columns(
+            pl.lit(chain).alias('chain'),
+            pl.lit(refresh_type).alias('refresh_type'),
+            (pl.col('realized_pnl_native_7d') * price).alias('realized_pnl_usd_7d'),
+            (pl.col('realized_pnl_native_30d') * price).alias('realized_pnl_usd_30d'),
+            pl.lit(price).alias('native_price_usd'),
+        )
+        wallets = wallets.with_columns(pl.lit(chain).alias('chain'), pl.lit(refresh_type).alias('refresh_type'))
+
+        try:
+            with stage('token_outputs'), self.conn.cursor() as cur:
+                for table in (self.TOKEN_TABLE, self.WALLET_TABLE):
+                    cur.execute(f"DELETE FROM {table} WHERE chain = %s AND refresh_type = %s", (chain, refresh_type))
+                self._insert(cur, self.TOKEN_TABLE, self.TOKEN_COLUMNS, tokens)
+                self._insert(cur, self.WALLET_TABLE, self.WALLET_COLUMNS, wallets)
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"Failed to publish {chain}/{refresh_type} token outputs: {e}")
+            raise
+
+        logger.info(
+            f"Published {tokens['traded_token'].n_unique():,} {chain}/{refresh_type} token leaderboards "
+            f"and top tokens of {wallets.height:,} wallets"
+        )
+        return tokens.height, wallets.height
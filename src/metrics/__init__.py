@@ -0,0 +1,3 @@
+from .run_metrics import RunMetrics, current_run, export_run, record, record_query, stage, track_run
+
+__all__ = ['RunMetrics', 'current_run', 'export_run', 'record', 'record_query', 'stage', 'track_run']
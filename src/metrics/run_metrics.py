@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import psutil
+import requests
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'smartmoney'
+QUERY_STAT_FIELDS = ('read_rows', 'read_bytes', 'result_rows', 'memory_usage', 'elapsed_seconds')
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+_current: ContextVar[Optional['RunMetrics']] = ContextVar('run_metrics', default=None)
+
+
+class _PeakRss:
+    """Samples the process resident memory on a daemon thread while a run is active.
+
+    ru_maxrss is the peak over the whole process lifetime, so in daemon mode every
+    run after the largest one would report that run's peak instead of its own.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='run-rss', daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def start(self):
+        self.peak = self.process.memory_info().rss
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.ident is not None:
+            self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+class RunMetrics:
+    """Stage timings, row counters and ClickHouse query statistics for one worker run.
+
+    The active run lives in a context variable, so the database clients record into
+    it without it being passed through every call; outside a run recording is a no-op.
+    """
+
+    def __init__(self, job: str, labels: Optional[Dict[str, str]] = None):
+        self.job = job
+        self.labels = {k: str(v) for k, v in (labels or {}).items() if v is not None}
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.success: Optional[bool] = None
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[Tuple[str, LabelSet], float] = defaultdict(float)
+        self.queries: List[Dict[str, Any]] = []
+        self.rss = _PeakRss()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[name] += elapsed
+
+    def add(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def add_query(self, query_id: str, kind: str, stats: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.queries.append({'query_id': query_id, 'kind': kind, **(stats or {})})
+
+    def update_query_stats(self, stats_by_id: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            for query in self.queries:
+                query.update(stats_by_id.get(query['query_id'], {}))
+
+    def query_totals(self) -> Dict[str, float]:
+        totals = {'queries': len(self.queries)}
+        for field in QUERY_STAT_FIELDS:
+            values = [q[field] for q in self.queries if q.get(field) is not None]
+            totals[field] = (max(values) if field == 'memory_usage' else sum(values)) if values else 0
+        return totals
+
+    def finish(self, success: bool):
+        self.rss.stop()
+        self.finished_at = time.time()
+        self.success = success
+
+    def report(self) -> Dict[str, Any]:
+        finished_at = self.finished_at or time.time()
+        return {
+            'job': self.job,
+            'labels': self.labels,
+            'success': self.success,
+            'started_at': datetime.utcfromtimestamp(self.started_at).isoformat() + 'Z',
+            'finished_at': datetime.utcfromtimestamp(finished_at).isoformat() + 'Z',
+            'elapsed_seconds': round(finished_at - self.started_at, 4),
+            'stage_seconds': {name: round(seconds, 4) for name, seconds in sorted(self.stages.items())},
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            'clickhouse': {'totals': self.query_totals(), 'queries': self.queries},
+            'peak_rss_bytes': self.rss.peak,
+        }
+
+    def exposition(self) -> str:
+        base = {'job_name': self.job, **self.labels}
+        finished_at = self.finished_at or time.time()
+        lines = []
+
+        def metric(name: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]):
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} gauge")
+            for labels, value in samples:
+                lines.append(f"{full_name}{_format_labels({**base, **labels})} {value}")
+
+        metric('run_success', 'Whether the last run finished without error', [({}, int(bool(self.success)))])
+        metric('run_finished_timestamp_seconds', 'Unix time the last run finished', [({}, round(finished_at, 3))])
+        metric('run_elapsed_seconds', 'Wall time of the last run', [({}, round(finished_at - self.started_at, 4))])
+        metric('run_stage_seconds', 'Wall time per stage of the last run (stages may nest)',
+               [({'stage': name}, round(seconds, 4)) for name, seconds in sorted(self.stages.items())])
+
+        totals = self.query_totals()
+        metric('clickhouse_queries', 'ClickHouse queries issued by the last run', [({}, totals['queries'])])
+        metric('clickhouse_read_rows', 'Rows read by ClickHouse in the last run', [({}, totals['read_rows'])])
+        metric('clickhouse_read_bytes', 'Bytes read by ClickHouse in the last run', [({}, totals['read_bytes'])])
+        metric('clickhouse_result_rows', 'Rows returned by ClickHouse in the last run', [({}, totals['result_rows'])])
+        metric('clickhouse_peak_memory_bytes', 'Largest ClickHouse query memory usage in the last run',
+               [({}, totals['memory_usage'])])
+        metric('clickhouse_query_seconds', 'Server-side ClickHouse query time in the last run',
+               [({}, round(totals['elapsed_seconds'], 4))])
+
+        by_name = defaultdict(list)
+        for (name, labels), value in sorted(self.counters.items()):
+            by_name[name].append((dict(labels), value))
+        for name, samples in by_name.items():
+            metric(name, f"{name.replace('_', ' ').capitalize()} in the last run", samples)
+
+        metric('run_peak_rss_bytes', 'Peak resident memory of the worker process during the last run',
+               [({}, self.rss.peak)])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in sorted(labels.items())) + '}'
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', value)
+
+
+def current_run() -> Optional[RunMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    run = _current.get()
+    if run is None:
+        yield
+        return
+    with run.stage(name):
+        yield
+
+
+def record(name: str, value: float, **labels):
+    run = _current.get()
+    if run is not None:
+        run.add(name, value, **labels)
+
+
+def record_query(query_id: str, kind: str, stats: Optional[Dict[str, Any]] = None):
+    run = _current.get()
+    if run is not None:
+        run.add_query(query_id, kind, stats)
+
+
+@contextmanager
+def track_run(job: str, **labels) -> Iterator[RunMetrics]:
+    run = RunMetrics(job, labels)
+    run.rss.start()
+    token = _current.set(run)
+    try:
+        yield run
+        run.finish(True)
+    except BaseException:
+        run.finish(False)
+        raise
+    finally:
+        _current.reset(token)
+
+
+def _atomic_write(path: str, content: str):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def export_run(run: RunMetrics, directory: Optional[str], pushgateway_url: Optional[str] = None):
+    """Write the latest JSON report and Prometheus textfile of the job, and push to a Pushgateway if configured.
+
+    Export failures are logged and never fail the run.
+    """
+    name = _safe_name(run.job)
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _atomic_write(os.path.join(directory, f"{name}.json"), json.dumps(run.report(), indent=2, default=str))
+            _atomic_write(os.path.join(directory, f"{METRIC_PREFIX}_{name}.prom"), run.exposition())
+        except Exception as e:
+            logger.warning(f"Failed to write run metrics to {directory}: {e}")
+
+    if pushgateway_url:
+        try:
+            response = requests.put(
+                f"{pushgateway_url.rstrip('/')}/metrics/job/{METRIC_PREFIX}/instance/{name}",
+                data=run.exposition().encode('utf-8'),
+                timeout=10,
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to push run metrics to {pushgateway_url}: {e}")
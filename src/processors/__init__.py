@@ -1,4 +1,6 @@
 from .solana_smart_money_analyzer import SolanaSmartMoneyAnalyzer
 from .evm_smart_money_analyzer import EvmSmartMoneyAnalyzer
+from .offline_pnl import OfflinePnlEngine
+from .incremental_smart_money import IncrementalSmartMoneyEngine
 
-__all__ = ['SolanaSmartMoneyAnalyzer', 'EvmSmartMoneyAnalyzer']
+__all__ = ['SolanaSmartMoneyAnalyzer', 'EvmSmartMoneyAnalyzer', 'OfflinePnlEngine', 'IncrementalSmartMoneyEngine']
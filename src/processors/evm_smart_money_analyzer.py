@@ -1,7 +1,14 @@
 import logging
-from typing import Dict, Any, List
-from ..database import get_db_client, RedisClient, get_postgres_client
-from ..database.redis_client import RedisPriceNotFoundError
+from datetime import date
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import polars as pl
+from ..database import get_db_client, get_result_cache, merge_top_k, RedisClient, PostgresClient, get_postgres_client
+from ..database.prices import PriceNotAvailableError
+from ..database.sharding import Shard
+from ..metrics import record
+from .smart_money_query import SmartMoneyQueryBuilder
+from .swap_rollup import SwapRollup
+from .token_pnl_scan import TokenPnlScan
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +22,7 @@ class EvmSmartMoneyAnalyzer:
                 '0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee',
                 '0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2'  # WETH
             ],
-            'price_getter': 'get_eth_price'
+            'price_asset': 'eth'
         },
         'polygon': {
             'native_tokens': [
@@ -25,7 +32,7 @@ class EvmSmartMoneyAnalyzer:
                 '0x0d500b1d8e8ef31e21c99d1db9a6444d3adf1270', # WMATIC
                 '0x7ceB23fD6bC0adD59E62ac25578270cFf1b9f619'  # WETH on Polygon
             ],
-            'price_getter': 'get_matic_price'
+            'price_asset': 'matic'
         },
         'base': {
             'native_tokens': [
@@ -33,183 +40,305 @@ class EvmSmartMoneyAnalyzer:
                 '0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee',
                 '0x4200000000000000000000000000000000000006'  # WETH on Base
             ],
-            'price_getter': 'get_eth_price'
+            'price_asset': 'eth'
         }
     }
 
-    def __init__(self):
+    def __init__(self, postgres: Optional[PostgresClient] = None):
         self.db = get_db_client(use_evm_host=True)
+        self.result_cache = get_result_cache()
         self.redis = RedisClient()
-        self.postgres = get_postgres_client()
-
-    def _build_evm_query(self, chain: str, limit: int = 10000, price: float = 0.0) -> str:
-        native_tokens = self.CHAIN_CONFIG.get(chain, {}).get('native_tokens', [])
-        native_tokens_str = ", ".join([f"'{t}'" for t in native_tokens])
-
-        query = f"""
-        WITH
-        normalized_swaps AS (
-            SELECT
-                tx_from_address AS signing_wallet,
-                block_time,
-                CASE
-                    WHEN base_coin IN ({native_tokens_str}) THEN quote_coin
-                    ELSE base_coin
-                END AS traded_token,
-                CASE
-                    WHEN base_coin IN ({native_tokens_str}) THEN 'buy' -- Buying token with Native
-                    ELSE 'sell' -- Selling token for Native
-                END AS action,
-                CASE
-                    WHEN base_coin IN ({native_tokens_str}) THEN base_coin_amount / pow(10, base_coin_decimals)
-                    ELSE quote_coin_amount / pow(10, quote_coin_decimals)
-                END AS native_amount,
-                CASE
-                    WHEN base_coin IN ({native_tokens_str}) THEN quote_coin_amount / pow(10, quote_coin_decimals)
-                    ELSE base_coin_amount / pow(10, base_coin_decimals)
-                END AS traded_amount
-            FROM "evm"."swap_events"
-            PREWHERE chain = '{chain}' AND block_time >= now() - INTERVAL 30 DAY
-            WHERE (base_coin IN ({native_tokens_str}) OR quote_coin IN ({native_tokens_str}))
-        ),
-        wallet_token_stats AS (
-            SELECT
-                signing_wallet,
-                traded_token,
-                SUM(IF(action = 'buy', traded_amount, 0)) AS total_bought_30d,
-                SUM(IF(action = 'sell', traded_amount, 0)) AS total_sold_30d,
-                SUM(IF(action = 'buy', native_amount, 0)) AS native_spent_30d,
-                SUM(IF(action = 'sell', native_amount, 0)) AS native_received_30d,
-                SUM(IF(action = 'buy', 1, 0)) AS buy_count_30d,
-                SUM(IF(action = 'sell', 1, 0)) AS sell_count_30d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, traded_amount, 0)) AS total_bought_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, traded_amount, 0)) AS total_sold_7d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, native_amount, 0)) AS native_spent_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, native_amount, 0)) AS native_received_7d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, 1, 0)) AS buy_count_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, 1, 0)) AS sell_count_7d
-            FROM normalized_swaps
-            GROUP BY signing_wallet, traded_token
-            HAVING buy_count_30d > 0 AND sell_count_30d > 0
-                   AND total_bought_30d > 0 AND total_sold_30d > 0
-        ),
-        token_pnl AS (
-            SELECT
-                signing_wallet,
-                traded_token,
-                buy_count_30d,
-                sell_count_30d,
-                buy_count_7d,
-                sell_count_7d,
-                (native_received_30d / total_sold_30d - native_spent_30d / total_bought_30d)
-                    * least(total_bought_30d, total_sold_30d) AS pnl_native_30d,
-                IF(native_received_30d / total_sold_30d > native_spent_30d / total_bought_30d, 1, 0) AS is_profitable_30d,
-                IF(total_bought_7d > 0 AND total_sold_7d > 0,
-                   (native_received_7d / total_sold_7d - native_spent_7d / total_bought_7d)
-                       * least(total_bought_7d, total_sold_7d), 0) AS pnl_native_7d,
-                IF(total_bought_7d > 0 AND total_sold_7d > 0
-                   AND native_received_7d / total_sold_7d > native_spent_7d / total_bought_7d, 1, 0) AS is_profitable_7d
-            FROM wallet_token_stats
-            WHERE native_spent_30d > 0 AND native_received_30d > 0
-        ),
-        wallet_metrics AS (
-            SELECT
-                signing_wallet,
-                SUM(pnl_native_7d) AS total_pnl_native_7d,
-                100.0 * SUM(is_profitable_7d) / NULLIF(SUM(IF(buy_count_7d > 0 AND sell_count_7d > 0, 1, 0)), 0) AS winrate_7d,
-                SUM(buy_count_7d) AS total_buys_7d,
-                SUM(sell_count_7d) AS total_sells_7d,
-                COUNT(DISTINCT IF((buy_count_7d > 0 OR sell_count_7d > 0), traded_token, NULL)) AS unique_tokens_7d,
-                SUM(pnl_native_30d) AS total_pnl_native_30d,
-                100.0 * SUM(is_profitable_30d) / COUNT(*) AS winrate_30d,
-                SUM(buy_count_30d) AS total_buys_30d,
-                SUM(sell_count_30d) AS total_sells_30d,
-                COUNT(DISTINCT traded_token) AS unique_tokens_30d
-            FROM token_pnl
-            GROUP BY signing_wallet
-        ),
-        transaction_counts AS (
-            SELECT
-                signing_wallet,
-                COUNT(*) as tx_count_30d,
-                SUM(IF(block_time >= now() - INTERVAL 7 DAY, 1, 0)) as tx_count_7d
-            FROM normalized_swaps
-            GROUP BY signing_wallet
+        self.postgres = postgres or get_postgres_client()
+        if self.redis.leaderboard is not None:
+            self.postgres.add_sink('redis_leaderboard', self.redis.leaderboard)
+        self.rollups: Dict[str, SwapRollup] = {}
+        self.query_builder = SmartMoneyQueryBuilder(
+            '"evm"."swap_events"', 'tx_from_address',
+            {chain: config['native_tokens'] for chain, config in self.CHAIN_CONFIG.items()},
+            direction=SmartMoneyQueryBuilder.DIRECTION_NATIVE_SIDE, decimal_columns=True, chain_column='chain',
         )
-        SELECT
-            trimBoth(toString(w.signing_wallet), '\\0') AS wallet_address,
-            COALESCE(tc.tx_count_7d, 0) AS transactions_7d,
-            COALESCE(w.total_buys_7d, 0) AS buys_7d,
-            COALESCE(w.total_sells_7d, 0) AS sells_7d,
-            COALESCE(w.unique_tokens_7d, 0) AS unique_tokens_7d,
-            ROUND(COALESCE(w.total_pnl_native_7d, 0), 6) AS realized_pnl_native_7d,
-            ROUND(COALESCE(w.total_pnl_native_7d, 0) * {price}, 2) AS realized_pnl_usd_7d,
-            ROUND(COALESCE(w.winrate_7d, 0), 2) AS winrate_percent_7d,
-            COALESCE(tc.tx_count_30d, 0) AS transactions_30d,
-            COALESCE(w.total_buys_30d, 0) AS buys_30d,
-            COALESCE(w.total_sells_30d, 0) AS sells_30d,
-            COALESCE(w.unique_tokens_30d, 0) AS unique_tokens_30d,
-            ROUND(COALESCE(w.total_pnl_native_30d, 0), 6) AS realized_pnl_native_30d,
-            ROUND(COALESCE(w.total_pnl_native_30d, 0) * {price}, 2) AS realized_pnl_usd_30d,
-            ROUND(COALESCE(w.winrate_30d, 0), 2) AS winrate_percent_30d
-        FROM wallet_metrics w
-        LEFT JOIN transaction_counts tc ON w.signing_wallet = tc.signing_wallet
-        ORDER BY total_pnl_native_30d DESC
-        LIMIT {limit}
-        """
-        return query
-
-    def analyze_smart_money(self, chain: str, limit: int = 10000, refresh_type: str = 'hourly') -> Dict[str, Any]:
-        if chain not in self.CHAIN_CONFIG:
-            raise ValueError(f"Unsupported chain: {chain}")
 
-        logger.info("=" * 60)
-        logger.info(f"{chain.upper()} SMART MONEY ANALYSIS")
-        logger.info("=" * 60)
+    def _rollup(self, chain: str) -> SwapRollup:
+        if chain not in self.rollups:
+            self.rollups[chain] = SwapRollup(self.db, chain, self.query_builder)
+        return self.rollups[chain]
+
+    def _build_evm_query(self, chain: str, limit: int = 10000, rollup_until: Optional[date] = None,
+                         shard: Optional[Shard] = None) -> Tuple[str, Dict[str, Any]]:
+        daily_swaps_sql = self._rollup(chain).daily_swaps_sql(shard) if rollup_until else None
+        query = self.query_builder.build(limit, shard=shard, daily_swaps_sql=daily_swaps_sql)
+        return query, self.query_builder.parameters([chain], shard=shard, covered_until=rollup_until)
 
-        price_getter_name = self.CHAIN_CONFIG[chain]['price_getter']
-        price_getter = getattr(self.redis, price_getter_name)
+    def _build_multi_chain_query(self, chains: List[str], limit: int = 10000, rollup_until: Optional[date] = None,
+                                 shard: Optional[Shard] = None) -> Tuple[str, Dict[str, Any]]:
+        # Rollup reads cover every chain in the chains parameter, so any chain's SwapRollup builds them
+        daily_swaps_sql = self._rollup(chains[0]).daily_swaps_sql(shard) if rollup_until else None
+        query = self.query_builder.build(limit, shard=shard, daily_swaps_sql=daily_swaps_sql)
+        return query, self.query_builder.parameters(chains, shard=shard, covered_until=rollup_until)
 
+    def _rollup_until(self, chains: List[str]) -> date:
+        """First day any of the chains still reads from raw swaps."""
+        return min(self._rollup(chain).covered_until() for chain in chains)
+
+    def _sharded_executor(self, build_query: Callable[[Shard], Tuple[str, Dict[str, Any]]], limit: int,
+                          shards: int) -> Optional[Callable[[], pl.DataFrame]]:
+        # Shards partition wallets, so the merged top-K per chain equals (and is cached as) the unsharded result
+        if shards <= 1:
+            return None
+        return lambda: merge_top_k(
+            self.db.execute_query_frames_sharded(build_query, shards), 'realized_pnl_native_30d', limit, by='chain'
+        )
+
+    def native_prices(self, chains: List[str]) -> Dict[str, float]:
         try:
-            native_price = price_getter()
-            logger.info(f"{chain.upper()} price: ${native_price:.2f}")
-        except RedisPriceNotFoundError as e:
-            logger.error(f"Cannot proceed without {chain.upper()} price: {e}")
+            asset_prices = self.redis.get_prices([self.CHAIN_CONFIG[chain]['price_asset'] for chain in chains])
+        except PriceNotAvailableError as e:
+            logger.error(f"Cannot proceed without native prices for {', '.join(c.upper() for c in chains)}: {e}")
             raise
 
-        logger.info(f"Fetching top {limit:,} wallets by PnL...")
-        query = self._build_evm_query(chain, limit=limit, price=native_price)
+        prices = {chain: asset_prices[self.CHAIN_CONFIG[chain]['price_asset']] for chain in chains}
+        for chain, native_price in prices.items():
+            logger.info(f"{chain.upper()} price: ${native_price:.2f}")
+        return prices
 
+    def publish_metrics(self, chain: str, metrics: pl.DataFrame, native_price: float, refresh_limits: Dict[str, int]) -> Dict[str, int]:
         try:
-            metrics = self.db.execute_query_dict(query)
-            logger.info(f"Retrieved {len(metrics):,} wallet metrics")
+            stored_by_refresh = {}
+            for publish_type, publish_limit in refresh_limits.items():
+                stored_by_refresh[publish_type] = self.postgres.refresh_evm_smart_money(
+                    metrics[:publish_limit], chain, native_price, refresh_type=publish_type
+                )
+            return stored_by_refresh
         except Exception as e:
-            logger.error(f"Failed to fetch metrics: {e}")
+            logger.error(f"Failed to refresh data: {e}")
             raise
 
-        if not metrics:
-            logger.warning("No metrics found")
-            return {'wallets_processed': 0, 'native_price_usd': native_price, 'wallets_stored': 0}
+    def _watermark(self, chains: List[str]) -> Optional[Dict[str, Any]]:
+        if not self.result_cache:
+            return None
+        chains_str = ", ".join([f"'{c}'" for c in chains])
+        return self.db.source_watermark('"evm"."swap_events"', where=f"chain IN ({chains_str})")
+
+    def _fetch_metrics(self, query: str, parameters: Dict[str, Any], chains: List[str],
+                       execute: Optional[Callable[[], pl.DataFrame]] = None) -> pl.DataFrame:
+        identity = self.query_builder.cache_identity(query, parameters)
+        return self.db.execute_query_frame_cached(
+            query, self.result_cache, identity, self._watermark(chains), execute, parameters
+        )
 
+    def _stream_publish(self, query: str, parameters: Dict[str, Any], prices: Dict[str, float],
+                        refresh_limits: Dict[str, int],
+                        execute: Optional[Callable[[], pl.DataFrame]] = None) -> Dict[str, Dict[str, int]]:
         try:
-            stored_count = self.postgres.refresh_evm_smart_money(metrics, chain, native_price, refresh_type=refresh_type)
+            if execute:
+                blocks = iter([self._fetch_metrics(query, parameters, list(prices), execute)])
+            else:
+                identity = self.query_builder.cache_identity(query, parameters)
+                blocks = self.db.stream_query_frames_cached(
+                    query, self.result_cache, identity, self._watermark(list(prices)), parameters
+                )
+            return self.postgres.stream_refresh_evm_smart_money(blocks, prices, refresh_limits)
         except Exception as e:
-            logger.error(f"Failed to refresh data: {e}")
+            logger.error(f"Failed to stream metrics: {e}")
             raise
 
+    def compact_rollup(self, chain: str, recompact_days: int = 1) -> Dict[str, Any]:
+        if chain not in self.CHAIN_CONFIG:
+            raise ValueError(f"Unsupported chain: {chain}")
+
+        rollup = self._rollup(chain)
+        days_compacted = rollup.compact(recompact_days=recompact_days)
+        return {'days_compacted': days_compacted, 'covered_until': str(rollup.covered_until())}
+
+    def analyze_smart_money(self, chain: str, limit: int = 10000, refresh_type: str = 'hourly', use_rollup: bool = False,
+                            refresh_limits: Optional[Dict[str, int]] = None, streaming: bool = False,
+                            shards: int = 1, token_outputs: bool = False) -> Dict[str, Any]:
+        if chain not in self.CHAIN_CONFIG:
+            raise ValueError(f"Unsupported chain: {chain}")
+
+        refresh_limits = refresh_limits or {refresh_type: limit}
+        limit = max(refresh_limits.values())
+
+        logger.info("=" * 60)
+        logger.info(f"{chain.upper()} SMART MONEY ANALYSIS")
+        logger.info("=" * 60)
+
+        native_price = self.native_prices([chain])[chain]
+
+        rollup_until = None
+        if use_rollup:
+            rollup_until = self._rollup_until([chain])
+            logger.info(f"Reading swap rollup before {rollup_until}, raw swaps after")
+
+        logger.info(f"Fetching top {limit:,} wallets by PnL...")
+        query, parameters = self._build_evm_query(chain, limit=limit, rollup_until=rollup_until)
+        execute = self._sharded_executor(
+            lambda shard: self._build_evm_query(chain, limit=limit, rollup_until=rollup_until, shard=shard),
+            limit, shards
+        )
+
+        scan = None
+        if token_outputs:
+            scan = TokenPnlScan(self.db, self.query_builder, chain, [chain], shards=shards,
+                                rollup=self._rollup(chain), rollup_until=rollup_until)
+            # Same wallets as the raw query, so the result is cached under the raw query's identity
+            # and a cache hit skips the scan
+            execute = lambda: scan.wallet_metrics(limit)
+        try:
+            results = self._analyze_chain(chain, query, parameters, execute, native_price, refresh_limits, streaming)
+            if scan is not None and scan.materialized and results['wallets_processed']:
+                results['token_outputs'] = scan.publish(self.postgres, {chain: native_price}, refresh_limits)[chain]
+            elif scan is not None:
+                logger.info("Wallet metrics served from the result cache, keeping the previous token outputs")
+            return results
+        finally:
+            if scan is not None:
+                scan.drop()
+
+    def _analyze_chain(self, chain: str, query: str, parameters: Dict[str, Any],
+                       execute: Optional[Callable[[], pl.DataFrame]], native_price: float,
+                       refresh_limits: Dict[str, int], streaming: bool) -> Dict[str, Any]:
+        if streaming:
+            stored_by_refresh = self._stream_publish(query, parameters, {chain: native_price}, refresh_limits, execute)[chain]
+            wallets_processed = max(stored_by_refresh.values())
+        else:
+            try:
+                metrics = self._fetch_metrics(query, parameters, [chain], execute)
+                logger.info(f"Retrieved {len(metrics):,} wallet metrics")
+            except Exception as e:
+                logger.error(f"Failed to fetch metrics: {e}")
+                raise
+
+            if metrics.is_empty():
+                logger.warning("No metrics found")
+                return {'wallets_processed': 0, 'native_price_usd': native_price, 'wallets_stored': 0}
+
+            stored_by_refresh = self.publish_metrics(chain, metrics, native_price, refresh_limits)
+            wallets_processed = len(metrics)
+
         total_wallets = self.postgres.get_evm_wallet_count(chain)
+        record('wallets_processed', wallets_processed, chain=chain)
+        record('wallets_in_db', total_wallets, chain=chain)
 
         logger.info("=" * 60)
-        logger.info(f"COMPLETE: {len(metrics):,} wallets, ${native_price:.2f} {chain.upper()}, {total_wallets:,} in DB")
+        logger.info(f"COMPLETE: {wallets_processed:,} wallets, ${native_price:.2f} {chain.upper()}, {total_wallets:,} in DB")
         logger.info("=" * 60)
 
         return {
-            'wallets_processed': len(metrics),
+            'wallets_processed': wallets_processed,
             'native_price_usd': native_price,
-            'wallets_stored': stored_count,
+            'wallets_stored': sum(stored_by_refresh.values()),
+            'wallets_stored_by_refresh': stored_by_refresh,
             'total_wallets_in_db': total_wallets
         }
 
+    def analyze_multi_chain(self, chains: Optional[List[str]] = None, limit: int = 10000, refresh_type: str = 'hourly',
+                            use_rollup: bool = False, refresh_limits: Optional[Dict[str, int]] = None,
+                            streaming: bool = False, shards: int = 1, token_outputs: bool = False) -> Dict[str, Any]:
+        chains = chains or list(self.CHAIN_CONFIG)
+        unsupported = [c for c in chains if c not in self.CHAIN_CONFIG]
+        if unsupported:
+            raise ValueError(f"Unsupported chain: {', '.join(unsupported)}")
+
+        refresh_limits = refresh_limits or {refresh_type: limit}
+        limit = max(refresh_limits.values())
+
+        logger.info("=" * 60)
+        logger.info(f"MULTI-CHAIN SMART MONEY ANALYSIS: {', '.join(c.upper() for c in chains)}")
+        logger.info("=" * 60)
+
+        prices = self.native_prices(chains)
+
+        rollup_until = None
+        if use_rollup:
+            rollup_until = self._rollup_until(chains)
+            logger.info(f"Reading swap rollup before {rollup_until}, raw swaps after")
+
+        logger.info(f"Fetching top {limit:,} wallets by PnL per chain...")
+        query, parameters = self._build_multi_chain_query(chains, limit=limit, rollup_until=rollup_until)
+        execute = self._sharded_executor(
+            lambda shard: self._build_multi_chain_query(chains, limit=limit, rollup_until=rollup_until, shard=shard),
+            limit, shards
+        )
+
+        scan = None
+        if token_outputs:
+            scan = TokenPnlScan(self.db, self.query_builder, '_'.join(chains), chains, shards=shards,
+                                rollup=self._rollup(chains[0]), rollup_until=rollup_until)
+            # Same wallets as the raw query, so the result is cached under the raw query's identity
+            # and a cache hit skips the scan
+            execute = lambda: scan.wallet_metrics(limit)
+        try:
+            results = self._analyze_chains(chains, query, parameters, execute, prices, refresh_limits, streaming)
+            if scan is not None and not scan.materialized:
+                logger.info("Wallet metrics served from the result cache, keeping the previous token outputs")
+            elif scan is not None:
+                published = {chain: prices[chain] for chain, r in results['chains'].items() if r['wallets_processed']}
+                if published:
+                    for chain, stored in scan.publish(self.postgres, published, refresh_limits).items():
+                        results['chains'][chain]['token_outputs'] = stored
+            return results
+        finally:
+            if scan is not None:
+                scan.drop()
+
+    def _analyze_chains(self, chains: List[str], query: str, parameters: Dict[str, Any],
+                        execute: Optional[Callable[[], pl.DataFrame]], prices: Dict[str, float],
+                        refresh_limits: Dict[str, int], streaming: bool) -> Dict[str, Any]:
+        if streaming:
+            stored = self._stream_publish(query, parameters, prices, refresh_limits, execute)
+            chain_results = {
+                chain: {
+                    'wallets_processed': max(stored[chain].values()),
+                    'native_price_usd': prices[chain],
+                    'wallets_stored': sum(stored[chain].values()),
+                    'wallets_stored_by_refresh': stored[chain],
+                    'total_wallets_in_db': self.postgres.get_evm_wallet_count(chain)
+                }
+                for chain in chains
+            }
+        else:
+            try:
+                metrics = self._fetch_metrics(query, parameters, chains, execute)
+                logger.info(f"Retrieved {len(metrics):,} wallet metrics")
+            except Exception as e:
+                logger.error(f"Failed to fetch metrics: {e}")
+                raise
+
+            chain_results = {}
+            for chain in chains:
+                chain_metrics = metrics.filter(pl.col('chain') == chain)
+                if chain_metrics.is_empty():
+                    logger.warning(f"No metrics found for {chain}")
+                    chain_results[chain] = {'wallets_processed': 0, 'native_price_usd': prices[chain], 'wallets_stored': 0}
+                    continue
+
+                stored_by_refresh = self.publish_metrics(chain, chain_metrics, prices[chain], refresh_limits)
+                chain_results[chain] = {
+                    'wallets_processed': len(chain_metrics),
+                    'native_price_usd': prices[chain],
+                    'wallets_stored': sum(stored_by_refresh.values()),
+                    'wallets_stored_by_refresh': stored_by_refresh,
+                    'total_wallets_in_db': self.postgres.get_evm_wallet_count(chain)
+                }
+
+        for chain, chain_result in chain_results.items():
+            logger.info(f"{chain.upper()}: {chain_result['wallets_processed']:,} wallets, ${prices[chain]:.2f}")
+            record('wallets_processed', chain_result['wallets_processed'], chain=chain)
+            if 'total_wallets_in_db' in chain_result:
+                record('wallets_in_db', chain_result['total_wallets_in_db'], chain=chain)
+        wallets_processed = sum(r['wallets_processed'] for r in chain_results.values())
+
+        logger.info("=" * 60)
+        logger.info(f"COMPLETE: {wallets_processed:,} wallets across {len(chains)} chains")
+        logger.info("=" * 60)
+
+        return {
+            'wallets_processed': wallets_processed,
+            'wallets_stored': sum(r['wallets_stored'] for r in chain_results.values()),
+            'chains': chain_results
+        }
+
     def close(self):
         self.db.close()
         self.postgres.close()
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import polars as pl
+from ..config import Config
+from ..database import ClickHouseClient
+from .offline_pnl import OfflinePnlEngine, _count
+from .smart_money_query import SmartMoneyQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+HOUR_SECONDS = 3600
+KEY = ['chain', 'signing_wallet', 'traded_token']
+ID_KEY = [f'{column}_id' for column in KEY]
+SUMS = ['bought', 'sold', 'native_spent', 'native_received', 'buy_count', 'sell_count', 'swap_count']
+ROW_SCHEMA = {
+    'chain': pl.Utf8, 'signing_wallet': pl.Utf8, 'traded_token': pl.Utf8, 'ts': pl.Int64,
+    'action': pl.Utf8, 'native_amount': pl.Float64, 'traded_amount': pl.Float64,
+}
+SUM_SCHEMA = {
+    'bought': pl.Float64, 'sold': pl.Float64, 'native_spent': pl.Float64, 'native_received': pl.Float64,
+    'buy_count': pl.UInt64, 'sell_count': pl.UInt64, 'swap_count': pl.UInt64,
+}
+STATS_SCHEMA = {**{column: pl.Utf8 for column in KEY}, **SUM_SCHEMA}
+BUCKET_SCHEMA = {**{column: pl.UInt32 for column in ID_KEY}, **SUM_SCHEMA}
+HOUR_SCHEMA = {**BUCKET_SCHEMA, 'hour': pl.Int64}
+
+
+def _conform(frame: pl.DataFrame, schema: Dict[str, Any]) -> pl.DataFrame:
+    return frame.select([pl.col(column).cast(dtype) for column, dtype in schema.items()])
+
+
+class _Dictionary:
+    """UInt32 ids for the distinct values of one key column, so buckets don't repeat the strings."""
+
+    def __init__(self, column: str, ids: Optional[pl.DataFrame] = None):
+        self.column = column
+        self.id_column = f'{column}_id'
+        schema = {column: pl.Utf8, self.id_column: pl.UInt32}
+        self.ids = pl.DataFrame(schema=schema) if ids is None else _conform(ids, schema)
+
+    def encode(self, frame: pl.DataFrame) -> pl.DataFrame:
+        new = frame.select(pl.col(self.column).unique()).join(self.ids, on=self.column, how='anti')
+        if not new.is_empty():
+            start = self.ids.height
+            new = new.with_columns(pl.int_range(start, start + new.height, dtype=pl.UInt32).alias(self.id_column))
+            self.ids = pl.concat([self.ids, new])
+        return frame.join(self.ids, on=self.column, how='left').drop(self.column)
+
+    def decode(self, frame: pl.LazyFrame) -> pl.LazyFrame:
+        return frame.join(self.ids.lazy(), on=self.id_column, how='left').drop(self.id_column)
+
+    def compact(self, frames: List[pl.DataFrame]) -> List[pl.DataFrame]:
+        """Drops the values no frame refers to any more and renumbers the rest."""
+        if not frames:
+            self.ids = self.ids.clear()
+            return frames
+        used = pl.concat([frame.select(self.id_column) for frame in frames]).unique()
+        kept = self.ids.join(used, on=self.id_column, how='semi').sort(self.id_column)
+        mapping = kept.with_columns(pl.int_range(kept.height, dtype=pl.UInt32).alias('new_id'))
+        self.ids = mapping.select(self.column, pl.col('new_id').alias(self.id_column))
+        mapping = mapping.select(self.id_column, 'new_id')
+        return [
+            frame.join(mapping, on=self.id_column, how='left').drop(self.id_column).rename({'new_id': self.id_column})
+            for frame in frames
+        ]
+
+
+def _aggregate(rows: pl.DataFrame) -> pl.DataFrame:
+    buy = pl.col('action') == 'buy'
+    sell = pl.col('action') == 'sell'
+    sums = rows.group_by(KEY).agg(
+        pl.when(buy).then(pl.col('traded_amount')).otherwise(0.0).sum().alias('bought'),
+        pl.when(sell).then(pl.col('traded_amount')).otherwise(0.0).sum().alias('sold'),
+        pl.when(buy).then(pl.col('native_amount')).otherwise(0.0).sum().alias('native_spent'),
+        pl.when(sell).then(pl.col('native_amount')).otherwise(0.0).sum().alias('native_received'),
+        _count(buy).alias('buy_count'),
+        _count(sell).alias('sell_count'),
+        pl.len().cast(pl.UInt64).alias('swap_count'),
+    )
+    return _conform(sums, STATS_SCHEMA)
+
+
+class IncrementalSmartMoneyEngine:
+    """Keeps a smart-money leaderboard current by tailing new swaps instead of rescanning 30 days.
+
+    Settled swaps (older than settle_lag_seconds, so late inserts are still picked up)
+    are folded into a ring of per-(chain, wallet, token) sums, one frame per UTC day,
+    and buckets leave the ring as the 30d window slides past them. Newer swaps are
+    re-read on every poll. Bucket keys are dictionary-encoded ids, renumbered once a
+    day as the ring drops old wallets. The days the 30d and 7d windows start in are
+    kept as hourly sums, re-read when a window edge moves onto a new day, plus the raw
+    rows of the hour the window starts in, so each window is whole buckets, the whole
+    hours after its cutoff and the exact tail of the cutoff hour. The wallet rollup is
+    OfflinePnlEngine's, so refresh(now) matches the batch query run at now() on a UTC
+    ClickHouse server.
+    """
+
+    WINDOWS = {'30d': OfflinePnlEngine.WINDOW_DAYS, '7d': OfflinePnlEngine.RECENT_DAYS}
+    STATE_FILE = 'state.json'
+
+    def __init__(self, db: ClickHouseClient, query_builder: SmartMoneyQueryBuilder, chains: List[str],
+                 limit: int = 10000, checkpoint_name: Optional[str] = None, checkpoint_dir: Optional[str] = None,
+                 settle_lag_seconds: Optional[int] = None):
+        self.db = db
+        self.query_builder = query_builder
+        self.chains = list(chains)
+        self.limit = limit
+        self.checkpoint_path = os.path.join(
+            checkpoint_dir or Config.INCREMENTAL_CHECKPOINT_DIR, checkpoint_name or '_'.join(self.chains)
+        )
+        self.settle_lag_seconds = (
+            Config.INCREMENTAL_SETTLE_LAG_SECONDS if settle_lag_seconds is None else settle_lag_seconds
+        )
+        self.leaderboard = OfflinePnlEngine()
+
+        self.dictionaries = {column: _Dictionary(column) for column in KEY}
+        self.buckets: Dict[int, pl.DataFrame] = {}
+        self.edges: Dict[str, Tuple[int, pl.DataFrame]] = {}
+        self.edge_rows: Dict[str, Tuple[int, pl.DataFrame]] = {}
+        self.hot = pl.DataFrame(schema=ROW_SCHEMA)
+        self.settled_until: Optional[int] = None
+
+    @staticmethod
+    def _edge_day(now: int, days: int) -> int:
+        return (now - days * DAY_SECONDS) // DAY_SECONDS
+
+    @staticmethod
+    def _time_filter(until: bool) -> str:
+        time_filter = 'block_time >= toDateTime({since:UInt32})'
+        return f"{time_filter} AND block_time < toDateTime({{until:UInt32}})" if until else time_filter
+
+    def _rows_sql(self, until: bool) -> str:
+        return f"""
+            SELECT
+                chain,
+                toString(signing_wallet) AS signing_wallet,
+                toString(traded_token) AS traded_token,
+                toInt64(toUnixTimestamp(block_time)) AS ts,
+                action,
+                toFloat64(native_amount) AS native_amount,
+                toFloat64(traded_amount) AS traded_amount
+            FROM ({self.query_builder.normalized_swaps_sql(self._time_filter(until))})
+        """
+
+    def _buckets_sql(self, period: str, seconds: int) -> str:
+        return f"""
+            SELECT
+                chain,
+                toString(signing_wallet) AS signing_wallet,
+                toString(traded_token) AS traded_token,
+                intDiv(toInt64(toUnixTimestamp(block_time)), {seconds}) AS {period},
+                SUM(IF(action = 'buy', toFloat64(traded_amount), 0)) AS bought,
+                SUM(IF(action = 'sell', toFloat64(traded_amount), 0)) AS sold,
+                SUM(IF(action = 'buy', toFloat64(native_amount), 0)) AS native_spent,
+                SUM(IF(action = 'sell', toFloat64(native_amount), 0)) AS native_received,
+                toUInt64(SUM(IF(action = 'buy', 1, 0))) AS buy_count,
+                toUInt64(SUM(IF(action = 'sell', 1, 0))) AS sell_count,
+                toUInt64(COUNT(*)) AS swap_count
+            FROM ({self.query_builder.normalized_swaps_sql(self._time_filter(until=True))})
+            GROUP BY chain, signing_wallet, traded_token, {period}
+        """
+
+    def _execute(self, query: str, since: int, until: Optional[int] = None) -> pl.DataFrame:
+        parameters = self.query_builder.parameters(self.chains)
+        parameters['since'] = since
+        if until is not None:
+            parameters['until'] = until
+        return self.db.execute_query_frame(query, parameters)
+
+    def _fetch_rows(self, since: int, until: Optional[int] = None) -> pl.DataFrame:
+        rows = self._execute(self._rows_sql(until is not None), since, until)
+        return _conform(rows, ROW_SCHEMA) if rows.width else pl.DataFrame(schema=ROW_SCHEMA)
+
+    def _encode(self, stats: pl.DataFrame) -> pl.DataFrame:
+        for dictionary in self.dictionaries.values():
+            stats = dictionary.encode(stats)
+        return stats
+
+    def _add_buckets(self, daily: pl.DataFrame):
+        """Adds encoded per-day sums to the day buckets."""
+        if daily.is_empty():
+            return
+        for (day,), part in daily.partition_by('day', as_dict=True).items():
+            part = _conform(part, BUCKET_SCHEMA)
+            if day in self.buckets:
+                part = _conform(pl.concat([self.buckets[day], part]).group_by(ID_KEY).agg(pl.col(SUMS).sum()), BUCKET_SCHEMA)
+            self.buckets[day] = part
+
+    def _fold(self, rows: pl.DataFrame):
+        if rows.is_empty():
+            return
+        for (day,), part in rows.with_columns(pl.col('ts') // DAY_SECONDS).partition_by('ts', as_dict=True).items():
+            self._add_buckets(self._encode(_aggregate(part)).with_columns(pl.lit(day).alias('day')))
+
+    def bootstrap(self, now: int):
+        """Builds the day buckets of the current 30d window with one grouped scan."""
+        self.dictionaries = {column: _Dictionary(column) for column in KEY}
+        self.buckets, self.edges, self.edge_rows = {}, {}, {}
+        self.hot = pl.DataFrame(schema=ROW_SCHEMA)
+        self.settled_until = now - self.settle_lag_seconds
+        since = (self._edge_day(now, self.WINDOWS['30d']) + 1) * DAY_SECONDS
+        logger.info(f"Bootstrapping {', '.join(self.chains)} day buckets from ClickHouse")
+        daily = self._execute(self._buckets_sql('day', DAY_SECONDS), since, self.settled_until)
+        if daily.width:
+            self._add_buckets(self._encode(daily))
+        logger.info(f"Bootstrapped {len(self.buckets)} day buckets up to {self.settled_until}")
+
+    def _fetch_hours(self, day: int) -> pl.DataFrame:
+        hours = self._execute(self._buckets_sql('hour', HOUR_SECONDS), day * DAY_SECONDS, (day + 1) * DAY_SECONDS)
+        return _conform(self._encode(hours), HOUR_SCHEMA) if hours.width else pl.DataFrame(schema=HOUR_SCHEMA)
+
+    def _slide(self, now: int):
+        ring_moved = False
+        for window, days in self.WINDOWS.items():
+            cutoff = now - days * DAY_SECONDS
+            day, hour = cutoff // DAY_SECONDS, cutoff // HOUR_SECONDS
+            if window not in self.edges or self.edges[window][0] != day:
+                hours = self._fetch_hours(day)
+                self.edges[window] = (day, hours)
+                self.edge_rows.pop(window, None)
+                # A full re-read of the day also picks up swaps inserted after it settled
+                self.buckets[day] = _conform(hours.group_by(ID_KEY).agg(pl.col(SUMS).sum()), BUCKET_SCHEMA)
+                ring_moved = ring_moved or window == '30d'
+                logger.info(f"{window} window edge moved to day {day} ({hours.height:,} hourly sums)")
+
+            if window not in self.edge_rows or self.edge_rows[window][0] != hour:
+                self.edge_rows[window] = (hour, self._fetch_rows(hour * HOUR_SECONDS, (hour + 1) * HOUR_SECONDS))
+                # Hours before the cutoff hour have left the window, the cutoff hour itself is summed from rows
+                day, hours = self.edges[window]
+                self.edges[window] = (day, hours.filter(pl.col('hour') > hour))
+
+        oldest_day = self.edges['30d'][0]
+        for day in [d for d in self.buckets if d <= oldest_day]:
+            del self.buckets[day]
+        if ring_moved:
+            self._compact()
+
+    def _compact(self):
+        days = list(self.buckets)
+        windows = list(self.edges)
+        frames = [self.buckets[day] for day in days] + [self.edges[window][1] for window in windows]
+        for dictionary in self.dictionaries.values():
+            frames = dictionary.compact(frames)
+        self.buckets = {day: _conform(frame, BUCKET_SCHEMA) for day, frame in zip(days, frames)}
+        self.edges = {
+            window: (self.edges[window][0], _conform(frame, HOUR_SCHEMA))
+            for window, frame in zip(windows, frames[len(days):])
+        }
+        logger.info(f"Compacted key dictionaries to {self.dictionaries['signing_wallet'].ids.height:,} wallets")
+
+    def _poll(self, now: int):
+        rows = self._fetch_rows(self.settled_until)
+        settled_until = max(self.settled_until, now - self.settle_lag_seconds)
+        self._fold(rows.filter(pl.col('ts') < settled_until))
+        self.hot = rows.filter(pl.col('ts') >= settled_until)
+        self.settled_until = settled_until
+
+    def _window_stats(self, window: str, now: int) -> pl.LazyFrame:
+        cutoff = now - self.WINDOWS[window] * DAY_SECONDS
+        edge_day, hours = self.edges[window]
+        edge_hour, edge_rows = self.edge_rows[window]
+        edge_rows = edge_rows.filter(pl.col('ts') >= cutoff)
+        self.edge_rows[window] = (edge_hour, edge_rows)
+
+        tail = pl.concat([edge_rows, self.hot.filter(pl.col('ts') >= cutoff)])
+        parts = [frame for day, frame in self.buckets.items() if day > edge_day]
+        parts.append(hours.drop('hour'))
+        parts.append(_conform(self._encode(_aggregate(tail)), BUCKET_SCHEMA))
+        return pl.concat(parts).lazy().group_by(ID_KEY).agg(pl.col(SUMS).sum()).rename({
+            'bought': f'total_bought_{window}',
+            'sold': f'total_sold_{window}',
+            'native_spent': f'native_spent_{window}',
+            'native_received': f'native_received_{window}',
+            'buy_count': f'buy_count_{window}',
+            'sell_count': f'sell_count_{window}',
+            'swap_count': f'swap_count_{window}',
+        })
+
+    def metrics(self, now: int) -> pl.DataFrame:
+        recent = self._window_stats('7d', now)
+        token_stats = self._window_stats('30d', now).join(recent, on=ID_KEY, how='left').with_columns(
+            pl.col(f'{name}_7d').fill_null(0)
+            for name in ('total_bought', 'total_sold', 'native_spent', 'native_received', 'buy_count', 'sell_count', 'swap_count')
+        )
+        # The wallet rollup only groups by chain and wallet, token ids stay encoded
+        for column in ('chain', 'signing_wallet'):
+            token_stats = self.dictionaries[column].decode(token_stats)
+        wallets = OfflinePnlEngine.wallet_metrics_from_stats(token_stats)
+        if self.query_builder.chain_column:
+            return self.leaderboard.evm_leaderboard(wallets, self.limit)
+        return self.leaderboard.solana_leaderboard(wallets, self.limit)
+
+    def refresh(self, now: Optional[int] = None) -> pl.DataFrame:
+        now = int(time.time()) if now is None else now
+        if self.settled_until is None and not self.restore(now):
+            self.bootstrap(now)
+        self._slide(now)
+        self._poll(now)
+        return self.metrics(now)
+
+    def checkpoint(self):
+        if self.settled_until is None:
+            return
+        generation = str(int(time.time() * 1000))
+        path = os.path.join(self.checkpoint_path, generation)
+        os.makedirs(path, exist_ok=True)
+
+        buckets = [frame.with_columns(pl.lit(day, dtype=pl.Int64).alias('day')) for day, frame in self.buckets.items()]
+        empty = pl.DataFrame(schema={**BUCKET_SCHEMA, 'day': pl.Int64})
+        (pl.concat(buckets) if buckets else empty).write_ipc(os.path.join(path, 'buckets.arrow'), compression='lz4')
+        for window, (_, hours) in self.edges.items():
+            hours.write_ipc(os.path.join(path, f'edge_{window}_hours.arrow'), compression='lz4')
+        for column, dictionary in self.dictionaries.items():
+            dictionary.ids.write_ipc(os.path.join(path, f'{column}_ids.arrow'), compression='lz4')
+
+        state = {
+            'generation': generation,
+            'chains': self.chains,
+            'settled_until': self.settled_until,
+            'edges': {window: day for window, (day, _) in self.edges.items()},
+        }
+        state_path = os.path.join(self.checkpoint_path, self.STATE_FILE)
+        with open(f"{state_path}.tmp", 'w') as f:
+            json.dump(state, f)
+        os.replace(f"{state_path}.tmp", state_path)
+
+        for name in os.listdir(self.checkpoint_path):
+            if name != generation and name.isdigit():
+                shutil.rmtree(os.path.join(self.checkpoint_path, name), ignore_errors=True)
+        logger.info(f"Checkpointed {len(self.buckets)} day buckets up to {self.settled_until}")
+
+    def restore(self, now: int) -> bool:
+        try:
+            with open(os.path.join(self.checkpoint_path, self.STATE_FILE)) as f:
+                state = json.load(f)
+            if state['chains'] != self.chains:
+                logger.warning(f"Ignoring checkpoint for chains {', '.join(state['chains'])}")
+                return False
+            # Polling across a long outage would re-add swaps to days the 7d edge re-read covers
+            if state['settled_until'] < (self._edge_day(now, self.WINDOWS['7d']) + 1) * DAY_SECONDS:
+                logger.warning(f"Checkpoint in {self.checkpoint_path} is too old, rebuilding")
+                return False
+            path = os.path.join(self.checkpoint_path, state['generation'])
+            dictionaries = {
+                column: _Dictionary(column, pl.read_ipc(os.path.join(path, f'{column}_ids.arrow')))
+                for column in KEY
+            }
+            buckets = pl.read_ipc(os.path.join(path, 'buckets.arrow'))
+            edges = {
+                window: (day, _conform(pl.read_ipc(os.path.join(path, f'edge_{window}_hours.arrow')), HOUR_SCHEMA))
+                for window, day in state['edges'].items()
+            }
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint in {self.checkpoint_path}: {e}")
+            return False
+
+        self.dictionaries = dictionaries
+        self.buckets = {}
+        self._add_buckets(buckets)
+        # The rows of the cutoff hours are re-read by the next slide
+        self.edges, self.edge_rows = edges, {}
+        self.hot = pl.DataFrame(schema=ROW_SCHEMA)
+        self.settled_until = state['settled_until']
+        logger.info(f"Restored {len(self.buckets)} day buckets up to {self.settled_until} from checkpoint")
+        return True
+
+    def run(self, publish: Callable[[pl.DataFrame], Any], interval_seconds: Optional[float] = None,
+            checkpoint_every: Optional[int] = None):
+        """Refreshes and publishes every interval_seconds until interrupted; a failed cycle is logged and retried."""
+        interval_seconds = interval_seconds or Config.INCREMENTAL_INTERVAL_SECONDS
+        checkpoint_every = checkpoint_every or Config.INCREMENTAL_CHECKPOINT_EVERY
+        cycles = 0
+        try:
+            while True:
+                started = time.time()
+                try:
+                    metrics = self.refresh()
+                    publish(metrics)
+                    logger.info(f"Republished {metrics.height:,} wallets in {time.time() - started:.2f}s")
+                except Exception as e:
+                    logger.error(f"Incremental refresh failed: {e}", exc_info=True)
+                cycles += 1
+                if cycles % checkpoint_every == 0:
+                    self.checkpoint()
+                time.sleep(max(interval_seconds - (time.time() - started), 0))
+        finally:
+            self.checkpoint()
@@ -0,0 +1,297 @@
+import argparse
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Union
+import polars as pl
+from ..config import Config, setup_logging
+from .evm_smart_money_analyzer import EvmSmartMoneyAnalyzer
+
+logger = logging.getLogger(__name__)
+
+Source = Union[str, Sequence[str], pl.DataFrame, pl.LazyFrame]
+
+
+def _count(condition: pl.Expr) -> pl.Expr:
+    return pl.when(condition).then(1).otherwise(0).sum().cast(pl.UInt64)
+
+
+class OfflinePnlEngine:
+    """Recomputes the smart-money wallet metrics from Parquet swap exports with polars.
+
+    Mirrors the ClickHouse queries of SolanaSmartMoneyAnalyzer and EvmSmartMoneyAnalyzer
+    column for column, with now() pinned to as_of so backtests and what-if runs are
+    reproducible. Group-bys run on the polars thread pool (POLARS_MAX_THREADS).
+    """
+
+    WINDOW_DAYS = 30
+    RECENT_DAYS = 7
+
+    def __init__(self, as_of: Optional[datetime] = None, native_tokens: Optional[Dict[str, List[str]]] = None):
+        self.as_of = as_of or datetime.utcnow().replace(microsecond=0)
+        self.native_tokens = native_tokens or {
+            chain: config['native_tokens'] for chain, config in EvmSmartMoneyAnalyzer.CHAIN_CONFIG.items()
+        }
+
+    @staticmethod
+    def _scan(source: Source) -> pl.LazyFrame:
+        if isinstance(source, pl.LazyFrame):
+            return source
+        if isinstance(source, pl.DataFrame):
+            return source.lazy()
+        return pl.scan_parquet(source if isinstance(source, str) else list(source))
+
+    def _window_start(self, days: int) -> datetime:
+        return self.as_of - timedelta(days=days)
+
+    def normalized_solana(self, swaps: Source) -> pl.LazyFrame:
+        base_is_sol = pl.col('base_coin') == Config.SOL_ADDRESS
+        quote_is_sol = pl.col('quote_coin') == Config.SOL_ADDRESS
+        direction = pl.col('direction')
+        return (
+            self._scan(swaps)
+            .filter(pl.col('block_time') >= self._window_start(self.WINDOW_DAYS))
+            .filter(base_is_sol | quote_is_sol)
+            .select(
+                pl.lit('solana').alias('chain'),
+                'signing_wallet',
+                'block_time',
+                pl.when(base_is_sol).then(pl.col('quote_coin')).otherwise(pl.col('base_coin')).alias('traded_token'),
+                pl.when(base_is_sol & (direction == 'S')).then(pl.lit('buy'))
+                .when(base_is_sol & (direction == 'B')).then(pl.lit('sell'))
+                .when(quote_is_sol & (direction == 'B')).then(pl.lit('buy'))
+                .when(quote_is_sol & (direction == 'S')).then(pl.lit('sell'))
+                .alias('action'),
+                pl.when(base_is_sol).then(pl.col('base_coin_amount')).otherwise(pl.col('quote_coin_amount'))
+                .cast(pl.Float64).alias('native_amount'),
+                pl.when(base_is_sol).then(pl.col('quote_coin_amount')).otherwise(pl.col('base_coin_amount'))
+                .cast(pl.Float64).alias('traded_amount'),
+            )
+        )
+
+    def _is_native(self, token_column: str, chains: List[str]) -> pl.Expr:
+        matches = [
+            (pl.col('chain') == chain) & pl.col(token_column).is_in(self.native_tokens.get(chain, []))
+            for chain in chains
+        ]
+        return pl.any_horizontal(matches) if matches else pl.lit(False)
+
+    def normalized_evm(self, swaps: Source, chains: List[str]) -> pl.LazyFrame:
+        base_is_native = self._is_native('base_coin', chains)
+        quote_is_native = self._is_native('quote_coin', chains)
+        base_amount = pl.col('base_coin_amount').cast(pl.Float64) / pl.lit(10.0).pow(pl.col('base_coin_decimals').cast(pl.Float64))
+        quote_amount = pl.col('quote_coin_amount').cast(pl.Float64) / pl.lit(10.0).pow(pl.col('quote_coin_decimals').cast(pl.Float64))
+        return (
+            self._scan(swaps)
+            .filter(pl.col('chain').is_in(chains) & (pl.col('block_time') >= self._window_start(self.WINDOW_DAYS)))
+            .filter(base_is_native | quote_is_native)
+            .select(
+                'chain',
+                pl.col('tx_from_address').alias('signing_wallet'),
+                'block_time',
+                pl.when(base_is_native).then(pl.col('quote_coin')).otherwise(pl.col('base_coin')).alias('traded_token'),
+                pl.when(base_is_native).then(pl.lit('buy')).otherwise(pl.lit('sell')).alias('action'),
+                pl.when(base_is_native).then(base_amount).otherwise(quote_amount).alias('native_amount'),
+                pl.when(base_is_native).then(quote_amount).otherwise(base_amount).alias('traded_amount'),
+            )
+        )
+
+    def wallet_token_stats(self, normalized: pl.LazyFrame) -> pl.LazyFrame:
+        recent = pl.col('block_time') >= self._window_start(self.RECENT_DAYS)
+        buy = pl.col('action') == 'buy'
+        sell = pl.col('action') == 'sell'
+
+        def total(condition: pl.Expr, value: str) -> pl.Expr:
+            return pl.when(condition).then(pl.col(value)).otherwise(0.0).sum()
+
+        return (
+            normalized
+            .group_by('chain', 'signing_wallet', 'traded_token')
+            .agg(
+                total(buy, 'traded_amount').alias('total_bought_30d'),
+                total(sell, 'traded_amount').alias('total_sold_30d'),
+                total(buy, 'native_amount').alias('native_spent_30d'),
+                total(sell, 'native_amount').alias('native_received_30d'),
+                _count(buy).alias('buy_count_30d'),
+                _count(sell).alias('sell_count_30d'),
+                total(buy & recent, 'traded_amount').alias('total_bought_7d'),
+                total(sell & recent, 'traded_amount').alias('total_sold_7d'),
+                total(buy & recent, 'native_amount').alias('native_spent_7d'),
+                total(sell & recent, 'native_amount').alias('native_received_7d'),
+                _count(buy & recent).alias('buy_count_7d'),
+                _count(sell & recent).alias('sell_count_7d'),
+                pl.len().cast(pl.UInt64).alias('swap_count_30d'),
+                _count(recent).alias('swap_count_7d'),
+            )
+        )
+
+    def wallet_metrics(self, normalized: pl.LazyFrame) -> pl.LazyFrame:
+        return self.wallet_metrics_from_stats(self.wallet_token_stats(normalized))
+
+    @staticmethod
+    def wallet_metrics_from_stats(token_stats: pl.LazyFrame) -> pl.LazyFrame:
+        """Wallet rollup of per-(chain, wallet, token) 30d/7d stats, as the wallet_metrics CTE computes it."""
+        qualified = token_stats.filter(
+            (pl.col('buy_count_30d') > 0) & (pl.col('sell_count_30d') > 0)
+            & (pl.col('total_bought_30d') > 0) & (pl.col('total_sold_30d') > 0)
+        )
+
+        def avg_sell(window: str) -> pl.Expr:
+            return pl.col(f'native_received_{window}') / pl.col(f'total_sold_{window}')
+
+        def avg_buy(window: str) -> pl.Expr:
+            return pl.col(f'native_spent_{window}') / pl.col(f'total_bought_{window}')
+
+        def pnl(window: str) -> pl.Expr:
+            return (avg_sell(window) - avg_buy(window)) * pl.min_horizontal(f'total_bought_{window}', f'total_sold_{window}')
+
+        traded_7d = (pl.col('total_bought_7d') > 0) & (pl.col('total_sold_7d') > 0)
+        token_pnl = (
+            qualified
+            .filter((pl.col('native_spent_30d') > 0) & (pl.col('native_received_30d') > 0))
+            .with_columns(
+                pnl('30d').alias('pnl_native_30d'),
+                (avg_sell('30d') > avg_buy('30d')).cast(pl.Int64).alias('is_profitable_30d'),
+                pl.when(traded_7d).then(pnl('7d')).otherwise(0.0).alias('pnl_native_7d'),
+                pl.when(traded_7d & (avg_sell('7d') > avg_buy('7d'))).then(1).otherwise(0).alias('is_profitable_7d'),
+            )
+        )
+
+        active_7d = (pl.col('buy_count_7d') > 0) & (pl.col('sell_count_7d') > 0)
+        round_trips_7d = _count(active_7d)
+        wallets = (
+            token_pnl
+            .group_by('chain', 'signing_wallet')
+            .agg(
+                pl.col('pnl_native_7d').sum().alias('total_pnl_native_7d'),
+                pl.when(round_trips_7d > 0)
+                .then(100.0 * pl.col('is_profitable_7d').sum() / round_trips_7d)
+                .alias('winrate_7d'),
+                pl.col('buy_count_7d').sum().alias('total_buys_7d'),
+                pl.col('sell_count_7d').sum().alias('total_sells_7d'),
+                _count((pl.col('buy_count_7d') > 0) | (pl.col('sell_count_7d') > 0)).alias('unique_tokens_7d'),
+                pl.col('pnl_native_30d').sum().alias('total_pnl_native_30d'),
+                (100.0 * pl.col('is_profitable_30d').sum() / pl.len()).alias('winrate_30d'),
+                pl.col('buy_count_30d').sum().alias('total_buys_30d'),
+                pl.col('sell_count_30d').sum().alias('total_sells_30d'),
+                pl.len().cast(pl.UInt64).alias('unique_tokens_30d'),
+            )
+        )
+
+        transaction_counts = (
+            token_stats
+            .group_by('chain', 'signing_wallet')
+            .agg(
+                pl.col('swap_count_30d').sum().alias('tx_count_30d'),
+                pl.col('swap_count_7d').sum().alias('tx_count_7d'),
+            )
+        )
+        return wallets.join(transaction_counts, on=['chain', 'signing_wallet'], how='left')
+
+    @staticmethod
+    def _output_columns(native: str, scale: float, price: Optional[pl.Expr] = None) -> List[pl.Expr]:
+        columns = [pl.col('signing_wallet').cast(pl.Utf8).str.strip_chars('\x00').alias('wallet_address')]
+        for window in ('7d', '30d'):
+            pnl = pl.col(f'total_pnl_native_{window}').fill_null(0.0)
+            columns += [
+                pl.col(f'tx_count_{window}').fill_null(0).alias(f'transactions_{window}'),
+                pl.col(f'total_buys_{window}').fill_null(0).alias(f'buys_{window}'),
+                pl.col(f'total_sells_{window}').fill_null(0).alias(f'sells_{window}'),
+                pl.col(f'unique_tokens_{window}').fill_null(0),
+                (pnl / scale).round(6).alias(f'realized_pnl_{native}_{window}'),
+            ]
+            if price is not None:
+                columns.append((pnl * price).round(2).alias(f'realized_pnl_usd_{window}'))
+            columns.append(pl.col(f'winrate_{window}').fill_null(0.0).round(2).alias(f'winrate_percent_{window}'))
+        return columns
+
+    def solana_leaderboard(self, wallets: pl.LazyFrame, limit: int = 10000) -> pl.DataFrame:
+        return (
+            wallets
+            .sort(['total_pnl_native_30d', 'signing_wallet'], descending=[True, False])
+            .head(limit)
+            .select(self._output_columns('sol', scale=10 ** Config.SOL_DECIMALS))
+            .collect()
+        )
+
+    def evm_leaderboard(self, wallets: pl.LazyFrame, limit: int = 10000,
+                        prices: Optional[Dict[str, float]] = None) -> pl.DataFrame:
+        price = None
+        if prices is not None:
+            price = pl.lit(0.0)
+            for chain, native_price in prices.items():
+                price = pl.when(pl.col('chain') == chain).then(pl.lit(float(native_price))).otherwise(price)
+        return (
+            wallets
+            .sort(['chain', 'total_pnl_native_30d', 'signing_wallet'], descending=[False, True, False])
+            .filter(pl.int_range(pl.len()).over('chain') < limit)
+            .select(pl.col('chain'), *self._output_columns('native', scale=1.0, price=price))
+            .collect()
+        )
+
+    def solana_metrics(self, swaps: Source, limit: int = 10000) -> pl.DataFrame:
+        return self.solana_leaderboard(self.wallet_metrics(self.normalized_solana(swaps)), limit)
+
+    def evm_metrics(self, swaps: Source, prices: Dict[str, float], limit: int = 10000) -> pl.DataFrame:
+        return self.evm_leaderboard(self.wallet_metrics(self.normalized_evm(swaps, list(prices))), limit, prices)
+
+    @staticmethod
+    def compare(expected: pl.DataFrame, actual: pl.DataFrame, rel_tol: float = 1e-9) -> pl.DataFrame:
+        """Rows whose values differ between two metric frames, matched on (chain,) wallet_address."""
+        keys = [c for c in ('chain', 'wallet_address') if c in expected.columns]
+        values = [c for c in expected.columns if c not in keys]
+        joined = expected.join(actual, on=keys, how='full', suffix='_actual', coalesce=True)
+        mismatches = []
+        for column in values:
+            left, right = pl.col(column), pl.col(f'{column}_actual')
+            if expected.schema[column].is_float():
+                differs = (left - right).abs() > pl.max_horizontal(left.abs(), right.abs()) * rel_tol + 1e-9
+            else:
+                differs = left != right
+            mismatches.append(differs.fill_null(True))
+        return joined.filter(pl.any_horizontal(mismatches)) if mismatches else joined.clear()
+
+
+def _parse_prices(values: List[str]) -> Dict[str, float]:
+    prices = {}
+    for value in values:
+        chain, _, price = value.partition('=')
+        prices[chain] = float(price) if price else 0.0
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute smart-money wallet metrics from Parquet swap exports')
+    parser.add_argument('job_type', choices=['solana', 'evm'])
+    parser.add_argument('swaps', nargs='+', help='Parquet files (globs allowed) in the solana.swaps / evm.swap_events shape')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--as-of', type=datetime.fromisoformat, default=None, help='UTC timestamp used as now()')
+    parser.add_argument('--price', nargs='+', default=[], metavar='CHAIN=USD', help='EVM native prices, e.g. eth=3000')
+    parser.add_argument('--compare', default=None, help='Parquet export of the SQL result to diff against')
+    args = parser.parse_args()
+
+    setup_logging()
+    engine = OfflinePnlEngine(as_of=args.as_of)
+    if args.job_type == 'solana':
+        metrics = engine.solana_metrics(args.swaps, limit=args.limit)
+    else:
+        prices = _parse_prices(args.price)
+        if not prices:
+            parser.error('--price is required for EVM jobs')
+        metrics = engine.evm_metrics(args.swaps, prices, limit=args.limit)
+
+    metrics.write_parquet(args.output, compression='zstd')
+    logger.info(f"Wrote {metrics.height:,} wallet metrics as of {engine.as_of:%Y-%m-%d %H:%M:%S} to {args.output}")
+
+    if args.compare:
+        mismatches = OfflinePnlEngine.compare(pl.read_parquet(args.compare), metrics)
+        if mismatches.height:
+            logger.error(f"{mismatches.height:,} rows differ from {args.compare}")
+            return 1
+        logger.info(f"Identical to {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
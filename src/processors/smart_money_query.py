@@ -0,0 +1,306 @@
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional
+from ..database.sharding import Shard, shard_filter, shard_parameters
+
+WINDOW = 'block_time >= now() - INTERVAL 30 DAY'
+RECENT = 'block_time >= now() - INTERVAL 7 DAY'
+
+# Columns of the token_pnl CTE with the ClickHouse types it is materialized as
+TOKEN_PNL_COLUMNS = (
+    ('chain', 'LowCardinality(String)'),
+    ('signing_wallet', 'String'),
+    ('traded_token', 'String'),
+    ('buy_count_30d', 'UInt64'),
+    ('sell_count_30d', 'UInt64'),
+    ('buy_count_7d', 'UInt64'),
+    ('sell_count_7d', 'UInt64'),
+    ('swap_count_30d', 'UInt64'),
+    ('swap_count_7d', 'UInt64'),
+    ('qualifies', 'UInt8'),
+    ('pnl_native_30d', 'Float64'),
+    ('is_profitable_30d', 'UInt8'),
+    ('pnl_native_7d', 'Float64'),
+    ('is_profitable_7d', 'UInt8'),
+)
+
+
+class SmartMoneyQueryBuilder:
+    """Builds the smart-money wallet query for one swap table in a single aggregation pass.
+
+    Per-(wallet, token) stats carry their own swap counts, so transaction counts are
+    summed in the same wallet GROUP BY instead of re-reading normalized_swaps. Values
+    that change between runs (native tokens, shard, rollup boundary) are bound as
+    server-side parameters, keeping the query text stable for a given job. PnL stays
+    native; USD values are priced at publish time.
+    """
+
+    # Solana: the swap's B/S direction flag is relative to the base coin
+    DIRECTION_FLAG = 'flag'
+    # EVM: native coin on the base side means the wallet bought the other token
+    DIRECTION_NATIVE_SIDE = 'native_side'
+
+    def __init__(self, table: str, wallet_column: str, native_tokens: Dict[str, List[str]], direction: str,
+                 decimal_columns: bool, native_name: str = 'native', native_divisor: float = 1.0,
+                 chain_column: Optional[str] = None):
+        self.table = table
+        self.wallet_column = wallet_column
+        self.native_tokens = native_tokens
+        self.direction = direction
+        self.decimal_columns = decimal_columns
+        self.native_name = native_name
+        self.native_divisor = native_divisor
+        self.chain_column = chain_column
+
+    def _is_native(self, coin_column: str) -> str:
+        if self.chain_column:
+            return f"has({{native_pairs:Array(Tuple(String, String))}}, ({self.chain_column}, {coin_column}))"
+        return f"has({{native_tokens:Array(String)}}, {coin_column})"
+
+    def _amount(self, side: str) -> str:
+        if self.decimal_columns:
+            return f"{side}_coin_amount / pow(10, {side}_coin_decimals)"
+        return f"{side}_coin_amount"
+
+    def _action(self, base_native: str, quote_native: str) -> str:
+        if self.direction == self.DIRECTION_FLAG:
+            return f"""CASE
+                    WHEN {base_native} AND direction = 'S' THEN 'buy'
+                    WHEN {base_native} AND direction = 'B' THEN 'sell'
+                    WHEN {quote_native} AND direction = 'B' THEN 'buy'
+                    WHEN {quote_native} AND direction = 'S' THEN 'sell'
+                END"""
+        return f"IF({base_native}, 'buy', 'sell')"
+
+    def parameters(self, chains: List[str], shard: Optional[Shard] = None,
+                   covered_until: Optional[date] = None) -> Dict[str, Any]:
+        parameters: Dict[str, Any] = {'chains': list(chains)}
+        if self.chain_column:
+            parameters['native_pairs'] = [
+                (chain, token) for chain in chains for token in self.native_tokens.get(chain, [])
+            ]
+        else:
+            parameters['native_tokens'] = [token for chain in chains for token in self.native_tokens.get(chain, [])]
+        if covered_until is not None:
+            parameters['covered_until'] = covered_until
+        parameters.update(shard_parameters(shard))
+        return parameters
+
+    @staticmethod
+    def cache_identity(query: str, parameters: Dict[str, Any]) -> str:
+        """Result cache identity: the query text and its bound parameters."""
+        return f"{query}\n-- {json.dumps(parameters, sort_keys=True, default=str)}"
+
+    def normalized_swaps_sql(self, time_filter: str, shard: Optional[Shard] = None) -> str:
+        base_native = self._is_native('base_coin')
+        quote_native = self._is_native('quote_coin')
+        chain = self.chain_column or f"'{next(iter(self.native_tokens))}'"
+        chain_prewhere = f"has({{chains:Array(String)}}, {self.chain_column}) AND " if self.chain_column else ''
+        return f"""
+            SELECT
+                {chain} AS chain,
+                {self.wallet_column} AS signing_wallet,
+                block_time,
+                IF({base_native}, quote_coin, base_coin) AS traded_token,
+                {self._action(base_native, quote_native)} AS action,
+                IF({base_native}, {self._amount('base')}, {self._amount('quote')}) AS native_amount,
+                IF({base_native}, {self._amount('quote')}, {self._amount('base')}) AS traded_amount
+            FROM {self.table}
+            PREWHERE {chain_prewhere}{time_filter}
+            WHERE ({base_native} OR {quote_native})
+              AND {shard_filter(self.wallet_column, shard)}
+        """
+
+    def _raw_token_stats_ctes(self, shard: Optional[Shard]) -> str:
+        return f"""
+        normalized_swaps AS ({self.normalized_swaps_sql(WINDOW, shard)}),
+        wallet_token_stats AS (
+            SELECT
+                chain,
+                signing_wallet,
+                traded_token,
+                SUM(IF(action = 'buy', traded_amount, 0)) AS total_bought_30d,
+                SUM(IF(action = 'sell', traded_amount, 0)) AS total_sold_30d,
+                SUM(IF(action = 'buy', native_amount, 0)) AS native_spent_30d,
+                SUM(IF(action = 'sell', native_amount, 0)) AS native_received_30d,
+                SUM(IF(action = 'buy', 1, 0)) AS buy_count_30d,
+                SUM(IF(action = 'sell', 1, 0)) AS sell_count_30d,
+                SUM(IF(action = 'buy' AND {RECENT}, traded_amount, 0)) AS total_bought_7d,
+                SUM(IF(action = 'sell' AND {RECENT}, traded_amount, 0)) AS total_sold_7d,
+                SUM(IF(action = 'buy' AND {RECENT}, native_amount, 0)) AS native_spent_7d,
+                SUM(IF(action = 'sell' AND {RECENT}, native_amount, 0)) AS native_received_7d,
+                SUM(IF(action = 'buy' AND {RECENT}, 1, 0)) AS buy_count_7d,
+                SUM(IF(action = 'sell' AND {RECENT}, 1, 0)) AS sell_count_7d,
+                COUNT(*) AS swap_count_30d,
+                SUM(IF({RECENT}, 1, 0)) AS swap_count_7d
+            FROM normalized_swaps
+            GROUP BY chain, signing_wallet, traded_token
+        )"""
+
+    @staticmethod
+    def _rollup_token_stats_ctes(daily_swaps_sql: str) -> str:
+        return f"""
+        daily_swaps AS ({daily_swaps_sql}),
+        wallet_token_stats AS (
+            SELECT
+                chain,
+                signing_wallet,
+                traded_token,
+                SUM(bought) AS total_bought_30d,
+                SUM(sold) AS total_sold_30d,
+                SUM(native_spent) AS native_spent_30d,
+                SUM(native_received) AS native_received_30d,
+                SUM(buy_count) AS buy_count_30d,
+                SUM(sell_count) AS sell_count_30d,
+                SUM(IF(recent, bought, 0)) AS total_bought_7d,
+                SUM(IF(recent, sold, 0)) AS total_sold_7d,
+                SUM(IF(recent, native_spent, 0)) AS native_spent_7d,
+                SUM(IF(recent, native_received, 0)) AS native_received_7d,
+                SUM(IF(recent, buy_count, 0)) AS buy_count_7d,
+                SUM(IF(recent, sell_count, 0)) AS sell_count_7d,
+                SUM(swap_count) AS swap_count_30d,
+                SUM(IF(recent, swap_count, 0)) AS swap_count_7d
+            FROM daily_swaps
+            GROUP BY chain, signing_wallet, traded_token
+        )"""
+
+    def token_pnl_ctes(self, shard: Optional[Shard] = None, daily_swaps_sql: Optional[str] = None) -> str:
+        """CTEs up to token_pnl: per-(wallet, token) PnL with a qualifies flag for round-tripped tokens."""
+        token_stats = self._rollup_token_stats_ctes(daily_swaps_sql) if daily_swaps_sql else self._raw_token_stats_ctes(shard)
+        return f"""{token_stats},
+        token_pnl AS (
+            SELECT
+                chain,
+                signing_wallet,
+                traded_token,
+                buy_count_30d,
+                sell_count_30d,
+                buy_count_7d,
+                sell_count_7d,
+                swap_count_30d,
+                swap_count_7d,
+                buy_count_30d > 0 AND sell_count_30d > 0 AND total_bought_30d > 0 AND total_sold_30d > 0
+                    AND native_spent_30d > 0 AND native_received_30d > 0 AS qualifies,
+                IF(qualifies,
+                   (native_received_30d / total_sold_30d - native_spent_30d / total_bought_30d)
+                       * least(total_bought_30d, total_sold_30d), 0) AS pnl_native_30d,
+                IF(qualifies AND native_received_30d / total_sold_30d > native_spent_30d / total_bought_30d, 1, 0) AS is_profitable_30d,
+                IF(qualifies AND total_bought_7d > 0 AND total_sold_7d > 0,
+                   (native_received_7d / total_sold_7d - native_spent_7d / total_bought_7d)
+                       * least(total_bought_7d, total_sold_7d), 0) AS pnl_native_7d,
+                IF(qualifies AND total_bought_7d > 0 AND total_sold_7d > 0
+                   AND native_received_7d / total_sold_7d > native_spent_7d / total_bought_7d, 1, 0) AS is_profitable_7d
+            FROM wallet_token_stats
+        )"""
+
+    def token_pnl_insert_sql(self, table: str, shard: Optional[Shard] = None, daily_swaps_sql: Optional[str] = None) -> str:
+        """Materializes token_pnl into `table` (TokenPnlScan's scratch table) for build() and token_outputs_sql()."""
+        columns = ', '.join(column for column, _ in TOKEN_PNL_COLUMNS)
+        return f"""
+        INSERT INTO {table} ({columns})
+        WITH
+        {self.token_pnl_ctes(shard, daily_swaps_sql)}
+        SELECT {columns} FROM token_pnl
+        """
+
+    def _token_pnl_source(self, shard: Optional[Shard], daily_swaps_sql: Optional[str], token_pnl_table: Optional[str]) -> str:
+        if token_pnl_table:
+            return f"token_pnl AS (SELECT * FROM {token_pnl_table} WHERE {shard_filter('signing_wallet', shard)})"
+        return self.token_pnl_ctes(shard, daily_swaps_sql)
+
+    @staticmethod
+    def _wallet_metrics_cte() -> str:
+        return """
+        wallet_metrics AS (
+            SELECT
+                chain,
+                signing_wallet,
+                sumIf(pnl_native_7d, qualifies) AS total_pnl_native_7d,
+                100.0 * sumIf(is_profitable_7d, qualifies)
+                    / NULLIF(countIf(qualifies AND buy_count_7d > 0 AND sell_count_7d > 0), 0) AS winrate_7d,
+                sumIf(buy_count_7d, qualifies) AS total_buys_7d,
+                sumIf(sell_count_7d, qualifies) AS total_sells_7d,
+                countIf(qualifies AND (buy_count_7d > 0 OR sell_count_7d > 0)) AS unique_tokens_7d,
+                sumIf(pnl_native_30d, qualifies) AS total_pnl_native_30d,
+                100.0 * sumIf(is_profitable_30d, qualifies) / countIf(qualifies) AS winrate_30d,
+                sumIf(buy_count_30d, qualifies) AS total_buys_30d,
+                sumIf(sell_count_30d, qualifies) AS total_sells_30d,
+                countIf(qualifies) AS unique_tokens_30d,
+                SUM(swap_count_7d) AS tx_count_7d,
+                SUM(swap_count_30d) AS tx_count_30d
+            FROM token_pnl
+            GROUP BY chain, signing_wallet
+            HAVING unique_tokens_30d > 0
+        )"""
+
+    def _scaled(self, column: str) -> str:
+        return f"{column} / {self.native_divisor}" if self.native_divisor != 1 else column
+
+    def build(self, limit: int, shard: Optional[Shard] = None, daily_swaps_sql: Optional[str] = None,
+              token_pnl_table: Optional[str] = None) -> str:
+        """Wallet metrics ordered by 30d PnL, top `limit` per chain.
+
+        Reads raw swaps, daily_swaps_sql (a SwapRollup source) when given, or a token_pnl
+        table materialized by TokenPnlScan.
+        """
+        native = self.native_name
+        chain_select = "chain AS chain," if self.chain_column else ''
+
+        def pnl_columns(window: str) -> str:
+            return f"ROUND({self._scaled(f'total_pnl_native_{window}')}, 6) AS realized_pnl_{native}_{window},"
+
+        return f"""
+        WITH
+        {self._token_pnl_source(shard, daily_swaps_sql, token_pnl_table)},{self._wallet_metrics_cte()}
+        SELECT
+            {chain_select}
+            trimBoth(toString(signing_wallet), '\\0') AS wallet_address,
+            tx_count_7d AS transactions_7d,
+            total_buys_7d AS buys_7d,
+            total_sells_7d AS sells_7d,
+            unique_tokens_7d,
+            {pnl_columns('7d')}
+            ROUND(COALESCE(winrate_7d, 0), 2) AS winrate_percent_7d,
+            tx_count_30d AS transactions_30d,
+            total_buys_30d AS buys_30d,
+            total_sells_30d AS sells_30d,
+            unique_tokens_30d,
+            {pnl_columns('30d')}
+            ROUND(COALESCE(winrate_30d, 0), 2) AS winrate_percent_30d
+        FROM wallet_metrics
+        ORDER BY chain, total_pnl_native_30d DESC
+        LIMIT {limit} BY chain
+        """
+
+    def token_outputs_sql(self, token_pnl_table: str, limit: int, shard: Optional[Shard] = None) -> str:
+        """Qualified per-token rows of the top `limit` wallets per chain, read from a materialized token_pnl.
+
+        wallet_pnl_native_30d is the wallet's build() ranking key, so the wallets of
+        several shards can be ranked together and smaller refresh limits cut from one result.
+        """
+        return f"""
+        WITH
+        {self._token_pnl_source(shard, None, token_pnl_table)},{self._wallet_metrics_cte()},
+        leaders AS (
+            SELECT
+                chain,
+                signing_wallet,
+                total_pnl_native_30d
+            FROM wallet_metrics
+            ORDER BY chain, total_pnl_native_30d DESC
+            LIMIT {limit} BY chain
+        )
+        SELECT
+            t.chain AS chain,
+            trimBoth(toString(t.signing_wallet), '\\0') AS wallet_address,
+            l.total_pnl_native_30d AS wallet_pnl_native_30d,
+            trimBoth(toString(t.traded_token), '\\0') AS traded_token,
+            t.swap_count_30d AS transactions_30d,
+            t.buy_count_30d AS buys_30d,
+            t.sell_count_30d AS sells_30d,
+            ROUND({self._scaled('t.pnl_native_7d')}, 6) AS realized_pnl_native_7d,
+            ROUND({self._scaled('t.pnl_native_30d')}, 6) AS realized_pnl_native_30d
+        FROM token_pnl AS t
+        INNER JOIN leaders AS l ON t.chain = l.chain AND t.signing_wallet = l.signing_wallet
+        WHERE t.qualifies
+        """
@@ -1,134 +1,69 @@
 import logging
-from typing import Dict, Any
-from ..database import get_db_client, RedisClient, get_postgres_client
-from ..database.redis_client import RedisPriceNotFoundError
+from datetime import date
+from typing import Callable, Dict, Any, Optional, Tuple
+import polars as pl
+from ..config import Config
+from ..database import get_db_client, get_result_cache, merge_top_k, RedisClient, PostgresClient, get_postgres_client
+from ..database.prices import PriceNotAvailableError
+from ..database.sharding import Shard
+from ..metrics import record
+from .smart_money_query import SmartMoneyQueryBuilder
+from .swap_rollup import SwapRollup
+from .token_pnl_scan import TokenPnlScan
 
 logger = logging.getLogger(__name__)
 
 
 class SolanaSmartMoneyAnalyzer:
 
-    def __init__(self):
+    def __init__(self, postgres: Optional[PostgresClient] = None):
         self.db = get_db_client()
+        self.result_cache = get_result_cache()
         self.redis = RedisClient()
-        self.postgres = get_postgres_client()
-
-    def _build_smart_money_query(self, limit: int = 10000) -> str:
-        query = """
-        WITH
-        normalized_swaps AS (
-            SELECT
-                signing_wallet,
-                block_time,
-                CASE
-                    WHEN base_coin = 'So11111111111111111111111111111111111111112' THEN quote_coin
-                    ELSE base_coin
-                END AS traded_token,
-                CASE
-                    WHEN base_coin = 'So11111111111111111111111111111111111111112' AND direction = 'S' THEN 'buy'
-                    WHEN base_coin = 'So11111111111111111111111111111111111111112' AND direction = 'B' THEN 'sell'
-                    WHEN quote_coin = 'So11111111111111111111111111111111111111112' AND direction = 'B' THEN 'buy'
-                    WHEN quote_coin = 'So11111111111111111111111111111111111111112' AND direction = 'S' THEN 'sell'
-                END AS action,
-                CASE
-                    WHEN base_coin = 'So11111111111111111111111111111111111111112' THEN base_coin_amount
-                    ELSE quote_coin_amount
-                END AS sol_amount,
-                CASE
-                    WHEN base_coin = 'So11111111111111111111111111111111111111112' THEN quote_coin_amount
-                    ELSE base_coin_amount
-                END AS traded_amount
-            FROM solana.swaps
-            PREWHERE block_time >= now() - INTERVAL 30 DAY
-            WHERE (base_coin = 'So11111111111111111111111111111111111111112'
-                   OR quote_coin = 'So11111111111111111111111111111111111111112')
-        ),
-        wallet_token_stats AS (
-            SELECT
-                signing_wallet,
-                traded_token,
-                SUM(IF(action = 'buy', traded_amount, 0)) AS total_bought_30d,
-                SUM(IF(action = 'sell', traded_amount, 0)) AS total_sold_30d,
-                SUM(IF(action = 'buy', sol_amount, 0)) AS sol_spent_30d,
-                SUM(IF(action = 'sell', sol_amount, 0)) AS sol_received_30d,
-                SUM(IF(action = 'buy', 1, 0)) AS buy_count_30d,
-                SUM(IF(action = 'sell', 1, 0)) AS sell_count_30d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, traded_amount, 0)) AS total_bought_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, traded_amount, 0)) AS total_sold_7d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, sol_amount, 0)) AS sol_spent_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, sol_amount, 0)) AS sol_received_7d,
-                SUM(IF(action = 'buy' AND block_time >= now() - INTERVAL 7 DAY, 1, 0)) AS buy_count_7d,
-                SUM(IF(action = 'sell' AND block_time >= now() - INTERVAL 7 DAY, 1, 0)) AS sell_count_7d
-            FROM normalized_swaps
-            GROUP BY signing_wallet, traded_token
-            HAVING buy_count_30d > 0 AND sell_count_30d > 0
-                   AND total_bought_30d > 0 AND total_sold_30d > 0
-        ),
-        token_pnl AS (
-            SELECT
-                signing_wallet,
-                traded_token,
-                buy_count_30d,
-                sell_count_30d,
-                buy_count_7d,
-                sell_count_7d,
-                (sol_received_30d / total_sold_30d - sol_spent_30d / total_bought_30d)
-                    * least(total_bought_30d, total_sold_30d) AS pnl_sol_30d,
-                IF(sol_received_30d / total_sold_30d > sol_spent_30d / total_bought_30d, 1, 0) AS is_profitable_30d,
-                IF(total_bought_7d > 0 AND total_sold_7d > 0,
-                   (sol_received_7d / total_sold_7d - sol_spent_7d / total_bought_7d)
-                       * least(total_bought_7d, total_sold_7d), 0) AS pnl_sol_7d,
-                IF(total_bought_7d > 0 AND total_sold_7d > 0
-                   AND sol_received_7d / total_sold_7d > sol_spent_7d / total_bought_7d, 1, 0) AS is_profitable_7d
-            FROM wallet_token_stats
-            WHERE sol_spent_30d > 0 AND sol_received_30d > 0
-        ),
-        wallet_metrics AS (
-            SELECT
-                signing_wallet,
-                SUM(pnl_sol_7d) AS total_pnl_sol_7d,
-                100.0 * SUM(is_profitable_7d) / NULLIF(SUM(IF(buy_count_7d > 0 AND sell_count_7d > 0, 1, 0)), 0) AS winrate_7d,
-                SUM(buy_count_7d) AS total_buys_7d,
-                SUM(sell_count_7d) AS total_sells_7d,
-                COUNT(DISTINCT IF((buy_count_7d > 0 OR sell_count_7d > 0), traded_token, NULL)) AS unique_tokens_7d,
-                SUM(pnl_sol_30d) AS total_pnl_sol_30d,
-                100.0 * SUM(is_profitable_30d) / COUNT(*) AS winrate_30d,
-                SUM(buy_count_30d) AS total_buys_30d,
-                SUM(sell_count_30d) AS total_sells_30d,
-                COUNT(DISTINCT traded_token) AS unique_tokens_30d
-            FROM token_pnl
-            GROUP BY signing_wallet
-        ),
-        transaction_counts AS (
-            SELECT
-                signing_wallet,
-                COUNT(*) as tx_count_30d,
-                SUM(IF(block_time >= now() - INTERVAL 7 DAY, 1, 0)) as tx_count_7d
-            FROM normalized_swaps
-            GROUP BY signing_wallet
+        self.postgres = postgres or get_postgres_client()
+        if self.redis.leaderboard is not None:
+            self.postgres.add_sink('redis_leaderboard', self.redis.leaderboard)
+        self.query_builder = SmartMoneyQueryBuilder(
+            'solana.swaps', 'signing_wallet', {'solana': [Config.SOL_ADDRESS]},
+            direction=SmartMoneyQueryBuilder.DIRECTION_FLAG, decimal_columns=False,
+            native_name='sol', native_divisor=10 ** Config.SOL_DECIMALS,
         )
-        SELECT
-            trimBoth(toString(w.signing_wallet), '\0') AS wallet_address,
-            COALESCE(tc.tx_count_7d, 0) AS transactions_7d,
-            COALESCE(w.total_buys_7d, 0) AS buys_7d,
-            COALESCE(w.total_sells_7d, 0) AS sells_7d,
-            COALESCE(w.unique_tokens_7d, 0) AS unique_tokens_7d,
-            ROUND(COALESCE(w.total_pnl_sol_7d, 0) / 1e9, 6) AS realized_pnl_sol_7d,
-            ROUND(COALESCE(w.winrate_7d, 0), 2) AS winrate_percent_7d,
-            COALESCE(tc.tx_count_30d, 0) AS transactions_30d,
-            COALESCE(w.total_buys_30d, 0) AS buys_30d,
-            COALESCE(w.total_sells_30d, 0) AS sells_30d,
-            COALESCE(w.unique_tokens_30d, 0) AS unique_tokens_30d,
-            ROUND(COALESCE(w.total_pnl_sol_30d, 0) / 1e9, 6) AS realized_pnl_sol_30d,
-            ROUND(COALESCE(w.winrate_30d, 0), 2) AS winrate_percent_30d
-        FROM wallet_metrics w
-        LEFT JOIN transaction_counts tc ON w.signing_wallet = tc.signing_wallet
-        ORDER BY total_pnl_sol_30d DESC
-        LIMIT {limit}
-        """
-        return query.format(limit=limit)
-
-    def analyze_smart_money(self, limit: int = 10000, refresh_type: str = 'hourly') -> Dict[str, Any]:
+        self.rollup = SwapRollup(self.db, 'solana', self.query_builder)
+
+    def _build_smart_money_query(self, limit: int = 10000, rollup_until: Optional[date] = None,
+                                 shard: Optional[Shard] = None) -> Tuple[str, Dict[str, Any]]:
+        daily_swaps_sql = self.rollup.daily_swaps_sql(shard) if rollup_until else None
+        query = self.query_builder.build(limit, shard=shard, daily_swaps_sql=daily_swaps_sql)
+        return query, self.query_builder.parameters(['solana'], shard=shard, covered_until=rollup_until)
+
+    def _execute_sharded(self, limit: int, rollup_until: Optional[date], shards: int) -> pl.DataFrame:
+        frames = self.db.execute_query_frames_sharded(
+            lambda shard: self._build_smart_money_query(limit=limit, rollup_until=rollup_until, shard=shard), shards
+        )
+        return merge_top_k(frames, 'realized_pnl_sol_30d', limit)
+
+    def publish_metrics(self, metrics: pl.DataFrame, sol_price: float, refresh_limits: Dict[str, int]) -> Dict[str, int]:
+        try:
+            stored_by_refresh = {}
+            for publish_type, publish_limit in refresh_limits.items():
+                stored_by_refresh[publish_type] = self.postgres.refresh_smart_money(
+                    metrics[:publish_limit], sol_price, refresh_type=publish_type
+                )
+            return stored_by_refresh
+        except Exception as e:
+            logger.error(f"Failed to refresh data: {e}")
+            raise
+
+    def compact_rollup(self, recompact_days: int = 1) -> Dict[str, Any]:
+        days_compacted = self.rollup.compact(recompact_days=recompact_days)
+        return {'days_compacted': days_compacted, 'covered_until': str(self.rollup.covered_until())}
+
+    def analyze_smart_money(self, limit: int = 10000, refresh_type: str = 'hourly', use_rollup: bool = False,
+                            refresh_limits: Optional[Dict[str, int]] = None, streaming: bool = False,
+                            shards: int = 1, token_outputs: bool = False) -> Dict[str, Any]:
+        refresh_limits = refresh_limits or {refresh_type: limit}
+        limit = max(refresh_limits.values())
+
         logger.info("=" * 60)
         logger.info("SOLANA SMART MONEY ANALYSIS")
         logger.info("=" * 60)
@@ -136,40 +71,83 @@ class SolanaSmartMoneyAnalyzer:
         try:
             sol_price = self.redis.get_sol_price()
             logger.info(f"SOL price: ${sol_price:.2f}")
-        except RedisPriceNotFoundError as e:
+        except PriceNotAvailableError as e:
             logger.error(f"Cannot proceed without SOL price: {e}")
             raise
 
+        rollup_until = None
+        if use_rollup:
+            rollup_until = self.rollup.covered_until()
+            logger.info(f"Reading swap rollup before {rollup_until}, raw swaps after")
+
         logger.info(f"Fetching top {limit:,} wallets by PnL...")
-        query = self._build_smart_money_query(limit=limit)
+        query, parameters = self._build_smart_money_query(limit=limit, rollup_until=rollup_until)
+        identity = self.query_builder.cache_identity(query, parameters)
+        watermark = self.db.source_watermark('solana.swaps') if self.result_cache else None
+        # Shards partition wallets, so the merged top-K equals (and is cached as) the unsharded result
+        execute = (lambda: self._execute_sharded(limit, rollup_until, shards)) if shards > 1 else None
 
+        scan = None
+        if token_outputs:
+            scan = TokenPnlScan(self.db, self.query_builder, 'solana', ['solana'], shards=shards,
+                                rollup=self.rollup, rollup_until=rollup_until)
+            # Same wallets as the raw query, so the result is cached under the raw query's identity
+            # and a cache hit skips the scan
+            execute = lambda: scan.wallet_metrics(limit)
         try:
-            metrics = self.db.execute_query_dict(query)
-            logger.info(f"Retrieved {len(metrics):,} wallet metrics")
-        except Exception as e:
-            logger.error(f"Failed to fetch metrics: {e}")
-            raise
+            results = self._analyze(query, parameters, identity, watermark, execute, sol_price, refresh_limits, streaming)
+            if scan is not None and scan.materialized and results['wallets_processed']:
+                results['token_outputs'] = scan.publish(self.postgres, {'solana': sol_price}, refresh_limits)['solana']
+            elif scan is not None:
+                logger.info("Wallet metrics served from the result cache, keeping the previous token outputs")
+            return results
+        finally:
+            if scan is not None:
+                scan.drop()
 
-        if not metrics:
-            logger.warning("No metrics found")
-            return {'wallets_processed': 0, 'sol_price_usd': sol_price, 'wallets_stored': 0}
+    def _analyze(self, query: str, parameters: Dict[str, Any], identity: str, watermark: Optional[Dict[str, Any]],
+                 execute: Optional[Callable[[], pl.DataFrame]], sol_price: float, refresh_limits: Dict[str, int], streaming: bool) -> Dict[str, Any]:
+        if streaming:
+            try:
+                if execute:
+                    blocks = iter([self.db.execute_query_frame_cached(query, self.result_cache, identity, watermark, execute)])
+                else:
+                    blocks = self.db.stream_query_frames_cached(query, self.result_cache, identity, watermark, parameters)
+                stored_by_refresh = self.postgres.stream_refresh_smart_money(blocks, sol_price, refresh_limits)
+            except Exception as e:
+                logger.error(f"Failed to stream metrics: {e}")
+                raise
+            wallets_processed = max(stored_by_refresh.values())
+        else:
+            try:
+                metrics = self.db.execute_query_frame_cached(
+                    query, self.result_cache, identity, watermark, execute, parameters
+                )
+                logger.info(f"Retrieved {len(metrics):,} wallet metrics")
+            except Exception as e:
+                logger.error(f"Failed to fetch metrics: {e}")
+                raise
 
-        try:
-            stored_count = self.postgres.refresh_smart_money(metrics, sol_price, refresh_type=refresh_type)
-        except Exception as e:
-            logger.error(f"Failed to refresh data: {e}")
-            raise
+            if metrics.is_empty():
+                logger.warning("No metrics found")
+                return {'wallets_processed': 0, 'sol_price_usd': sol_price, 'wallets_stored': 0}
+
+            stored_by_refresh = self.publish_metrics(metrics, sol_price, refresh_limits)
+            wallets_processed = len(metrics)
 
         total_wallets = self.postgres.get_wallet_count()
+        record('wallets_processed', wallets_processed, chain='solana')
+        record('wallets_in_db', total_wallets, chain='solana')
 
         logger.info("=" * 60)
-        logger.info(f"COMPLETE: {len(metrics):,} wallets, ${sol_price:.2f} SOL, {total_wallets:,} in DB")
+        logger.info(f"COMPLETE: {wallets_processed:,} wallets, ${sol_price:.2f} SOL, {total_wallets:,} in DB")
         logger.info("=" * 60)
 
         return {
-            'wallets_processed': len(metrics),
+            'wallets_processed': wallets_processed,
             'sol_price_usd': sol_price,
-            'wallets_stored': stored_count,
+            'wallets_stored': sum(stored_by_refresh.values()),
+            'wallets_stored_by_refresh': stored_by_refresh,
             'total_wallets_in_db': total_wallets
         }
 
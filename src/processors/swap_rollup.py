@@ -0,0 +1,145 @@
+import logging
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from ..database import ClickHouseClient
+from ..database.sharding import Shard, shard_filter
+from .smart_money_query import RECENT, WINDOW, SmartMoneyQueryBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class SwapRollup:
+    """Daily per-(chain, wallet, token) swap aggregates, one partition per closed day.
+
+    Reads keep the raw query's rolling windows: the days holding the 30d and 7d
+    boundaries are re-read from raw swaps and split at now() - 30/7 days, so only the
+    full days strictly inside the window come from the rollup. Raw swaps are otherwise
+    only scanned from the first uncompacted day. Reads cover every chain named in the
+    query's `chains` parameter, so one read serves a multi-chain query.
+    """
+
+    TABLE_NAME = 'smartmoney_swap_rollup'
+    WINDOW_DAYS = 30
+
+    def __init__(self, db: ClickHouseClient, chain: str, query_builder: SmartMoneyQueryBuilder):
+        self.db = db
+        self.chain = chain
+        self.query_builder = query_builder
+        self.staging_table = f"{self.TABLE_NAME}_staging_{chain}"
+        self._tables_ready = False
+
+    def ensure_tables(self):
+        if self._tables_ready:
+            return
+        for table in (self.TABLE_NAME, self.staging_table):
+            self.db.execute_command(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                chain LowCardinality(String),
+                signing_wallet String,
+                traded_token String,
+                day Date,
+                bought Float64,
+                sold Float64,
+                native_spent Float64,
+                native_received Float64,
+                buy_count UInt64,
+                sell_count UInt64,
+                swap_count UInt64
+            )
+            ENGINE = MergeTree
+            PARTITION BY (chain, day)
+            ORDER BY (chain, signing_wallet, traded_token, day)
+            TTL day + INTERVAL {self.WINDOW_DAYS + 10} DAY
+            SETTINGS ttl_only_drop_parts = 1
+            """)
+        self._tables_ready = True
+
+    def _daily_aggregate_sql(self, time_filter: str, shard: Optional[Shard] = None, recent: bool = False) -> str:
+        # recent splits a day at the rolling 7d boundary; compaction stores whole days without it
+        recent_select = f",\n                {RECENT} AS recent" if recent else ''
+        return f"""
+            SELECT
+                chain,
+                toString(signing_wallet),
+                toString(traded_token),
+                toDate(block_time) AS swap_day,
+                toFloat64(SUM(IF(action = 'buy', traded_amount, 0))),
+                toFloat64(SUM(IF(action = 'sell', traded_amount, 0))),
+                toFloat64(SUM(IF(action = 'buy', native_amount, 0))),
+                toFloat64(SUM(IF(action = 'sell', native_amount, 0))),
+                toUInt64(SUM(IF(action = 'buy', 1, 0))),
+                toUInt64(SUM(IF(action = 'sell', 1, 0))),
+                toUInt64(COUNT(*)){recent_select}
+            FROM ({self.query_builder.normalized_swaps_sql(time_filter, shard)})
+            GROUP BY chain, signing_wallet, traded_token, swap_day{', recent' if recent else ''}
+        """
+
+    def _rollup_days(self) -> Tuple[date, List[date]]:
+        self.ensure_tables()
+        rows = self.db.execute_query_dict(f"""
+            SELECT today() AS today, arraySort(groupUniqArray(day)) AS days
+            FROM {self.TABLE_NAME}
+            WHERE chain = '{self.chain}' AND day >= today() - {self.WINDOW_DAYS} AND day < today()
+        """)
+        return rows[0]['today'], list(rows[0]['days'])
+
+    def covered_until(self) -> date:
+        today, days = self._rollup_days()
+        present = set(days)
+        # The window's first day is always re-read raw, so coverage starts the day after
+        cursor = today - timedelta(days=self.WINDOW_DAYS - 1)
+        while cursor < today and cursor in present:
+            cursor += timedelta(days=1)
+        return cursor
+
+    def compact(self, recompact_days: int = 1) -> int:
+        today, days = self._rollup_days()
+        present = set(days)
+        recompact_from = today - timedelta(days=recompact_days)
+        pending = [
+            d for d in (today - timedelta(days=i) for i in range(self.WINDOW_DAYS - 1, 0, -1))
+            if d not in present or d >= recompact_from
+        ]
+
+        for day in pending:
+            self._compact_day(day)
+        logger.info(f"Compacted {len(pending)} day(s) of {self.chain} swaps into {self.TABLE_NAME}")
+        return len(pending)
+
+    def _compact_day(self, day: date):
+        next_day = day + timedelta(days=1)
+        time_filter = f"block_time >= toDateTime('{day}') AND block_time < toDateTime('{next_day}')"
+        self.db.execute_command(f"TRUNCATE TABLE {self.staging_table}")
+        self.db.execute_command(f"""
+            INSERT INTO {self.staging_table} (
+                chain, signing_wallet, traded_token, day, bought, sold, native_spent, native_received,
+                buy_count, sell_count, swap_count
+            )
+            {self._daily_aggregate_sql(time_filter)}
+        """, parameters=self.query_builder.parameters([self.chain]))
+        self.db.execute_command(
+            f"ALTER TABLE {self.TABLE_NAME} REPLACE PARTITION tuple('{self.chain}', toDate('{day}')) FROM {self.staging_table}"
+        )
+        logger.info(f"Rollup day {day} for {self.chain} replaced")
+
+    def daily_swaps_sql(self, shard: Optional[Shard] = None) -> str:
+        """Daily rows with a recent (7d) flag: compacted days inside the window before the
+        covered_until parameter, raw swaps for the two boundary days and from covered_until on."""
+        window_day = f"toDate(now() - INTERVAL {self.WINDOW_DAYS} DAY)"
+        recent_day = "toDate(now() - INTERVAL 7 DAY)"
+        raw_filter = (
+            f"{WINDOW} AND (block_time < toDateTime({window_day} + 1)"
+            f" OR toDate(block_time) = {recent_day}"
+            f" OR block_time >= toDateTime({{covered_until:Date}}))"
+        )
+        return f"""
+            SELECT
+                chain, signing_wallet, traded_token, day, bought, sold, native_spent, native_received,
+                buy_count, sell_count, swap_count, day > {recent_day} AS recent
+            FROM {self.TABLE_NAME}
+            WHERE has({{chains:Array(String)}}, chain)
+                  AND day > {window_day} AND day != {recent_day} AND day < {{covered_until:Date}}
+                  AND {shard_filter('signing_wallet', shard)}
+            UNION ALL
+            {self._daily_aggregate_sql(raw_filter, shard, recent=True)}
+        """
@@ -0,0 +1,143 @@
+import logging
+import uuid
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import polars as pl
+from ..config import Config
+from ..database import ClickHouseClient, PostgresClient, merge_top_k
+from ..database.sharding import Shard
+from ..metrics import stage
+from .smart_money_query import SmartMoneyQueryBuilder, TOKEN_PNL_COLUMNS
+from .swap_rollup import SwapRollup
+
+logger = logging.getLogger(__name__)
+
+
+class TokenPnlScan:
+    """Per-(wallet, token) PnL materialized once per run for the wallet leaderboard and the token outputs.
+
+    The 30-day aggregation runs (once per wallet shard when sharded) into a run-scoped
+    scratch table only when wallet_metrics() is called. Analyzers pass it as the result
+    cache's execute callback, so a cache hit skips the scan and the token outputs keep
+    the previous run's. The wallet leaderboard, the per-token leaderboards and the
+    per-wallet top tokens are then all read from that table, one wallet shard at a time.
+    """
+
+    TABLE_PREFIX = 'smartmoney_token_pnl'
+
+    def __init__(self, db: ClickHouseClient, query_builder: SmartMoneyQueryBuilder, label: str, chains: List[str],
+                 shards: int = 1, rollup: Optional[SwapRollup] = None, rollup_until: Optional[date] = None):
+        self.db = db
+        self.query_builder = query_builder
+        self.chains = chains
+        self.shards = shards
+        self.rollup = rollup
+        self.rollup_until = rollup_until
+        self.table = f"{self.TABLE_PREFIX}_{label}_{uuid.uuid4().hex[:12]}"
+        self.materialized = False
+
+    def _shards(self) -> List[Optional[Shard]]:
+        return [(index, self.shards) for index in range(self.shards)] if self.shards > 1 else [None]
+
+    def _execute(self, build_query: Callable[[Optional[Shard]], Tuple[str, Dict[str, Any]]]) -> List[pl.DataFrame]:
+        if self.shards > 1:
+            return self.db.execute_query_frames_sharded(build_query, self.shards)
+        return [self.db.execute_query_frame(*build_query(None))]
+
+    def materialize(self):
+        columns = ',\n'.join(f"{column} {column_type}" for column, column_type in TOKEN_PNL_COLUMNS)
+        self.db.execute_command(f"""
+            CREATE TABLE {self.table} (
+                {columns}
+            )
+            ENGINE = MergeTree
+            ORDER BY (chain, signing_wallet, traded_token)
+        """)
+        self.materialized = True
+        with stage('token_pnl'):
+            for shard in self._shards():
+                daily_swaps_sql = self.rollup.daily_swaps_sql(shard) if self.rollup_until else None
+                self.db.execute_command(
+                    self.query_builder.token_pnl_insert_sql(self.table, shard, daily_swaps_sql),
+                    parameters=self.query_builder.parameters(self.chains, shard=shard, covered_until=self.rollup_until),
+                )
+        logger.info(f"Materialized token PnL of {', '.join(self.chains)} into {self.table}")
+
+    def wallet_metrics(self, limit: int) -> pl.DataFrame:
+        """build()'s wallet leaderboard, materializing the scan first."""
+        if not self.materialized:
+            self.materialize()
+        frames = self._execute(lambda shard: (
+            self.query_builder.build(limit, shard=shard, token_pnl_table=self.table),
+            self.query_builder.parameters(self.chains, shard=shard),
+        ))
+        if len(frames) == 1:
+            return frames[0]
+        by = 'chain' if self.query_builder.chain_column else None
+        return merge_top_k(frames, f'realized_pnl_{self.query_builder.native_name}_30d', limit, by=by)
+
+    def token_outputs(self, limit: int) -> pl.DataFrame:
+        rows = pl.concat(self._execute(lambda shard: (
+            self.query_builder.token_outputs_sql(self.table, limit, shard),
+            self.query_builder.parameters(self.chains, shard=shard),
+        )), how='vertical_relaxed')
+        # Each shard returns its own top wallets; wallet_rank is their position across all shards
+        leaders = (
+            rows
+            .select('chain', 'wallet_address', 'wallet_pnl_native_30d')
+            .unique(['chain', 'wallet_address'])
+            .sort(['chain', 'wallet_pnl_native_30d', 'wallet_address'], descending=[False, True, False])
+            .with_columns((pl.int_range(pl.len()).over('chain') + 1).alias('wallet_rank'))
+            .filter(pl.col('wallet_rank') <= limit)
+            .drop('wallet_pnl_native_30d')
+        )
+        return rows.drop('wallet_pnl_native_30d').join(leaders, on=['chain', 'wallet_address'])
+
+    def publish(self, postgres: PostgresClient, prices: Dict[str, float], refresh_limits: Dict[str, int]) -> Dict[str, Any]:
+        """Publish each chain's token leaderboards and wallet top tokens, cut per refresh limit from one read."""
+        rows = self.token_outputs(max(refresh_limits.values()))
+        stored: Dict[str, Any] = {}
+        for chain, native_price in prices.items():
+            chain_rows = rows.filter(pl.col('chain') == chain)
+            for refresh_type, refresh_limit in refresh_limits.items():
+                token_rows, wallets = postgres.refresh_token_outputs(
+                    chain, refresh_type,
+                    self.token_leaderboard(chain_rows, refresh_limit, Config.TOKEN_LEADERBOARD_WALLETS),
+                    self.wallet_top_tokens(chain_rows, refresh_limit, Config.WALLET_TOP_TOKENS),
+                    native_price,
+                )
+                stored.setdefault(chain, {})[refresh_type] = {'token_rows': token_rows, 'wallets': wallets}
+        return stored
+
+    def drop(self):
+        if not self.materialized:
+            return
+        try:
+            self.db.execute_command(f"DROP TABLE IF EXISTS {self.table}")
+        except Exception as e:
+            logger.warning(f"Failed to drop {self.table}: {e}")
+
+    @staticmethod
+    def token_leaderboard(rows: pl.DataFrame, wallet_limit: int, wallets_per_token: int) -> pl.DataFrame:
+        """Top wallets_per_token leaderboard wallets of each (chain, token) by 30d token PnL."""
+        return (
+            rows
+            .filter(pl.col('wallet_rank') <= wallet_limit)
+            .sort(['chain', 'traded_token', 'realized_pnl_native_30d', 'wallet_rank'], descending=[False, False, True, False])
+            .with_columns((pl.int_range(pl.len()).over('chain', 'traded_token') + 1).alias('rank'))
+            .filter(pl.col('rank') <= wallets_per_token)
+        )
+
+    @staticmethod
+    def wallet_top_tokens(rows: pl.DataFrame, wallet_limit: int, tokens_per_wallet: int) -> pl.DataFrame:
+        """Each leaderboard wallet's best tokens_per_wallet tokens by 30d PnL, as parallel arrays."""
+        return (
+            rows
+            .filter(pl.col('wallet_rank') <= wallet_limit)
+            .sort(['chain', 'wallet_rank', 'realized_pnl_native_30d', 'traded_token'], descending=[False, False, True, False])
+            .group_by('chain', 'wallet_address', maintain_order=True)
+            .agg(
+                pl.col('traded_token').head(tokens_per_wallet).alias('top_tokens'),
+                pl.col('realized_pnl_native_30d').head(tokens_per_wallet).alias('top_tokens_pnl_native_30d'),
+            )
+        )
@@ -1,8 +1,10 @@
 import sys
 import logging
 from datetime import datetime, timedelta
-from src.config import setup_logging
-from src.core import SmartMoneyWorker
+from typing import Optional
+from src.config import Config, setup_logging
+from src.core import SmartMoneyWorker, JobScheduler
+from src.database import PostgresClient
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -12,19 +14,38 @@ JOB_CONFIGS = {
         'type': 'solana',
         'limit': 10000,
         'interval_minutes': 60,
+        'skip_hours': [0],
+        'use_rollup': 'auto',
+        'publish_mode': 'delta',
         'description': 'Solana top 10k smart money (hourly)'
     },
     'solana_smart_money_daily': {
         'type': 'solana',
         'limit': 50000,
+        'shards': 4,
         'interval_minutes': 1440,
         'description': 'Solana full 50k smart money (daily)'
     },
+    'solana_smart_money_daily_combined': {
+        'type': 'solana',
+        'refresh_limits': {'hourly': 10000, 'daily': 50000},
+        'streaming': True,
+        'loader': 'copy_binary',
+        'use_rollup': 'auto',
+        'publish_mode': 'swap',
+        'token_outputs': True,
+        'shards': 4,
+        'interval_minutes': 1440,
+        'daily_at': '00:00',
+        'description': 'Solana top 10k + full 50k smart money from one scan, with token leaderboards (daily)'
+    },
     'evm_eth_smart_money_hourly': {
         'type': 'evm',
         'chain': 'eth',
         'limit': 10000,
         'interval_minutes': 60,
+        'use_rollup': 'auto',
+        'publish_mode': 'delta',
         'description': 'ETH top 10k smart money (hourly)'
     },
     'evm_eth_smart_money_daily': {
@@ -32,13 +53,28 @@ JOB_CONFIGS = {
         'chain': 'eth',
         'limit': 50000,
         'interval_minutes': 1440,
+        'daily_at': '01:30',
         'description': 'ETH full 50k smart money (daily)'
     },
+    'evm_eth_smart_money_daily_combined': {
+        'type': 'evm',
+        'chain': 'eth',
+        'refresh_limits': {'hourly': 10000, 'daily': 50000},
+        'streaming': True,
+        'loader': 'copy_binary',
+        'publish_mode': 'swap',
+        'token_outputs': True,
+        'interval_minutes': 1440,
+        'daily_at': '01:15',
+        'description': 'ETH top 10k + full 50k smart money from one scan, with token leaderboards (daily)'
+    },
     'evm_polygon_smart_money_hourly': {
         'type': 'evm',
         'chain': 'polygon',
         'limit': 10000,
         'interval_minutes': 60,
+        'use_rollup': 'auto',
+        'publish_mode': 'delta',
         'description': 'Polygon top 10k smart money (hourly)'
     },
     'evm_polygon_smart_money_daily': {
@@ -46,13 +82,28 @@ JOB_CONFIGS = {
         'chain': 'polygon',
         'limit': 50000,
         'interval_minutes': 1440,
+        'daily_at': '02:30',
         'description': 'Polygon full 50k smart money (daily)'
     },
+    'evm_polygon_smart_money_daily_combined': {
+        'type': 'evm',
+        'chain': 'polygon',
+        'refresh_limits': {'hourly': 10000, 'daily': 50000},
+        'streaming': True,
+        'loader': 'copy_binary',
+        'publish_mode': 'swap',
+        'token_outputs': True,
+        'interval_minutes': 1440,
+        'daily_at': '02:45',
+        'description': 'Polygon top 10k + full 50k smart money from one scan, with token leaderboards (daily)'
+    },
     'evm_base_smart_money_hourly': {
         'type': 'evm',
         'chain': 'base',
         'limit': 10000,
         'interval_minutes': 60,
+        'use_rollup': 'auto',
+        'publish_mode': 'delta',
         'description': 'Base top 10k smart money (hourly)'
     },
     'evm_base_smart_money_daily': {
@@ -60,7 +111,79 @@ JOB_CONFIGS = {
         'chain': 'base',
         'limit': 50000,
         'interval_minutes': 1440,
+        'daily_at': '03:30',
         'description': 'Base full 50k smart money (daily)'
+    },
+    'evm_base_smart_money_daily_combined': {
+        'type': 'evm',
+        'chain': 'base',
+        'refresh_limits': {'hourly': 10000, 'daily': 50000},
+        'streaming': True,
+        'loader': 'copy_binary',
+        'publish_mode': 'swap',
+        'token_outputs': True,
+        'interval_minutes': 1440,
+        'daily_at': '03:30',
+        'description': 'Base top 10k + full 50k smart money from one scan, with token leaderboards (daily)'
+    },
+    'evm_multi_chain_smart_money_hourly': {
+        'type': 'evm',
+        'chains': ['eth', 'polygon', 'base'],
+        'limit': 10000,
+        'interval_minutes': 60,
+        'minute': 15,
+        'skip_hours': [1],
+        'use_rollup': 'auto',
+        'publish_mode': 'delta',
+        'description': 'ETH/Polygon/Base top 10k smart money per chain from one scan (hourly)'
+    },
+    'evm_multi_chain_smart_money_daily_combined': {
+        'type': 'evm',
+        'chains': ['eth', 'polygon', 'base'],
+        'refresh_limits': {'hourly': 10000, 'daily': 50000},
+        'streaming': True,
+        'loader': 'copy_binary',
+        'use_rollup': 'auto',
+        'publish_mode': 'swap',
+        'token_outputs': True,
+        'interval_minutes': 1440,
+        'daily_at': '01:15',
+        'description': 'ETH/Polygon/Base top 10k + full 50k smart money per chain from one scan, with token leaderboards (daily)'
+    },
+    'solana_swap_rollup_daily': {
+        'type': 'solana',
+        'mode': 'rollup',
+        'recompact_days': 2,
+        'interval_minutes': 1440,
+        'daily_at': '00:10',
+        'description': 'Solana swap rollup compaction (daily)'
+    },
+    'evm_eth_swap_rollup_daily': {
+        'type': 'evm',
+        'chain': 'eth',
+        'mode': 'rollup',
+        'recompact_days': 2,
+        'interval_minutes': 1440,
+        'daily_at': '00:10',
+        'description': 'ETH swap rollup compaction (daily)'
+    },
+    'evm_polygon_swap_rollup_daily': {
+        'type': 'evm',
+        'chain': 'polygon',
+        'mode': 'rollup',
+        'recompact_days': 2,
+        'interval_minutes': 1440,
+        'daily_at': '00:20',
+        'description': 'Polygon swap rollup compaction (daily)'
+    },
+    'evm_base_swap_rollup_daily': {
+        'type': 'evm',
+        'chain': 'base',
+        'mode': 'rollup',
+        'recompact_days': 2,
+        'interval_minutes': 1440,
+        'daily_at': '00:40',
+        'description': 'Base swap rollup compaction (daily)'
     }
 }
 
@@ -68,11 +191,16 @@ JOB_CONFIGS = {
 def calculate_next_run(job_name: str) -> datetime:
     now = datetime.utcnow()
     if 'daily' in job_name:
-        next_run = now.replace(hour=0, minute=30, second=0, microsecond=0)
+        hour, minute = map(int, JOB_CONFIGS.get(job_name, {}).get('daily_at', '00:30').split(':'))
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         if next_run <= now:
             next_run += timedelta(days=1)
     else:
-        next_run = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        config = JOB_CONFIGS.get(job_name, {})
+        skip_hours = config.get('skip_hours', [])
+        next_run = now.replace(minute=config.get('minute', 0), second=0, microsecond=0)
+        while next_run <= now or next_run.hour in skip_hours:
+            next_run += timedelta(hours=1)
     return next_run
 
 
@@ -89,7 +217,7 @@ def log_schedule_info(job_name: str, is_start: bool = True):
     logger.info(f'[{job_name}] {status} at {now.strftime("%H:%M:%S")} UTC | {desc} | Next: {next_run.strftime("%H:%M:%S")} UTC (in {time_str})')
 
 
-def run_job(job_name: str) -> int:
+def run_job(job_name: str, worker: Optional[SmartMoneyWorker] = None) -> int:
     if job_name not in JOB_CONFIGS:
         logger.error(f"Unknown job: {job_name}")
         logger.info(f"Available jobs: {', '.join(JOB_CONFIGS.keys())}")
@@ -99,14 +227,31 @@ def run_job(job_name: str) -> int:
     log_schedule_info(job_name, is_start=True)
 
     try:
-        refresh_type = 'daily' if 'daily' in job_name else 'hourly'
-        worker = SmartMoneyWorker()
-        results = worker.run(
-            job_type=config.get('type', 'solana'),
-            limit=config['limit'],
-            chain=config.get('chain'),
-            refresh_type=refresh_type,
-        )
+        worker = worker or SmartMoneyWorker()
+        if config.get('mode') == 'rollup':
+            results = worker.run_rollup(
+                job_type=config.get('type', 'solana'),
+                chain=config.get('chain'),
+                recompact_days=config.get('recompact_days', 1),
+                job_name=job_name,
+            )
+        else:
+            refresh_type = 'daily' if 'daily' in job_name else 'hourly'
+            results = worker.run(
+                job_type=config.get('type', 'solana'),
+                limit=config.get('limit', 10000),
+                chain=config.get('chain'),
+                refresh_type=refresh_type,
+                use_rollup=config.get('use_rollup', False),
+                refresh_limits=config.get('refresh_limits'),
+                chains=config.get('chains'),
+                streaming=config.get('streaming', False),
+                loader=config.get('loader'),
+                publish_mode=config.get('publish_mode'),
+                job_name=job_name,
+                shards=config.get('shards', 1),
+                token_outputs=config.get('token_outputs', False),
+            )
         log_schedule_info(job_name, is_start=False)
         logger.info(f"Results: {results}")
         return 0
@@ -115,11 +260,66 @@ def run_job(job_name: str) -> int:
         return 1
 
 
+def run_daemon(job_names) -> int:
+    unknown = [job_name for job_name in job_names if job_name not in JOB_CONFIGS]
+    if not job_names or unknown:
+        logger.error(f"Unknown or missing jobs for daemon: {', '.join(unknown) or '(none)'}")
+        logger.info(f"Available jobs: {', '.join(JOB_CONFIGS.keys())}")
+        return 1
+
+    worker = SmartMoneyWorker(keep_alive=True)
+    scheduler = JobScheduler(
+        job_names,
+        next_run=calculate_next_run,
+        run_job=lambda job_name: run_job(job_name, worker=worker),
+        max_parallel=Config.SCHEDULER_MAX_PARALLEL,
+    )
+    logger.info(f"Scheduler daemon started: {', '.join(job_names)} (max {Config.SCHEDULER_MAX_PARALLEL} in parallel)")
+    try:
+        scheduler.run_forever()
+    finally:
+        worker.close()
+    return 0
+
+
+def run_migrate() -> int:
+    try:
+        PostgresClient(migrate=True).close()
+        return 0
+    except Exception as e:
+        logger.error(f"Schema migration failed: {e}", exc_info=True)
+        return 1
+
+
+def run_realtime(args) -> int:
+    if not args or args[0] not in ('solana', 'evm'):
+        logger.error("Usage: python worker_scheduled.py realtime <solana|evm> [chain ...]")
+        return 1
+    worker = SmartMoneyWorker()
+    try:
+        worker.run_realtime(job_type=args[0], chains=args[1:] or None, limit=Config.INCREMENTAL_LIMIT)
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        logger.error(f"Realtime leaderboard failed: {e}", exc_info=True)
+        return 1
+
+
 def main():
     if len(sys.argv) < 2:
         print(f"Usage: python worker_scheduled.py <job_name>")
+        print(f"       python worker_scheduled.py daemon [job_name ...]")
+        print(f"       python worker_scheduled.py migrate")
+        print(f"       python worker_scheduled.py realtime <solana|evm> [chain ...]")
         print(f"Available jobs: {', '.join(JOB_CONFIGS.keys())}")
         return 1
+    if sys.argv[1] == 'migrate':
+        return run_migrate()
+    if sys.argv[1] == 'realtime':
+        return run_realtime(sys.argv[2:])
+    if sys.argv[1] == 'daemon':
+        return run_daemon(sys.argv[2:] or [j for j in Config.SCHEDULER_JOBS.split(',') if j])
     return run_job(sys.argv[1])
 
 